@@ -0,0 +1,149 @@
+"""
+Text rendering benchmark of large message and dialog lists.
+
+For every case it renders the same synthetic rows twice and reports rows/sec:
+
+- `rich`: the previous path, `arrow` humanizing each date and `rich.print` parsing the markup of every chunk.
+- `fast`: `fmt.iter_format_*` with one `RelativeTime` per list, written through `TextWriter`.
+
+Output goes to /dev/null; `--color` renders ANSI styles as if stdout was a terminal.
+
+    uv run python benchmarks/render.py
+    uv run python benchmarks/render.py --messages 20000 --dialogs 5000 --runs 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+
+import arrow
+from rich.console import Console
+from telethon import TelegramClient
+from telethon.custom import Dialog, Message
+from telethon.tl import types
+
+from tele_cli.types import OutputFormat
+from tele_cli.utils import fmt
+from tele_cli.utils.render import TextWriter
+
+# never connected, rows are built offline with an in-memory session.
+_CLIENT = TelegramClient(None, api_id=1, api_hash="-")
+
+
+def make_messages(count: int) -> list[Message]:
+    now = datetime.now(UTC)
+    sender = types.User(id=42, access_hash=1, first_name="Ada", last_name="Lovelace")
+    messages = []
+    for i in range(count):
+        msg = types.Message(
+            id=i + 1,
+            peer_id=types.PeerUser(42),
+            from_id=types.PeerUser(42),
+            date=now - timedelta(seconds=i * 37),
+            message=f"message number {i}\nsecond line with [brackets] and some more text",
+            out=i % 5 == 0,
+        )
+        msg._finish_init(_CLIENT, {42: sender}, None)
+        messages.append(msg)
+    return messages
+
+
+def make_dialogs(count: int) -> list[Dialog]:
+    now = datetime.now(UTC)
+    dialogs = []
+    for i in range(count):
+        user = types.User(id=i + 1, access_hash=1, first_name=f"user {i}")
+        peer = types.PeerUser(user.id)
+        msg = types.Message(id=i + 1, peer_id=peer, date=now - timedelta(minutes=i), message=f"last message of {i}")
+        tl_dialog = types.Dialog(
+            peer=peer,
+            top_message=msg.id,
+            read_inbox_max_id=0,
+            read_outbox_max_id=0,
+            unread_count=i % 7,
+            unread_mentions_count=0,
+            unread_reactions_count=0,
+            unread_poll_votes_count=0,
+            notify_settings=types.PeerNotifySettings(),
+            pinned=i < 5,
+        )
+        msg._finish_init(_CLIENT, {user.id: user}, None)
+        dialogs.append(Dialog(_CLIENT, tl_dialog, {user.id: user}, msg))
+    return dialogs
+
+
+async def _aiter(items: list) -> object:
+    for item in items:
+        yield item
+
+
+def render_rich_messages(messages: list[Message], color: bool) -> None:
+    # the previous text path: arrow per message, every chunk through rich's markup parser.
+    console = Console(file=sys.stdout, force_terminal=color, no_color=not color)
+    sep = ""
+    for msg in messages:
+        date_str = arrow.get(msg.date).humanize()
+        text = "".join(["  " + x for x in (msg.message or "").splitlines(keepends=True)])
+        console.print(sep + f"* {msg.id} ({date_str}) - {'me' if msg.out else 'Ada Lovelace (id: 42)'}\n\n{text}\n", end="")
+        sep = "\n"
+
+
+def render_rich_dialogs(dialogs: list[Dialog], color: bool) -> None:
+    console = Console(file=sys.stdout, force_terminal=color, no_color=not color)
+    console.print(fmt.format_dialog_list(dialogs, OutputFormat.text))
+
+
+def render_fast_messages(messages: list[Message], color: bool) -> None:
+    asyncio.run(_render_fast(fmt.iter_format_message_list(_aiter(messages), OutputFormat.text), color))  # type: ignore[arg-type]
+
+
+def render_fast_dialogs(dialogs: list[Dialog], color: bool) -> None:
+    asyncio.run(_render_fast(fmt.iter_format_dialog_list(_aiter(dialogs), OutputFormat.text), color))  # type: ignore[arg-type]
+
+
+async def _render_fast(chunks, color: bool) -> None:
+    writer = TextWriter(sys.stdout, color=color)
+    async for chunk in chunks:
+        writer.write(chunk)
+    writer.flush()
+
+
+def rows_per_sec(render: Callable[[list, bool], None], rows: list, color: bool, runs: int) -> float:
+    samples = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(runs):
+            start = time.perf_counter()
+            render(rows, color)
+            samples.append(time.perf_counter() - start)
+    return len(rows) / statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000, help="rows of the message list case.")
+    parser.add_argument("--dialogs", type=int, default=5000, help="rows of the dialog list case.")
+    parser.add_argument("--runs", type=int, default=3, help="renders per path, the median is reported.")
+    parser.add_argument("--color", action="store_true", help="render ANSI styles as on a terminal.")
+    args = parser.parse_args()
+
+    cases = [
+        ("message list", make_messages(args.messages), render_rich_messages, render_fast_messages),
+        ("dialog list", make_dialogs(args.dialogs), render_rich_dialogs, render_fast_dialogs),
+    ]
+    for name, rows, render_rich, render_fast in cases:
+        slow = rows_per_sec(render_rich, rows, args.color, args.runs)
+        fast = rows_per_sec(render_fast, rows, args.color, args.runs)
+        print(f"{name:<14} {len(rows):>6} rows   rich {slow:>10,.0f} rows/s   fast {fast:>10,.0f} rows/s   x{fast / slow:5.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+Cold start benchmark of the `tele` command line.
+
+For every case it measures:
+
+- the wall time of a fresh interpreter running `tele ...` (median over `--runs`).
+- the cumulative `python -X importtime` cost of `tele_cli` and the heaviest modules it pulled in.
+- that none of the modules the case must not load were imported (`--check` turns this into the exit code).
+
+    uv run python benchmarks/startup.py
+    uv run python benchmarks/startup.py --runs 20 --check
+
+Besides `-h` / `--version`, a few real commands run against a temporary home folder with two sessions, their
+login metadata and a filled dialog snapshot: `auth list` (metadata only, must not load Telethon) and
+`dialog list --cached`. None of the cases touch the network.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+# modules that are expensive to import and only needed by commands that talk to Telegram or parse dates.
+HEAVY = ("telethon", "pydantic", "tomlkit", "dateparser", "arrow", "toon_format", "asyncio")
+
+
+@dataclass
+class Case:
+    name: str
+    argv: list[str]
+    must_not_import: tuple[str, ...] = HEAVY
+    # runs with `HOME` pointing to the temporary sessions, see `_make_home`.
+    home: bool = False
+
+
+CASES = [
+    Case("version", ["--version"]),
+    Case("help", ["-h"]),
+    Case("auth -h", ["auth", "-h"]),
+    Case("dialog list -h", ["dialog", "list", "-h"]),
+    Case("message list -h", ["message", "list", "-h"]),
+    Case("message search -h", ["message", "search", "-h"]),
+    Case("message download -h", ["message", "download", "-h"]),
+    Case("daemon start -h", ["daemon", "start", "-h"]),
+    # reads the `.session.json` files only.
+    Case("auth list", ["auth", "list"], must_not_import=("telethon", "tomlkit", "dateparser", "arrow", "toon_format"), home=True),
+    Case("auth list -f json", ["-f", "json", "auth", "list"], must_not_import=("telethon", "tomlkit", "dateparser", "arrow", "toon_format"), home=True),
+    Case("dialog list --cached", ["--no-daemon", "dialog", "list", "--cached", "--max-age", "86400"], must_not_import=("dateparser", "arrow"), home=True),
+]
+
+_SESSIONS = ("alice", "bob")
+_DIALOGS = 200
+
+# runs the cli in-process and reports its exit code and which of the watched modules ended up in `sys.modules`.
+# with `-c`, `sys.argv[0]` is "-c": the watched modules come first, then the cli arguments.
+_PROBE = """
+import sys
+from tele_cli.cli import cli
+code = 0
+try:
+    cli(sys.argv[2:], prog_name="tele")
+except SystemExit as exc:
+    code = exc.code or 0
+watched = sys.argv[1].split(",")
+sys.stderr.write("\\n@exit " + str(code) + "\\n@loaded " + ",".join(m for m in watched if m in sys.modules) + "\\n")
+"""
+
+
+def _make_home(home: Path) -> None:
+    """Sessions with login metadata, the first one `Current` with a synced dialog snapshot of `_DIALOGS` users."""
+
+    import inspect
+    import json
+    from datetime import UTC, datetime
+
+    from telethon.tl import types
+
+    from tele_cli.session import TGSession
+
+    folder = home / ".config" / "tele" / "sessions"
+    folder.mkdir(parents=True)
+    for user_id, name in enumerate(_SESSIONS, start=1):
+        info = {"session_name": name, "user_id": user_id, "user_name": name, "user_phone": None, "user_display_name": name.title(), "verified_at": None}
+        (folder / f"{name}.session.json").write_text(json.dumps(info), encoding="utf-8")
+        TGSession(str(folder / f"{name}.session")).close()
+
+    session = TGSession(str(folder / f"{_SESSIONS[0]}.session"))
+    now = datetime.now(UTC)
+    # the read marks and unread counters differ between layers.
+    counters = {name: 0 for name in inspect.signature(types.Dialog).parameters if name.startswith("unread_") or name.endswith("_max_id")}
+    users = [types.User(id=user_id, access_hash=user_id, first_name=f"user {user_id}") for user_id in range(100, 100 + _DIALOGS)]
+    dialogs = [types.Dialog(peer=types.PeerUser(user.id), top_message=1, notify_settings=types.PeerNotifySettings(), **counters) for user in users]
+    messages = [types.Message(id=1, peer_id=types.PeerUser(user.id), date=now, message="hello") for user in users]
+    session.process_entities(types.messages.Dialogs(dialogs=dialogs, messages=messages, chats=[], users=users))
+    session.dialog_snapshot().mark_synced()
+    session.save()
+    session.close()
+    (folder / "Current.session").symlink_to(folder / f"{_SESSIONS[0]}.session")
+
+
+def _run(argv: list[str], *extra: str, home: Path | None = None) -> subprocess.CompletedProcess[str]:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    if home is not None:
+        env["HOME"] = str(home)
+    return subprocess.run([sys.executable, *extra, "-c", _PROBE, ",".join(HEAVY), *argv], capture_output=True, text=True, env=env, check=False)
+
+
+def wall_time(argv: list[str], runs: int, home: Path | None = None) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        _run(argv, home=home)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def import_profile(argv: list[str], home: Path | None = None) -> tuple[int, list[tuple[int, str]], set[str], bool]:
+    """
+    Cumulative µs of `tele_cli`, the top level modules sorted by cumulative cost, the watched modules loaded and
+    whether the command succeeded.
+    """
+
+    proc = _run(argv, "-X", "importtime", home=home)
+    loaded: set[str] = set()
+    top_level: list[tuple[int, str]] = []
+    total = 0
+    ok = False
+    for line in proc.stderr.splitlines():
+        if line.startswith("@exit "):
+            ok = proc.returncode == 0 and line == "@exit 0"
+            continue
+        if line.startswith("@loaded "):
+            loaded = {m for m in line.removeprefix("@loaded ").split(",") if m}
+            continue
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        (_, cumulative, name) = line.removeprefix("import time:").split("|")
+        if name.startswith("  "):
+            # nested import, already accounted for in its parent.
+            continue
+        name = name.strip()
+        top_level.append((int(cumulative), name))
+        if name.split(".")[0] == "tele_cli":
+            total += int(cumulative)
+    top_level.sort(reverse=True)
+    return total, top_level, loaded, ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="process launches per case, the median is reported.")
+    parser.add_argument("--top", type=int, default=5, help="heaviest top level imports to show per case.")
+    parser.add_argument("--check", action="store_true", help="exit with 1 if a case failed or imported a module it must not.")
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory(prefix="tele-startup-") as tmp:
+        home = Path(tmp)
+        _make_home(home)
+        for case in CASES:
+            case_home = home if case.home else None
+            seconds = wall_time(case.argv, args.runs, home=case_home)
+            (tele_us, top_level, loaded, ok) = import_profile(case.argv, home=case_home)
+            leaked = sorted(loaded & set(case.must_not_import))
+            failed = failed or bool(leaked) or not ok
+
+            print(
+                f"{case.name:<22} wall {seconds * 1000:7.1f} ms   tele_cli imports {tele_us / 1000:7.1f} ms   telethon {'loaded' if 'telethon' in loaded else 'not loaded'}"
+                + (f"   LEAKED {', '.join(leaked)}" if leaked else "")
+                + ("" if ok else "   FAILED")
+            )
+            for cumulative, name in top_level[: args.top]:
+                print(f"    {cumulative / 1000:7.1f} ms  {name}")
+
+    return 1 if args.check and failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -665,6 +665,7 @@ export async function monitorTeleDaemon(opts: TeleDaemonMonitorOptions): Promise
 
   let chain = Promise.resolve();
   let reqSeq = 0;
+  const RPC_TIMEOUT_MS = 30_000;
   const pending = new Map<
     string,
     {
@@ -679,11 +680,13 @@ export async function monitorTeleDaemon(opts: TeleDaemonMonitorOptions): Promise
       const reqId = `${Date.now()}-${++reqSeq}`;
       const timer = setTimeout(() => {
         pending.delete(reqId);
+        // let the daemon drop the request too, instead of finishing it after we gave up.
+        child.stdin?.write(`${JSON.stringify({ id: `${reqId}-cancel`, method: "cancel", params: { id: reqId } })}\n`);
         reject(new Error(`tele daemon rpc timeout: ${method}`));
-      }, 30_000);
+      }, RPC_TIMEOUT_MS);
       pending.set(reqId, { resolve, reject, timer });
 
-      const line = `${JSON.stringify({ id: reqId, method, params })}\n`;
+      const line = `${JSON.stringify({ id: reqId, method, params, timeout: RPC_TIMEOUT_MS / 1000 })}\n`;
       child.stdin?.write(line, (err) => {
         if (!err) {
           return;
@@ -703,6 +706,8 @@ export async function monitorTeleDaemon(opts: TeleDaemonMonitorOptions): Promise
       const result = await sendRpc("send_message", {
         receiver,
         message,
+        // agent replies go ahead of bulk sends in the daemon's send scheduler.
+        priority: "interactive",
         ...(entityType ? { entity_type: entityType } : {}),
         ...(typeof replyTo === "number" ? { reply_to: replyTo } : {}),
         ...(file?.length ? { file } : {}),
@@ -778,6 +783,12 @@ export async function monitorTeleDaemon(opts: TeleDaemonMonitorOptions): Promise
         }
         return;
       }
+      if (packet.type === "event") {
+        if (packet.event === "output_overflow") {
+          logger.info(`tele-cli daemon output overflow: ${JSON.stringify(packet.payload ?? {})}`);
+        }
+        return;
+      }
     }
 
     enqueueInbound(async () => {
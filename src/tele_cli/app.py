@@ -1,24 +1,60 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import heapq
 import inspect
 import sqlite3
+from collections.abc import AsyncIterator, Callable, Mapping
+from contextvars import ContextVar
+from datetime import datetime
 from pathlib import Path
-from typing import Callable
 import zlib
 
 from tele_cli.utils.fmt import format_me
 import telethon
 from telethon import TelegramClient
-from telethon import hints
-from telethon.custom import Dialog
-from telethon.errors import RPCError
+from telethon import hints, utils
+from telethon.custom import Dialog, Message
+from telethon.errors import FilePartMissingError, FileReferenceExpiredError, MediaEmptyError, RPCError
 from telethon.tl.functions.account import GetAuthorizationsRequest
 
 from . import types
+from .cache import EntityCache
+from .scheduler import SendScheduler
+from .store import DaemonState, DialogSnapshot, EntityIndex, MessageArchive, SyncState, UploadCache
 from .session import TGSession, load_session, session_ensure_current_valid
+from .types.session import get_session_info_path
+
+
+_ARCHIVE_BATCH_SIZE = 100
+# ids the archive may be off by when it resolves a `--from` date, at most a page of messages to skip.
+_DATE_BOUND_SLACK = 100
+# dialogs of a multi-dialog `message list` fetched at the same time.
+_FAN_IN_CONCURRENCY = 8
+# messages per dialog waiting for the merge, the fetch of a dialog pauses while its queue is full.
+_FAN_IN_BUFFER = 16
+
+# a cached upload handle that Telegram does not accept anymore, the file is uploaded again.
+_STALE_UPLOAD_ERRORS = (FileReferenceExpiredError, FilePartMissingError, MediaEmptyError)
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# set while a request runs on behalf of the `SendScheduler`.
+_scheduled: ContextVar[bool] = ContextVar("tele_cli_scheduled", default=False)
 
 
 class TGClient(TelegramClient):
+    _send_scheduler: SendScheduler | None = None
+    _entity_cache: EntityCache | None = None
+
     async def _start_without_login(self) -> "TGClient":
         if not self.is_connected():
             await self.connect()
@@ -43,11 +79,786 @@ class TGClient(TelegramClient):
     def get_session(self) -> TGSession | None:
         return self.session
 
+    async def _call(self, sender, request, ordered=False, flood_sleep_threshold=None):
+        if _scheduled.get():
+            # flood waits of scheduled sends are handled per peer by the `SendScheduler`: never sleep inline,
+            # and do not let Telethon's per-method flood memory fail a send because another peer was limited.
+            flood_sleep_threshold = 0
+            for item in request if utils.is_list_like(request) else [request]:
+                self._flood_waited_requests.pop(item.CONSTRUCTOR_ID, None)
+        return await super()._call(sender, request, ordered=ordered, flood_sleep_threshold=flood_sleep_threshold)
+
+    def get_send_scheduler(self) -> SendScheduler:
+        if self._send_scheduler is None:
+            self._send_scheduler = SendScheduler()
+        return self._send_scheduler
+
+    async def send_message_scheduled(self, entity: hints.EntityLike, *args, priority: types.SendPriority = types.SendPriority.normal, **kwargs) -> Message:
+        """
+        `send_message` through the `SendScheduler`: rate limited per peer and globally, retried after flood waits.
+
+        `entity` should be resolved already (see `resolve_entity`), it is the key of the per-peer queue.
+        Local files in `file` are uploaded beforehand, concurrently and only if they were not uploaded before (see `prepare_files`).
+        """
+
+        peer_id = await self.get_peer_id(entity)
+        files = kwargs.get("file")
+        paths = [files] if isinstance(files, str | Path) else files if isinstance(files, list) else []
+        keys: list[str | None] = []
+        if paths:
+            (handles, keys) = await self.prepare_files(paths)
+            kwargs["file"] = handles if isinstance(files, list) else handles[0]
+
+        async def _send() -> Message:
+            token = _scheduled.set(True)
+            try:
+                return await self.send_message(entity, *args, **kwargs)
+            finally:
+                _scheduled.reset(token)
+
+        try:
+            result = await self.get_send_scheduler().submit(peer_id, _send, priority=priority)
+        except _STALE_UPLOAD_ERRORS:
+            cached = [key for key in keys if key is not None]
+            if not cached or (cache := self.get_upload_cache()) is None:
+                raise
+            # a cached handle is not valid anymore: upload again.
+            cache.forget(cached)
+            (handles, keys) = await self.prepare_files(paths)
+            kwargs["file"] = handles if isinstance(files, list) else handles[0]
+            result = await self.get_send_scheduler().submit(peer_id, _send, priority=priority)
+
+        if any(keys):
+            self._remember_sent_media(keys, result if isinstance(result, list) else [result])
+        return result
+
+    def get_upload_cache(self) -> UploadCache | None:
+        session = self.get_session()
+        return session.upload_cache() if isinstance(session, TGSession) else None
+
+    async def prepare_files(self, files: list[hints.FileLike], concurrency: int = 4) -> tuple[list[hints.FileLike], list[str | None]]:
+        """
+        Replace local file paths with handles Telegram can send directly, returns them with the upload cache key of each.
+
+        - a file with the same name and content as one uploaded before reuses its handle (see `UploadCache`).
+        - the other files are uploaded, up to `concurrency` at the same time.
+
+        Anything but a path to a local file is returned unchanged, with no key.
+        """
+
+        cache = self.get_upload_cache()
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+        async def _prepare(file: hints.FileLike) -> tuple[hints.FileLike, str | None]:
+            if not isinstance(file, str | Path) or not (path := Path(file)).is_file():
+                return (file, None)
+            key = f"{await asyncio.to_thread(_hash_file, path)}:{path.name}"
+            if cache is not None and (handle := cache.get(key)) is not None:
+                return (handle, key)
+            async with semaphore:
+                handle = await self.upload_file(path)
+            if cache is not None:
+                cache.put(key, "file", handle)
+            return (handle, key)
+
+        prepared = await asyncio.gather(*(_prepare(file) for file in files))
+        return ([handle for (handle, _) in prepared], [key for (_, key) in prepared])
+
+    def _remember_sent_media(self, keys: list[str | None], messages: list[Message]) -> None:
+        """Cache the document/photo each file was sent as, sending it again then needs no upload at all."""
+
+        cache = self.get_upload_cache()
+        # an album keeps the order of its files, anything else can not be matched reliably.
+        if cache is None or len(keys) != len(messages):
+            return
+        for key, msg in zip(keys, messages):
+            media = getattr(msg, "document", None) or getattr(msg, "photo", None)
+            if key is None or media is None:
+                continue
+            try:
+                handle = utils.get_input_document(media) if isinstance(media, telethon.types.Document) else utils.get_input_photo(media)
+            except TypeError:
+                continue
+            cache.put(key, "media", handle)
+
+    def get_entity_index(self) -> EntityIndex | None:
+        session = self.get_session()
+        return session.entity_index() if isinstance(session, TGSession) else None
+
+    async def resolve_entity(self, target: str | int) -> hints.EntityLike:
+        """
+        Resolve a receiver, preferring the local `EntityIndex` over the network.
+
+        1. exact peer id / entity id / username in the index.
+        2. Telethon's resolver (username, phone, session cache).
+        3. dialog name in the index, exact then contains (case-insensitive).
+        4. on a miss, fetch only the dialogs newer than the index knows about and retry 3.
+
+        If nothing matches, `target` is returned unchanged.
+        """
+
+        index = self.get_entity_index()
+        if index and (peer := index.resolve(target)):
+            return peer
+
+        try:
+            return await self.get_input_entity(target)
+        except Exception:
+            pass
+
+        # NOTICE: do not convert str to int by default.
+        #         the phone and the peer_id can not be determined.
+
+        # if input is int, it must be peer_id, and we do not need do any matching.
+        if isinstance(target, int) or index is None:
+            return target
+
+        if peer := index.resolve_name(target):
+            return peer
+
+        await self.refresh_entity_index()
+        return index.resolve_name(target) or index.resolve(target) or target
+
+    async def refresh_entity_index(self) -> None:
+        """
+        Index the dialogs with activity newer than the latest one known, or every dialog on a cold index.
+
+        Indexing itself happens in `TGSession.process_entities` for each fetched page.
+        """
+
+        latest = (index := self.get_entity_index()) and index.latest_dialog_date()
+        async for dialog in self.iter_dialogs():
+            # pinned dialogs are listed first regardless of their date.
+            if latest and not dialog.pinned and dialog.date and dialog.date <= latest:
+                break
+
+    def get_dialog_snapshot(self) -> DialogSnapshot | None:
+        session = self.get_session()
+        return session.dialog_snapshot() if isinstance(session, TGSession) else None
+
+    async def refresh_dialog_snapshot(self) -> None:
+        """
+        Fetch the dialogs with activity newer than the snapshot's latest one, or every dialog (archived included)
+        if the snapshot was never complete.
+
+        Storing happens in `TGSession.process_entities` for each fetched page.
+        """
+
+        snapshot = self.get_dialog_snapshot()
+        if snapshot is None:
+            return
+        if snapshot.synced_at() is None:
+            async for _ in self.iter_dialogs():
+                pass
+            snapshot.mark_synced()
+            return
+
+        latest = snapshot.latest_date()
+        async for dialog in self.iter_dialogs():
+            # pinned dialogs are listed first regardless of their date.
+            if latest and not dialog.pinned and dialog.date and dialog.date <= latest:
+                break
+        snapshot.mark_synced()
+
+    async def list_dialogs_cached(
+        self, dialog_types: list[types.DialogType] | None = None, archived: bool = False, max_age: float | None = None
+    ) -> tuple[list[Dialog], int]:
+        """
+        The dialog list from the `DialogSnapshot`, filtered by type in the query, and the number of dialogs left
+        out because their chat is not known locally.
+
+        Does not need a connection, unless the snapshot was never filled (then every dialog is fetched once) or
+        was last synced more than `max_age` seconds ago (then the dialogs newer than its latest one are fetched).
+        When connected, chats missing from the `EntityIndex` are fetched.
+        """
+
+        snapshot = self.get_dialog_snapshot()
+        if snapshot is None:
+            dialogs = [d async for d in self.iter_dialogs(archived=None if archived else False) if not dialog_types or types.get_dialog_type(d) in dialog_types]  # type: ignore[arg-type]
+            return dialogs, 0
+        if snapshot.synced_at() is None or (max_age is not None and snapshot.is_stale(max_age)):
+            await self.refresh_dialog_snapshot()
+
+        rows = snapshot.query(kinds=[item.value for item in dialog_types or []], archived=archived)
+        index = self.get_entity_index()
+        entities = index.get_entities(utils.get_peer_id(dialog.peer) for (dialog, _) in rows) if index else {}
+        missing = [dialog.peer for (dialog, _) in rows if utils.get_peer_id(dialog.peer) not in entities]
+        if missing and self.is_connected():
+            entities.update(await self._fetch_entities(missing))
+
+        dialogs: list[Dialog] = []
+        for dialog, message in rows:
+            if utils.get_peer_id(dialog.peer) not in entities:
+                # never resolved, e.g. a chat only seen by its id in an update.
+                continue
+            if isinstance(message, (telethon.types.Message, telethon.types.MessageService)):
+                message._finish_init(self, entities, None)
+            else:
+                message = None
+            dialogs.append(Dialog(self, dialog, entities, message))
+        return dialogs, len(rows) - len(dialogs)
+
+    async def _fetch_entities(self, peers: list[telethon.types.TypePeer]) -> dict[int, object]:
+        """Fetch the chats of `peers` in one batch and index them, the ones without a usable input peer are skipped."""
+
+        inputs = []
+        for peer in peers:
+            try:
+                inputs.append(await self.get_input_entity(peer))
+            except ValueError:
+                continue
+        if not inputs:
+            return {}
+        try:
+            fetched = await self.get_entity(inputs)
+        except (RPCError, ValueError):
+            return {}
+        if index := self.get_entity_index():
+            index.upsert_entities(fetched)
+        return {utils.get_peer_id(entity): entity for entity in fetched}
+
+    def process_dialog_update(self, update: object) -> None:
+        """Keep the `DialogSnapshot` current with an update, committed with the session."""
+
+        snapshot = self.get_dialog_snapshot()
+        if snapshot is None:
+            return
+        try:
+            snapshot.process_update(update)
+        except sqlite3.Error:
+            # only a cache, it must never break update handling.
+            pass
+
+    def save_session_info(self, me: telethon.types.User) -> types.SessionInfo | None:
+        """Store who this session belongs to next to the session file, `tele auth list/switch` read it offline."""
+
+        session = self.get_session()
+        if not isinstance(session, TGSession):
+            return None
+
+        # `Current.session` is a symlink, the metadata belongs to the session it points to.
+        session_path = Path(session.filename).resolve()
+        info = types.SessionInfo(
+            path=session_path,
+            session_name=session_path.stem,
+            user_id=me.id,
+            user_name=me.username,
+            user_phone=me.phone,
+            user_display_name=format_me(me),
+            verified_at=datetime.now().astimezone(),
+        )
+        try:
+            info.save()
+        except OSError:
+            # only metadata, the next verification writes it again.
+            pass
+        return info
+
+    def get_entity_cache(self) -> EntityCache:
+        """The sender/chat metadata cache, kept fresh by every TL result and update batch the session processes."""
+
+        if self._entity_cache is None:
+            self._entity_cache = EntityCache()
+            session = self.get_session()
+            if isinstance(session, TGSession):
+                session.entity_cache = self._entity_cache
+        return self._entity_cache
+
+    async def warm_entity_cache(self, limit: int = 1000) -> int:
+        """
+        Fill the entity cache with the most recent dialogs: from the `EntityIndex` if it knows any,
+        otherwise by fetching up to `limit` dialogs. Returns the number of cached entities.
+        """
+
+        cache = self.get_entity_cache()
+        index = self.get_entity_index()
+        entities = index.recent_entities(limit) if index else []
+        if entities:
+            cache.update(reversed(entities))
+        else:
+            # cached on the way by `TGSession.process_entities`.
+            await self.get_dialogs(limit=limit)
+        return len(cache)
+
+    def get_daemon_state(self) -> DaemonState | None:
+        session = self.get_session()
+        return session.daemon_state() if isinstance(session, TGSession) else None
+
+    def mark_difference_updates(self) -> bool:
+        """
+        Mark every update Telethon recovers with `getDifference` (on `resume_updates`, or after a gap such as a
+        reconnect), the ones of `other_updates` included, see `types.is_difference_update`.
+
+        Wraps the private methods of Telethon's message box that apply a difference, like `resume_updates` relies on
+        its internals. Returns `False` if they are not available.
+        """
+
+        message_box = getattr(self, "_message_box", None)
+        names = ("apply_difference", "apply_channel_difference")
+        if not all(callable(getattr(message_box, name, None)) for name in names):
+            return False
+
+        def _marking(apply: Callable) -> Callable:
+            def _apply(*args, **kwargs):
+                result = apply(*args, **kwargs)
+                # `(updates, users, chats)`, the updates are dispatched to the handlers as they are.
+                for update in result[0]:
+                    types.mark_difference_update(update)
+                return result
+
+            return _apply
+
+        for name in names:
+            setattr(message_box, name, _marking(getattr(message_box, name)))
+        return True
+
+    async def resume_updates(self) -> bool:
+        """
+        Continue the updates from the state saved in the session (see `TGSession.use_daemon_state`): the difference
+        since then is fetched and dispatched to the event handlers, in order. Register them first.
+
+        Telethon's `catch_up=True` does the same on `connect()`, before any handler could see the missed updates.
+        This relies on its (private) update state internals, see the version range in `pyproject.toml`.
+        Returns `False` if no state was saved, e.g. on the first run, or if those internals are not available.
+        """
+
+        session = self.get_session()
+        message_box = getattr(self, "_message_box", None)
+        entity_cache = getattr(self, "_mb_entity_cache", None)
+        if not isinstance(session, TGSession) or not hasattr(message_box, "load") or not hasattr(entity_cache, "put"):
+            return False
+        try:
+            from telethon._updates import ChannelState, Entity, EntityType, SessionState
+        except ImportError:
+            return False
+
+        account_state: SessionState | None = None
+        channel_states: list[ChannelState] = []
+        for entity_id, state in session.get_update_states():
+            if entity_id == 0:
+                account_state = SessionState(0, 0, False, state.pts, state.qts, int(state.date.timestamp()), state.seq, None)
+            else:
+                channel_states.append(ChannelState(entity_id, state.pts))
+        if account_state is None or not account_state.pts:
+            return False
+
+        message_box.load(account_state, channel_states)
+        for channel_state in channel_states:
+            try:
+                entity = session.get_input_entity(channel_state.channel_id)
+            except ValueError:
+                # no access hash known, the channel is not caught up.
+                continue
+            entity_cache.put(Entity(EntityType.CHANNEL, entity.channel_id, entity.access_hash))
+        await self.catch_up()
+        return True
+
+    def get_message_archive(self) -> MessageArchive | None:
+        session = self.get_session()
+        return session.message_archive() if isinstance(session, TGSession) else None
+
+    async def fetch_messages(
+        self,
+        dialog_id: int,
+        date_start: datetime | None = None,
+        date_end: datetime | None = None,
+        offset_id: int = 0,
+        limit: int | None = None,
+    ) -> list[Message]:
+        """
+        Fetch messages from the network, newest first. Fetched messages are archived.
+        """
+
+        return [msg async for msg in self.iter_fetch_messages(dialog_id, date_start, date_end, offset_id, limit)]
+
+    async def iter_fetch_messages(
+        self,
+        dialog_id: int,
+        date_start: datetime | None = None,
+        date_end: datetime | None = None,
+        offset_id: int = 0,
+        limit: int | None = None,
+        reverse: bool = False,
+        min_id: int = 0,
+    ) -> AsyncIterator[Message]:
+        """
+        Stream messages from the network as they are fetched.
+
+        Selection: the newest `limit` messages with `min_id < id < offset_id` and `date_start <= date < date_end`.
+        They are yielded newest first, or oldest first with `reverse`, without buffering the selection:
+        in reverse, the oldest selected message is looked up first and the history is walked up from it.
+
+        Fetched messages are archived page by page.
+        """
+
+        # the last message before `date_start` is the exclusive lower bound, from the archive if it knows it.
+        archive = self.get_message_archive()
+        if date_start:
+            bound = archive.id_before(await self.get_peer_id(dialog_id), date_start, slack=_DATE_BOUND_SLACK) if archive else None
+            if bound is not None:
+                min_id = max(min_id, bound)
+            else:
+                async for msg in self.iter_messages(dialog_id, offset_date=date_start, limit=1):
+                    min_id = max(min_id, msg.id)
+
+        if reverse and limit is not None:
+            # the oldest of the `limit` newest messages, skipped to with `add_offset`.
+            async for msg in self.iter_messages(dialog_id, offset_id=offset_id, offset_date=date_end, add_offset=limit - 1, limit=1):
+                min_id = max(min_id, msg.id - 1)
+
+        if reverse:
+            # with `date_start` the first messages may be skipped below, the `limit` is counted there.
+            messages = self.iter_messages(dialog_id, min_id=min_id, max_id=offset_id, limit=None if date_start else limit, reverse=True)  # type: ignore[arg-type]
+        else:
+            messages = self.iter_messages(
+                dialog_id,
+                min_id=min_id,
+                offset_id=offset_id,
+                offset_date=date_end,
+                limit=limit,  # type: ignore[arg-type]  # Telethon accepts None despite annotation
+            )
+
+        # everything seen is archived (and indexed for `search_messages`), the covered range is left untouched.
+        batch: list[Message] = []
+        count = 0
+        try:
+            async for msg in messages:
+                if reverse and (date_end and msg.date and msg.date >= date_end.astimezone() or limit is not None and count >= limit):
+                    break
+                if date_start and msg.date and msg.date < date_start.astimezone():
+                    # below an approximate `min_id`, see `MessageArchive.id_before`.
+                    if reverse:
+                        continue
+                    break
+                count += 1
+                batch.append(msg)
+                if archive and len(batch) >= _ARCHIVE_BATCH_SIZE:
+                    archive.store(batch)
+                    batch = []
+                yield msg
+        finally:
+            if archive:
+                archive.store(batch)
+                archive.commit()
+
+    async def iter_fetch_messages_many(
+        self,
+        dialog_ids: list[int],
+        date_start: datetime | None = None,
+        date_end: datetime | None = None,
+        limit: int | None = None,
+        reverse: bool = False,
+        local: bool = False,
+        concurrency: int = _FAN_IN_CONCURRENCY,
+        min_ids: Mapping[int, int] | None = None,
+    ) -> AsyncIterator[Message]:
+        """
+        The messages of several dialogs as one stream ordered by date, newest first or oldest first with `reverse`.
+
+        The selection (`limit` included, and `min_ids[dialog_id]` as `min_id`) applies to each dialog, like
+        `iter_fetch_messages`, or `list_messages_cached` with `local`. Every dialog is streamed into a queue of a
+        few messages, and the stream is merged on the heads of the queues: the next message is yielded as soon as
+        every dialog has produced its next one or ended. At most `concurrency` dialogs fetch at the same time.
+        """
+
+        slots = asyncio.Semaphore(max(concurrency, 1))
+        dialog_ids = list(dict.fromkeys(dialog_ids))
+        queues: list[asyncio.Queue[Message | BaseException | None]] = [asyncio.Queue(maxsize=_FAN_IN_BUFFER) for _ in dialog_ids]
+
+        async def _messages(dialog_id: int) -> AsyncIterator[Message]:
+            min_id = (min_ids or {}).get(dialog_id, 0)
+            if not local:
+                async for msg in self.iter_fetch_messages(dialog_id, date_start=date_start, date_end=date_end, limit=limit, reverse=reverse, min_id=min_id):
+                    yield msg
+                return
+            messages = await self.list_messages_cached(dialog_id, date_start=date_start, date_end=date_end, limit=limit, min_id=min_id)
+            for msg in reversed(messages) if reverse else messages:
+                yield msg
+
+        async def _produce(dialog_id: int, queue: asyncio.Queue[Message | BaseException | None]) -> None:
+            messages = _messages(dialog_id)
+            try:
+                while True:
+                    # the slot is only held while fetching, not while the merge has no room for the message.
+                    async with slots:
+                        msg = await anext(messages, None)
+                    await queue.put(msg)
+                    if msg is None:
+                        return
+            except Exception as exc:  # noqa: BLE001
+                await queue.put(exc)
+            finally:
+                await messages.aclose()
+
+        async def _next(index: int) -> None:
+            item = await queues[index].get()
+            if isinstance(item, BaseException):
+                raise item
+            if item is not None:
+                ts = item.date.timestamp() if item.date else 0
+                key = (ts, item.chat_id or 0, item.id) if reverse else (-ts, -(item.chat_id or 0), -item.id)
+                heapq.heappush(heads, (key, index, item))
+
+        heads: list[tuple[tuple, int, Message]] = []
+        tasks = [asyncio.create_task(_produce(dialog_id, queue)) for dialog_id, queue in zip(dialog_ids, queues)]
+        try:
+            for index in range(len(queues)):
+                await _next(index)
+            while heads:
+                (_, index, msg) = heapq.heappop(heads)
+                yield msg
+                await _next(index)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def iter_unread_messages(
+        self,
+        dialog_types: list[types.DialogType] | None = None,
+        include_muted: bool = False,
+        limit: int | None = None,
+        concurrency: int = _FAN_IN_CONCURRENCY,
+    ) -> AsyncIterator[Message]:
+        """
+        The unread messages of every (not archived) dialog with an `unread_count`: those after its `read_inbox_max_id`.
+
+        Muted dialogs are skipped unless `include_muted`, `limit` keeps the newest messages of each dialog.
+        The dialogs are fetched over this connection, at most `concurrency` at the same time, each into a queue of
+        a few messages. The output is dialog by dialog (oldest message first), in the order the dialogs produced
+        their first message: a dialog waiting for its turn pauses once its queue is full.
+        """
+
+        now = datetime.now().astimezone()
+        dialogs: list[Dialog] = []
+        async for dialog in self.iter_dialogs(archived=False):  # type: ignore[arg-type]
+            if not types.has_unread_messages(dialog) or (dialog_types and types.get_dialog_type(dialog) not in dialog_types):
+                continue
+            if include_muted or not types.is_dialog_muted(dialog, now):
+                dialogs.append(dialog)
+
+        slots = asyncio.Semaphore(max(concurrency, 1))
+        # the queue of each dialog, in the order the dialogs produced their first message (or ended).
+        started: asyncio.Queue[asyncio.Queue[Message | BaseException | None]] = asyncio.Queue()
+
+        async def _produce(dialog: Dialog) -> None:
+            queue: asyncio.Queue[Message | BaseException | None] = asyncio.Queue(maxsize=_FAN_IN_BUFFER)
+            messages = self.iter_fetch_messages(dialog.id, min_id=dialog.dialog.read_inbox_max_id, limit=limit, reverse=True)
+            first = True
+            try:
+                while True:
+                    # the slot is only held while fetching, not while the dialog waits for its turn.
+                    async with slots:
+                        msg = await anext(messages, None)
+                    if first:
+                        first = False
+                        started.put_nowait(queue)
+                    await queue.put(msg)
+                    if msg is None:
+                        return
+            except Exception as exc:  # noqa: BLE001
+                if first:
+                    started.put_nowait(queue)
+                await queue.put(exc)
+            finally:
+                await messages.aclose()
+
+        tasks = [asyncio.create_task(_produce(dialog)) for dialog in dialogs]
+        try:
+            for _ in tasks:
+                queue = await started.get()
+                while (item := await queue.get()) is not None:
+                    if isinstance(item, BaseException):
+                        raise item
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def select_dialogs(self, dialog_types: list[types.DialogType] | None = None, unread: bool = False) -> list[Dialog]:
+        """The (not archived) dialogs of `dialog_types`, only those with unread messages with `unread`."""
+
+        selected: list[Dialog] = []
+        async for dialog in self.iter_dialogs(archived=False):  # type: ignore[arg-type]
+            if dialog_types and types.get_dialog_type(dialog) not in dialog_types:
+                continue
+            if unread and not types.has_unread_messages(dialog):
+                continue
+            selected.append(dialog)
+        return selected
+
+    async def sync_messages(self, dialog_id: int, limit: int | None = None) -> SyncState | None:
+        """
+        Archive the messages of a dialog that are newer than its high-water mark.
+
+        The first sync walks down from the newest message (at most `limit` messages, default the whole history),
+        later syncs only fetch `id > max_id`. The covered range is committed after every page so an
+        interrupted sync resumes where it stopped.
+        """
+
+        archive = self.get_message_archive()
+        if archive is None:
+            return None
+
+        peer_id = await self.get_peer_id(dialog_id)
+        state = archive.get_state(peer_id)
+
+        batch: list[Message] = []
+        if state is None:
+            count = 0
+            async for msg in self.iter_messages(peer_id, limit=limit):  # type: ignore[arg-type]
+                batch.append(msg)
+                count += 1
+                if len(batch) >= _ARCHIVE_BATCH_SIZE:
+                    archive.store(batch)
+                    state = archive.extend_state(peer_id, min_id=batch[-1].id, max_id=batch[0].id)
+                    batch = []
+            if batch:
+                archive.store(batch)
+                state = archive.extend_state(peer_id, min_id=batch[-1].id, max_id=batch[0].id)
+            if limit is None or count < limit:
+                # reached the first message of the dialog.
+                state = archive.extend_state(peer_id, min_id=0, max_id=state.max_id if state else 0)
+            return state
+
+        async for msg in self.iter_messages(peer_id, min_id=state.max_id, reverse=True):
+            batch.append(msg)
+            if len(batch) >= _ARCHIVE_BATCH_SIZE:
+                archive.store(batch)
+                state = archive.extend_state(peer_id, max_id=batch[-1].id)
+                batch = []
+        if batch:
+            archive.store(batch)
+            state = archive.extend_state(peer_id, max_id=batch[-1].id)
+        return state
+
+    async def list_messages_cached(
+        self,
+        dialog_id: int,
+        date_start: datetime | None = None,
+        date_end: datetime | None = None,
+        offset_id: int = 0,
+        limit: int | None = None,
+        min_id: int = 0,
+    ) -> list[Message]:
+        """
+        Same as `fetch_messages` (and `min_id < id` like `iter_fetch_messages`), but answered from the archive
+        where it covers the query.
+
+        Only the missing parts go to the network, and only as far as the query needs them: the newest messages
+        above the high-water mark (down to `limit`, `date_start` or the archive), and messages older than the
+        covered range when the query reaches below it. Fetched messages are archived.
+        """
+
+        archive = self.get_message_archive()
+        if archive is None:
+            return [msg async for msg in self.iter_fetch_messages(dialog_id, date_start, date_end, offset_id, limit, min_id=min_id)]
+
+        peer_id = await self.get_peer_id(dialog_id)
+        state = archive.get_state(peer_id)
+
+        oldest = state and archive.oldest_date(peer_id, min_id=state.min_id)
+        overlaps = state is not None and (not offset_id or offset_id > state.min_id) and (date_end is None or oldest is None or date_end.astimezone() > oldest)
+        if not overlaps or state is None:
+            messages = [msg async for msg in self.iter_fetch_messages(peer_id, date_start, date_end, offset_id, limit, min_id=min_id)]
+            if state is None and messages and not offset_id and not date_end:
+                # a window anchored at the newest message is contiguous, it seeds the covered range.
+                reached_first = date_start is None and not min_id and (limit is None or len(messages) < limit)
+                archive.extend_state(peer_id, min_id=0 if reached_first else messages[-1].id, max_id=messages[0].id)
+            return messages
+
+        # above the high-water mark, newest first: stops once the query has enough.
+        newer: list[Message] = []
+        if not offset_id or offset_id > state.max_id + 1:
+            # with a `min_id` above the covered range, the fetch ends before it.
+            reached_archive = min_id <= state.max_id
+            async for msg in self.iter_messages(peer_id, min_id=max(state.max_id, min_id), offset_id=offset_id, offset_date=date_end, limit=limit):  # type: ignore[arg-type]
+                if date_start is not None and msg.date and msg.date < date_start.astimezone():
+                    reached_archive = False
+                    break
+                newer.append(msg)
+            if limit is not None and len(newer) >= limit:
+                reached_archive = False
+            archive.store(newer)
+            if newer and reached_archive:
+                # everything between the high-water mark and the newest fetched message was seen.
+                archive.extend_state(peer_id, max_id=newer[0].id)
+            else:
+                archive.commit()
+            if not reached_archive:
+                return newer
+
+        # only the covered range: anything archived above it (e.g. by the daemon) may have gaps.
+        below = min(offset_id or state.max_id + 1, state.max_id + 1)
+        remaining = None if limit is None else limit - len(newer)
+        messages = archive.query(peer_id, min_id=max(state.min_id, min_id + 1), max_id=below, date_start=date_start, date_end=date_end, limit=remaining)
+        self._hydrate_messages(messages)
+        messages = newer + messages
+
+        satisfied = (
+            state.complete
+            or min_id >= state.min_id
+            or (limit is not None and len(messages) >= limit)
+            or (date_start is not None and oldest is not None and oldest <= date_start.astimezone())
+        )
+        if satisfied:
+            return messages
+
+        # continue right below the covered range, so what is fetched stays contiguous with it.
+        remaining = None if limit is None else limit - len(messages)
+        older: list[Message] = []
+        exhausted = True
+        async for msg in self.iter_messages(peer_id, offset_id=state.min_id, limit=remaining):  # type: ignore[arg-type]
+            older.append(msg)
+            if date_start is not None and msg.date and msg.date < date_start.astimezone():
+                exhausted = False
+                break
+        if remaining is not None and len(older) >= remaining:
+            exhausted = False
+
+        archive.store(older)
+        if older:
+            archive.extend_state(peer_id, min_id=0 if exhausted else older[-1].id)
+        elif exhausted:
+            archive.extend_state(peer_id, min_id=0)
+
+        return messages + [msg for msg in older if date_start is None or (msg.date and msg.date >= date_start.astimezone())]
+
+    def search_messages(
+        self,
+        query: str,
+        peer_ids: list[int] | None = None,
+        date_start: datetime | None = None,
+        date_end: datetime | None = None,
+        limit: int | None = None,
+    ) -> list[Message]:
+        """Search the local archive, best match first. Does not need a connection."""
+
+        archive = self.get_message_archive()
+        if archive is None:
+            return []
+
+        messages = archive.search(query, peer_ids=peer_ids, date_start=date_start, date_end=date_end, limit=limit)
+        self._hydrate_messages(messages)
+        return messages
+
+    def _hydrate_messages(self, messages: list[Message]) -> None:
+        """Attach this client and the locally known sender/chat entities to archived messages."""
+
+        index = self.get_entity_index()
+        peer_ids = {x for msg in messages for x in (msg.sender_id, msg.chat_id) if x is not None}
+        entities = index.get_entities(peer_ids) if index else {}
+        for msg in messages:
+            msg._finish_init(self, entities, None)
+
 
 class TeleCLI:
     @staticmethod
-    async def create(session_name: str | None, config: types.Config, with_current: bool = True) -> TeleCLI:
-        session: TGSession = load_session(session_name, with_current=with_current)
+    async def create(session_name: str | None, config: types.Config, with_current: bool = True, read_only: bool = False) -> TeleCLI:
+        """`read_only` opens the session file without ever writing to it, see `TGSession`."""
+
+        session: TGSession = load_session(session_name, with_current=with_current, read_only=read_only)
 
         client = TGClient(
             session=session,
@@ -96,7 +907,10 @@ class TeleCLI:
 
                 session_ensure_current_valid(session=client.session)
 
-                return me if isinstance(me, telethon.types.User) else None
+                if not isinstance(me, telethon.types.User):
+                    return None
+                client.save_session_info(me)
+                return me
         except RPCError:
             session_ensure_current_valid(session=None)
         except KeyboardInterrupt:
@@ -113,56 +927,28 @@ class TeleCLI:
         force_document: bool = False,
         supports_streaming: bool = False,
         comment_to: int | None = None,
+        priority: types.SendPriority = types.SendPriority.normal,
     ) -> bool:
         """
         Send a message to a Telegram entity.
 
-        Receiver resolution:
+        Receiver resolution (see `TGClient.resolve_entity`):
         - `int`: treated as a peer ID (see https://core.telegram.org/api/peers#peer-id).
-        - `str`: first try Telethon's resolver (username, phone, etc).
-          If that fails, fall back to scanning dialogs and picking the *unique* match by:
-          - dialog name contains `receiver` (case-insensitive), or
-          - dialog peer id equals `receiver`, or
-          - dialog entity id equals `receiver`.
+        - `str`: looked up in the local entity index by peer id, entity id or username,
+          then Telethon's resolver (username, phone, etc), then the index again by:
+          - dialog name equals `receiver` (case-insensitive), or
+          - the most recent dialog whose name contains `receiver` (case-insensitive).
 
         Notes:
-        - If multiple dialogs match the fallback scan, `receiver` is passed through unchanged
-          (i.e. no guessing).
+        - If nothing matches, `receiver` is passed through unchanged.
         - `file` and `thumb` are forwarded to Telethon's `send_message` as-is.
+        - The message goes through the client's `SendScheduler` in the `priority` lane.
         """
 
         async with self.client() as client:
+            entity = await client.resolve_entity(receiver)
 
-            async def _resolve_entity(target: str | int) -> hints.EntityLike:
-                # Fast path: let Telethon resolve usernames/phones/IDs without scanning dialogs.
-                try:
-                    return await client.get_input_entity(target)
-                except Exception:
-                    pass
-
-                # NOTICE: do not convert str to int by default.
-                #         the phone and the peer_id can not be determined.
-
-                # if input is int, it must be peer_id, and we do not need do any matching.
-                if isinstance(target, int):
-                    return target
-
-                # Fallback: scan dialogs for a unique match (avoid building the full list).
-                target_norm = target.casefold()
-                async for dialog in client.iter_dialogs():
-                    name = (dialog.name or "").casefold()
-                    if target_norm and target_norm in name:
-                        return dialog.entity
-
-                    if str(dialog.id) == target or str(dialog.entity.id) == target:
-                        return dialog.entity
-
-                # If no match found, return the original target
-                return target
-
-            entity = await _resolve_entity(receiver)
-
-            await client.send_message(
+            await client.send_message_scheduled(
                 entity,
                 message,
                 reply_to=reply_to,  # type: ignore[arg-type]
@@ -172,36 +958,45 @@ class TeleCLI:
                 force_document=force_document,
                 supports_streaming=supports_streaming,
                 comment_to=comment_to,  # type: ignore[arg-type]
+                priority=priority,
             )
             return True
 
+    async def sync_messages(self, dialog_id: int, limit: int | None = None) -> SyncState | None:
+        async with self.client() as client:
+            return await client.sync_messages(dialog_id, limit=limit)
+
     async def list_dialogs(self, with_archived: bool = False) -> list[Dialog]:
         async with self.client() as client:
             archived = None if with_archived else False
             return [item async for item in client.iter_dialogs(archived=archived)]  # type: ignore[arg-type]
 
+    async def iter_dialogs(self, with_archived: bool = False) -> AsyncIterator[Dialog]:
+        async with self.client() as client:
+            archived = None if with_archived else False
+            async for item in client.iter_dialogs(archived=archived):  # type: ignore[arg-type]
+                yield item
+
     async def get_session_info(self) -> types.SessionInfo | None:
+        """
+        Ask Telegram who this session belongs to and refresh the stored metadata (see `SessionInfo.load`).
+
+        A session locked by another process (e.g. a running daemon) answers with its stored metadata instead.
+        """
+
+        session = self.client().get_session()
+        if not isinstance(session, TGSession):
+            return None
+        session_path = Path(session.filename).resolve()
+
         try:
             me = await self.get_me()
         except sqlite3.OperationalError as exc:
             if "locked" in str(exc).casefold():
-                return None
+                return types.SessionInfo.load(session_path)
             raise
 
         if not me:
+            get_session_info_path(session_path).unlink(missing_ok=True)
             return None
-        session = self.client().get_session()
-
-        if not isinstance(session, TGSession):
-            return None
-
-        session_path = Path(session.filename)
-
-        return types.SessionInfo(
-            path=session_path,
-            session_name=session_path.stem,
-            user_id=me.id,
-            user_name=me.username,
-            user_phone=me.phone,
-            user_display_name=format_me(me),
-        )
+        return self.client().save_session_info(me)
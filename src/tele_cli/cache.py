@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import itertools
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from telethon import utils
+from telethon.tl import types
+
+# dialogs of an active account fit easily, the entries are a few strings each.
+DEFAULT_MAXSIZE = 10_000
+# names and usernames rarely change, and updates refresh them anyway.
+DEFAULT_TTL = 6 * 60 * 60
+
+
+@dataclass(frozen=True, slots=True)
+class EntityMeta:
+    """What the daemon reports about a sender or a chat."""
+
+    # "first last" of a user, title of a chat or channel.
+    name: str | None
+    # only set for chats and channels.
+    title: str | None
+    # without "@".
+    username: str | None
+
+    @staticmethod
+    def from_entity(entity: object) -> EntityMeta | None:
+        match entity:
+            case types.User():
+                parts = [part.strip() for part in (entity.first_name, entity.last_name) if part and part.strip()]
+                name = " ".join(parts) or None
+                title = None
+            case types.Chat() | types.ChatForbidden() | types.Channel() | types.ChannelForbidden():
+                title = entity.title.strip() if entity.title and entity.title.strip() else None
+                name = title
+            case _:
+                return None
+
+        username = getattr(entity, "username", None)
+        if not username:
+            usernames = getattr(entity, "usernames", None) or []
+            username = next((x.username for x in usernames if getattr(x, "active", False)), None)
+        username = username.strip().removeprefix("@") if isinstance(username, str) else None
+        return EntityMeta(name=name, title=title, username=username or None)
+
+
+class EntityCache:
+    """
+    In-memory LRU of `EntityMeta` by marked peer id, entries expire after `ttl` seconds.
+
+    It is fed with every `users`/`chats` vector the session processes (see `TGSession.process_entities`),
+    which includes the ones that come with updates, so looking up the sender and chat of a new message
+    is a dict lookup. `lookup` falls back to a loader (e.g. `event.get_sender`) on a miss.
+
+    `stats()` reports the hit rate and the latency of misses.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, ttl: float = DEFAULT_TTL):
+        self._maxsize = max(maxsize, 1)
+        self._ttl = ttl
+        self._entries: OrderedDict[int, tuple[EntityMeta, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._miss_time = 0.0
+        self._miss_max = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def process_entities(self, tlo: object) -> None:
+        """Cache the `users`/`chats` carried by a TL result or update batch."""
+
+        users = getattr(tlo, "users", None) or []
+        chats = getattr(tlo, "chats", None) or []
+        if users or chats:
+            self.update(itertools.chain(users, chats))
+
+    def update(self, entities: Iterable[object]) -> None:
+        expires_at = time.monotonic() + self._ttl
+        for entity in entities:
+            meta = EntityMeta.from_entity(entity)
+            if meta is None:
+                continue
+            peer_id = utils.get_peer_id(entity)
+            # `min` entities may lack fields, never let them replace a complete entry.
+            if getattr(entity, "min", False) and peer_id in self._entries:
+                continue
+            self._entries[peer_id] = (meta, expires_at)
+            self._entries.move_to_end(peer_id)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, peer_id: int) -> EntityMeta | None:
+        entry = self._entries.get(peer_id)
+        if entry is None:
+            return None
+        (meta, expires_at) = entry
+        if expires_at <= time.monotonic():
+            del self._entries[peer_id]
+            return None
+        self._entries.move_to_end(peer_id)
+        return meta
+
+    async def lookup(self, peer_id: int | None, load: Callable[[], Awaitable[Any]]) -> EntityMeta | None:
+        """The cached metadata of `peer_id`, or of the entity `load()` returns (which is cached then)."""
+
+        if peer_id is None:
+            return None
+        meta = self.get(peer_id)
+        if meta is not None:
+            self.hits += 1
+            return meta
+
+        self.misses += 1
+        started = time.perf_counter()
+        try:
+            entity = await load()
+        except Exception:  # noqa: BLE001
+            entity = None
+        finally:
+            elapsed = time.perf_counter() - started
+            self._miss_time += elapsed
+            self._miss_max = max(self._miss_max, elapsed)
+
+        if entity is None:
+            return None
+        self.update([entity])
+        return EntityMeta.from_entity(entity)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self._maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "miss_latency_avg": round(self._miss_time / self.misses, 4) if self.misses else None,
+            "miss_latency_max": round(self._miss_max, 4),
+        }
@@ -1,31 +1,40 @@
 from __future__ import annotations
 
-import asyncio
-import builtins
-import json
-import sys
-from datetime import datetime, timedelta
+from collections.abc import AsyncIterator, Iterable
 from pathlib import Path
-from typing import Any, Annotated, Tuple, cast
+from typing import TYPE_CHECKING, Annotated, Any, TypeVar
 
-from tele_cli.types.tl import DialogType, EntityType
 import typer
-from telethon import events
-from telethon import hints
-from telethon.tl.functions.account import UpdateStatusRequest
-from telethon.tl.custom import Dialog, Message
-from telethon.tl.types import User, UserStatusOnline
-
-from tele_cli import utils
-from tele_cli.app import TGClient, TeleCLI
-from tele_cli.config import load_config
-from tele_cli.types import OutputFormat, OutputOrder, get_dialog_type
-from tele_cli.constant import VERSION
-from tele_cli.utils import print
+
+from tele_cli import constant
+from tele_cli.types.output import ExportFormat, OutputFormat, OutputOrder, OverflowPolicy
+from tele_cli.types.tl import DialogType, EntityType, SendPriority
+from tele_cli.utils.date import parse_date_range
 
 from .auth import auth_cli
 from .types import SharedArgs
 
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterable
+    from datetime import datetime
+
+    from telethon import events, hints
+    from telethon.tl.custom import Dialog, Message
+
+    from tele_cli.app import TGClient
+    from tele_cli.daemon import DaemonClient
+    from tele_cli.daemon.ipc import Emit
+    from tele_cli.download import DownloadResult
+    from tele_cli.export import ExportResult
+
+# NOTICE: keep module level imports light, `tele -h`/`tele -V` must not pay for telethon & co.
+#         each command imports what it needs in its body. see `benchmarks/startup.py`.
+
+_T = TypeVar("_T")
+
+# messages per dialog of `message list --type` without `-n` or `--from`.
+_SELECTED_DIALOG_LIMIT = 100
+
 cli = typer.Typer(
     epilog="Made by Huanan",
     add_completion=False,
@@ -68,9 +77,159 @@ cli.add_typer(message_cli, name="message")
 cli.add_typer(daemon_cli, name="daemon")
 
 
+async def _aiter(items: Iterable[_T]) -> AsyncIterator[_T]:
+    for item in items:
+        yield item
+
+
+def _rpc_fields(params: dict[str, Any]) -> list[str] | None:
+    """The `fields` of an RPC request: a list or a comma separated string, validated (see `FieldProjection`)."""
+
+    from tele_cli.utils.fields import FieldProjection, parse_fields
+
+    raw = params.get("fields")
+    fields = parse_fields(",".join(str(item) for item in raw) if isinstance(raw, list) else raw)
+    if fields:
+        FieldProjection(fields)
+    return fields
+
+
+async def _connect_daemon(cli_args: SharedArgs) -> DaemonClient | None:
+    """The running daemon serving the session of this invocation, if any (see `tele daemon start`)."""
+
+    if not cli_args.use_daemon:
+        return None
+
+    from tele_cli.daemon import connect_daemon
+
+    return await connect_daemon(cli_args.session)
+
+
+async def _iter_dialog_list_output(
+    client: TGClient,
+    fmt: OutputFormat,
+    dialog_types: list[DialogType] | None = None,
+    archived: bool = False,
+    cached: bool = False,
+    fields: list[str] | None = None,
+    max_age: float | None = None,
+) -> AsyncIterator[str]:
+    """Output of `tele dialog list`, shared by the command and the daemon."""
+
+    from tele_cli import utils
+    from tele_cli.types import get_dialog_type
+
+    if cached:
+        dialog_list, skipped = await client.list_dialogs_cached(dialog_types, archived=archived, max_age=max_age)
+        async for chunk in utils.fmt.iter_format_dialog_list(_aiter(dialog_list), fmt, fields=fields):
+            yield chunk
+        if skipped:
+            typer.echo(f"Warning: {skipped} dialog(s) skipped, their chat is not known locally; run `tele dialog list` to fetch it.", err=True)
+        return
+
+    async def _filter_dialogs(dialogs: AsyncIterable[Dialog]) -> AsyncIterator[Dialog]:
+        async for d in dialogs:
+            if not dialog_types or get_dialog_type(d) in dialog_types:
+                yield d
+
+    dialogs = _filter_dialogs(client.iter_dialogs(archived=None if archived else False))  # type: ignore[arg-type]
+    async for chunk in utils.fmt.iter_format_dialog_list(dialogs, fmt, fields=fields):
+        yield chunk
+
+
+async def _iter_message_list_output(
+    client: TGClient,
+    fmt: OutputFormat,
+    dialog_ids: list[int],
+    date_start: datetime | None = None,
+    date_end: datetime | None = None,
+    offset_id: int = 0,
+    limit: int | None = None,
+    order: OutputOrder = OutputOrder.asc,
+    local: bool = False,
+    fields: list[str] | None = None,
+    dialog_types: list[DialogType] | None = None,
+    all_unread: bool = False,
+    concurrency: int = 8,
+) -> AsyncIterator[str]:
+    """
+    Output of `tele message list`, shared by the command and the daemon.
+
+    Several dialogs (or any selected by `dialog_types` / `all_unread`) are merged into one stream by date,
+    every message tagged with its dialog.
+    """
+
+    from tele_cli import utils
+
+    messages: AsyncIterable[Message]
+    if len(dialog_ids) != 1 or dialog_types or all_unread:
+        if offset_id:
+            raise ValueError("offset_id needs a single dialog, message ids are per dialog")
+        min_ids: dict[int, int] = {}
+        if dialog_types or all_unread:
+            selected = await client.select_dialogs(dialog_types, unread=all_unread)
+            if all_unread:
+                # only the unread part of the selected dialogs, the listed ones are not narrowed.
+                min_ids = {dialog.id: dialog.dialog.read_inbox_max_id for dialog in selected if dialog.id not in dialog_ids}
+            elif limit is None and date_start is None:
+                # never the whole history of every dialog of a type.
+                limit = _SELECTED_DIALOG_LIMIT
+            dialog_ids = [*dialog_ids, *(dialog.id for dialog in selected)]
+        messages = client.iter_fetch_messages_many(
+            dialog_ids,
+            date_start=date_start,
+            date_end=date_end,
+            limit=limit,
+            reverse=order == OutputOrder.asc,
+            local=local,
+            concurrency=concurrency,
+            min_ids=min_ids,
+        )
+        async for chunk in utils.fmt.iter_format_message_list(messages, fmt, with_chat=True, fields=fields):
+            yield chunk
+        return
+
+    dialog_id = dialog_ids[0]
+    if local:
+        cached = await client.list_messages_cached(dialog_id, date_start=date_start, date_end=date_end, offset_id=offset_id, limit=limit)
+        if order == OutputOrder.asc:
+            cached.reverse()
+        messages = _aiter(cached)
+    else:
+        messages = client.iter_fetch_messages(
+            dialog_id,
+            date_start=date_start,
+            date_end=date_end,
+            offset_id=offset_id,
+            limit=limit,
+            reverse=order == OutputOrder.asc,
+        )
+
+    async for chunk in utils.fmt.iter_format_message_list(messages, fmt, fields=fields):
+        yield chunk
+
+
+async def _iter_unread_output(
+    client: TGClient,
+    fmt: OutputFormat,
+    dialog_types: list[DialogType] | None = None,
+    include_muted: bool = False,
+    limit: int | None = None,
+    concurrency: int = 8,
+    fields: list[str] | None = None,
+) -> AsyncIterator[str]:
+    """Output of `tele dialog unread`, shared by the command and the daemon."""
+
+    from tele_cli import utils
+
+    messages = client.iter_unread_messages(dialog_types, include_muted=include_muted, limit=limit, concurrency=concurrency)
+    async for chunk in utils.fmt.iter_format_message_list(messages, fmt, with_chat=True, fields=fields):
+        yield chunk
+
+
 def _version_callback(value: bool) -> None:
     if value:
-        typer.echo(f"tele-cli, version {VERSION}")
+        typer.echo(f"tele-cli, version {constant.VERSION}")
         raise typer.Exit()
 
 
@@ -108,10 +267,30 @@ def main(
         OutputFormat,
         typer.Option("--format", "-f", help="Output format."),
     ] = OutputFormat.text,
+    no_daemon: Annotated[
+        bool,
+        typer.Option("--no-daemon", help="Always connect directly, even if `tele daemon start` is running for the session."),
+    ] = False,
+    fields_str: Annotated[
+        str | None,
+        typer.Option(
+            "--fields",
+            help="Only these comma separated fields in JSON output of lists and daemon events, dotted paths reach into nested objects (e.g. `id,date,message,sender_id,media.document.id`).",
+        ),
+    ] = None,
 ) -> None:
     """Hei Hei"""
     _ = version
-    ctx.obj = SharedArgs(fmt=fmt, config_file=config_file, session=session)
+
+    from tele_cli.utils.fields import FieldProjection, parse_fields
+
+    fields = parse_fields(fields_str)
+    if fields:
+        try:
+            FieldProjection(fields)
+        except ValueError as exc:
+            raise typer.BadParameter(str(exc), param_hint="--fields") from exc
+    ctx.obj = SharedArgs(fmt=fmt, config_file=config_file, session=session, use_daemon=not no_daemon, fields=fields)
 
 
 @cli.command(name="me")
@@ -120,6 +299,13 @@ def me_get(ctx: typer.Context) -> None:
     Show the current authenticated Telegram account.
     """
 
+    import asyncio
+
+    from tele_cli import utils
+    from tele_cli.app import TeleCLI
+    from tele_cli.config import load_config
+    from tele_cli.utils import print
+
     cli_args: SharedArgs = ctx.obj
 
     async def _run() -> bool:
@@ -148,12 +334,25 @@ def dialog_list(
         bool,
         typer.Option("--archived", help="Include archived dialogs (otherwise hidden)."),
     ] = False,
+    cached: Annotated[
+        bool,
+        typer.Option("--cached", help="Answer from the local dialog snapshot instead of fetching the list."),
+    ] = False,
+    max_age: Annotated[
+        int,
+        typer.Option("--max-age", help="With --cached: seconds after which the snapshot is refreshed first (0 always refreshes)."),
+    ] = 300,
 ):
     """
     List dialogs from your account.
 
     Archived dialogs are hidden by default; use `--archived` to include them.
 
+    With --cached, the list comes from the snapshot stored next to the session, without a request.
+    Every fetched dialog list updates it, and a running daemon keeps it current from the update stream.
+    The first `--cached` run fills it with the whole list, and a snapshot last synced more than `--max-age`
+    seconds ago is refreshed first with the dialogs that changed since, also when a daemon answers.
+
     Text Format Template:
 
     `[TYPE.UI.STATE] [UNREAD COUNT] [DIALOG_ID] NAME`
@@ -165,27 +364,135 @@ def dialog_list(
     Examples:
     - `tele dialog list -t user`
     - `tele dialog list -t user -t channel --archived`
+    - `tele dialog list --cached -t group`
     """
 
+    import asyncio
+
+    from tele_cli.types import DaemonError
+    from tele_cli.utils import print_stream
+
     cli_args: SharedArgs = ctx.obj
 
     async def _run() -> bool:
+        daemon = await _connect_daemon(cli_args)
+        if daemon is not None:
+            params = {
+                "fmt": cli_args.fmt.value,
+                "types": [item.value for item in dialog_type_filters or []],
+                "archived": archived,
+                "cached": cached,
+                "max_age": max_age,
+                "fields": cli_args.fields,
+            }
+            async with daemon:
+                await print_stream(daemon.stream("list_dialogs", params), fmt=cli_args.fmt)
+            return True
+
+        from tele_cli.app import TeleCLI
+        from tele_cli.config import load_config
+
+        if cached:
+            app = await TeleCLI.create(session_name=cli_args.session, config=load_config(config_file=cli_args.config_file), read_only=True)
+            snapshot = app.client().get_dialog_snapshot()
+            if snapshot is not None and not snapshot.is_stale(max_age):
+                # answered locally, no need to connect.
+                await print_stream(
+                    _iter_dialog_list_output(
+                        app.client(), cli_args.fmt, dialog_types=dialog_type_filters, archived=archived, cached=True, fields=cli_args.fields
+                    ),
+                    fmt=cli_args.fmt,
+                )
+                return True
+            # the snapshot is filled (or refreshed) by fetching the list, which updates the session.
+            app.client().session.close()
+
         app = await TeleCLI.create(session_name=cli_args.session, config=load_config(config_file=cli_args.config_file))
+        async with app.client() as client:
+            await print_stream(
+                _iter_dialog_list_output(
+                    client, cli_args.fmt, dialog_types=dialog_type_filters, archived=archived, cached=cached, fields=cli_args.fields, max_age=max_age
+                ),
+                fmt=cli_args.fmt,
+            )
+        return True
+
+    try:
+        ok = asyncio.run(_run())
+    except DaemonError as exc:
+        typer.echo(f"Error: {exc}", err=True)
+        raise typer.Exit(code=1)
+    if not ok:
+        raise typer.Exit(code=1)
+
+
+@dialog_cli.command(name="unread")
+def dialog_unread(
+    ctx: typer.Context,
+    dialog_type_filters: Annotated[
+        list[DialogType] | None,
+        typer.Option("--type", "-t", help="Filter by dialog type."),
+    ] = None,
+    include_muted: Annotated[bool, typer.Option("--muted/--no-muted", help="Include muted dialogs.")] = False,
+    num: Annotated[int | None, typer.Option("--num", "-n", help="At most the newest N unread messages per dialog.")] = None,
+    concurrency: Annotated[int, typer.Option("--concurrency", min=1, help="Dialogs fetched at the same time.")] = 8,
+):
+    """
+    List the unread messages of every dialog.
+
+    Each dialog with unread messages contributes exactly the messages after its read mark,
+    fetched concurrently over one connection. Dialogs are written one after the other (oldest message first)
+    as soon as each is fetched, every message tagged with its dialog. Archived dialogs are not included.
 
-        dialog_list: list[Dialog] = await app.list_dialogs(with_archived=archived)
+    Examples:
+    - `tele dialog unread`
+    - `tele -f jsonl dialog unread -t group --muted -n 50`
+    """
+
+    import asyncio
 
-        def _filter_dialogs(dialogs: list[Dialog], dialog_types: list[DialogType] | None = None) -> list[Dialog]:
-            if not dialog_types:
-                return dialogs
+    from tele_cli.types import DaemonError
+    from tele_cli.utils import print_stream
 
-            return [d for d in dialogs if get_dialog_type(d) in dialog_types]
+    cli_args: SharedArgs = ctx.obj
 
-        dialog_list = _filter_dialogs(dialog_list, dialog_types=dialog_type_filters)
+    async def _run() -> bool:
+        daemon = await _connect_daemon(cli_args)
+        if daemon is not None:
+            params = {
+                "fmt": cli_args.fmt.value,
+                "types": [item.value for item in dialog_type_filters or []],
+                "include_muted": include_muted,
+                "limit": num,
+                "concurrency": concurrency,
+                "fields": cli_args.fields,
+            }
+            async with daemon:
+                await print_stream(daemon.stream("list_unread", params), fmt=cli_args.fmt)
+            return True
 
-        print(utils.fmt.format_dialog_list(dialog_list, cli_args.fmt), fmt=cli_args.fmt)
+        from tele_cli.app import TeleCLI
+        from tele_cli.config import load_config
+
+        app = await TeleCLI.create(session_name=cli_args.session, config=load_config(config_file=cli_args.config_file))
+        async with app.client() as client:
+            output = _iter_unread_output(
+                client,
+                cli_args.fmt,
+                dialog_types=dialog_type_filters,
+                include_muted=include_muted,
+                limit=num,
+                concurrency=concurrency,
+                fields=cli_args.fields,
+            )
+            await print_stream(output, fmt=cli_args.fmt)
         return True
 
-    ok = asyncio.run(_run())
+    try:
+        ok = asyncio.run(_run())
+    except DaemonError as exc:
+        typer.echo(f"Error: {exc}", err=True)
+        raise typer.Exit(code=1)
     if not ok:
         raise typer.Exit(code=1)
 
@@ -193,7 +500,10 @@ def dialog_list(
 @message_cli.command(name="list")
 def messages_list(
     ctx: typer.Context,
-    dialog_id: Annotated[int, typer.Argument(help="Dialog peer ID (see `tele dialog list`).")],
+    dialog_ids: Annotated[
+        list[int] | None,
+        typer.Argument(help="Dialog peer IDs (see `tele dialog list`), several are merged into one list."),
+    ] = None,
     from_str: Annotated[str | None, typer.Option("--from", help="Start boundary")] = None,
     to_str: Annotated[str | None, typer.Option("--to", help="End boundary")] = None,
     range_str: Annotated[
@@ -206,17 +516,42 @@ def messages_list(
         OutputOrder,
         typer.Option("--order", help="Output order by time."),
     ] = OutputOrder.asc,
+    local: Annotated[
+        bool,
+        typer.Option("--local", "--prefer-cache", help="Answer from the local archive, only fetch what it does not cover yet."),
+    ] = False,
+    dialog_type_filters: Annotated[
+        list[DialogType] | None,
+        typer.Option(
+            "--type", "-t", help=f"Also list the dialogs of this type (not archived), without -n/--from the latest {_SELECTED_DIALOG_LIMIT} messages of each."
+        ),
+    ] = None,
+    all_unread: Annotated[
+        bool,
+        typer.Option("--all-unread", help="Also list the unread messages of the dialogs with any (not archived, narrowed by --type)."),
+    ] = False,
+    concurrency: Annotated[int, typer.Option("--concurrency", min=1, help="Dialogs fetched at the same time.")] = 8,
 ):
     """
-    List messages from a dialog.
+    List messages from one or more dialogs.
 
     By default (no --num and no date filters), it fetches the latest message.
 
+    Several dialogs:
+    - Give several DIALOG_IDs, or select dialogs with --type and --all-unread.
+    - They are fetched concurrently over one connection and merged into a single list by date,
+      each message tagged with its dialog (`chat_id`).
+    - --num and the date filters apply to each dialog; --offset_id needs a single dialog.
+
     Filtering:
     - Limit with --num/-n.
     - Date filters: --from, --to, or --range.
     - --range takes priority over --from and --to.
 
+    Local archive:
+    - With --local, messages are read from the archive filled by `tele message sync`.
+    - Only messages newer than the archive, or older than what it covers, are fetched (and archived).
+
     Date input:
     - --from/--to use `dateparser.parse`, e.g. "+1d", "yesterday", "2 weeks ago".
     - --range uses `dateparser.search.search_dates`, e.g. "last week", "next month".
@@ -228,78 +563,338 @@ def messages_list(
     3. `tele message list 1375282077 --from "2025-02-05" --to "yestarday"`
     4. `tele message list 1375282077 --from "-5d"`
     5. `tele message list 1375282077 --from "today" -n 100`
+    6. `tele message list 1375282077 --local --range "last week"`
+    7. `tele message list 1375282077 777000 --from "today"`
+    8. `tele message list --all-unread -t group -n 20`
     """
+    import asyncio
+
+    from tele_cli.types import DaemonError
+    from tele_cli.utils import print_stream
+
     cli_args: SharedArgs = ctx.obj
 
-    date_range: Tuple[datetime | None, datetime | None] = (None, None)
-    if True:
-        """convert from_str, to_str, range_str to date_range"""
-        import dateparser
-        from dateparser.search import search_dates
-
-        date_from: datetime | None = None
-        if from_str:
-            date_from = dateparser.parse(from_str)
-            date_from = date_from and date_from.replace(hour=0, minute=0, second=0, microsecond=0)
-
-        date_to: datetime | None = None
-        if to_str:
-            date_to = dateparser.parse(to_str)
-            date_to = date_to and date_to.replace(hour=23, minute=59, second=59, microsecond=0)
-
-        date_span: list[datetime] | None = None
-        if range_str and range_str == "this week":
-            start_date = dateparser.parse("sunday")
-            assert start_date is not None
-            date_span = [start_date, start_date + timedelta(days=6)]
-        elif range_str:
-            dates = search_dates(range_str, settings={"RETURN_TIME_SPAN": True}) or []
-            if len(dates) == 2:
-                # https://github.com/scrapinghub/dateparser/blob/cd5f226454e0ed3fe93164e7eff55b00f57e57c7/dateparser/search/search.py#L202
-                start = next((x for (s, x) in dates if "start" in s), None)
-                end = next((x for (s, x) in dates if "end" in s), None)
-                if start and end:
-                    date_span = [start, end]
-        if date_span:
-            date_range = (date_span[0], date_span[1])
-        else:
-            date_range = (date_from, date_to)
+    dialog_ids = dialog_ids or []
+    if not dialog_ids and not dialog_type_filters and not all_unread:
+        raise typer.BadParameter("Give a DIALOG_ID, --type or --all-unread.")
+    if offset_id and (len(dialog_ids) != 1 or dialog_type_filters or all_unread):
+        raise typer.BadParameter("--offset_id needs a single dialog, message ids are per dialog.")
+
+    (date_start, date_end) = parse_date_range(from_str=from_str, to_str=to_str, range_str=range_str)
 
     limit: int | None = None
     if num:
         limit = num
-    if limit == 0 and date_range == (None, None):
+    if limit == 0 and (date_start, date_end) == (None, None):
         limit = 1
 
+    async def _run() -> bool:
+        daemon = await _connect_daemon(cli_args)
+        if daemon is not None:
+            params = {
+                "fmt": cli_args.fmt.value,
+                "dialog_ids": dialog_ids,
+                "types": [item.value for item in dialog_type_filters or []],
+                "all_unread": all_unread,
+                "concurrency": concurrency,
+                # aware, so the daemon does not depend on the local time zone of this process.
+                "date_start": date_start and date_start.astimezone().isoformat(),
+                "date_end": date_end and date_end.astimezone().isoformat(),
+                "offset_id": offset_id,
+                "limit": limit,
+                "order": order.value,
+                "local": local,
+                "fields": cli_args.fields,
+            }
+            async with daemon:
+                await print_stream(daemon.stream("list_messages", params), fmt=cli_args.fmt)
+            return True
+
+        from tele_cli.app import TeleCLI
+        from tele_cli.config import load_config
+
+        app = await TeleCLI.create(session_name=cli_args.session, config=load_config(config_file=cli_args.config_file))
+        async with app.client() as client:
+            output = _iter_message_list_output(
+                client,
+                cli_args.fmt,
+                dialog_ids,
+                date_start=date_start,
+                date_end=date_end,
+                offset_id=offset_id,
+                limit=limit,
+                order=order,
+                local=local,
+                fields=cli_args.fields,
+                dialog_types=dialog_type_filters,
+                all_unread=all_unread,
+                concurrency=concurrency,
+            )
+            await print_stream(output, fmt=cli_args.fmt)
+        return True
+
+    try:
+        ok = asyncio.run(_run())
+    except DaemonError as exc:
+        typer.echo(f"Error: {exc}", err=True)
+        raise typer.Exit(code=1)
+    if not ok:
+        raise typer.Exit(code=1)
+
+
+@message_cli.command(name="sync")
+def messages_sync(
+    ctx: typer.Context,
+    dialog_id: Annotated[int, typer.Argument(help="Dialog peer ID (see `tele dialog list`).")],
+    num: Annotated[
+        int | None,
+        typer.Option("--num", "-n", help="First sync only: archive the latest N messages instead of the whole history."),
+    ] = None,
+):
+    """
+    Archive messages of a dialog locally.
+
+    The first sync archives the dialog from its newest message backwards,
+    later syncs only fetch messages newer than the last archived one.
+
+    Read the archive with `tele message list --local`.
+
+    Examples:
+    1. `tele message sync 1375282077`
+    2. `tele message sync 1375282077 -n 1000`
+    """
+    import asyncio
+
+    from tele_cli import utils
+    from tele_cli.app import TeleCLI
+    from tele_cli.config import load_config
+    from tele_cli.utils import print
+
+    cli_args: SharedArgs = ctx.obj
+
     async def _run() -> bool:
         app = await TeleCLI.create(session_name=cli_args.session, config=load_config(config_file=cli_args.config_file))
+        state = await app.sync_messages(dialog_id, limit=num)
+        if state is None:
+            return False
 
-        (date_start, date_end) = date_range
-        earliest_message: Message | None = None
-        if date_start:
-            async with app.client() as client:
-                ret: list[Message] = [msg async for msg in client.iter_messages(dialog_id, offset_date=date_start, limit=1, offset_id=-1)]
-                earliest_message = ret[0] if len(ret) >= 1 else None
+        print(utils.fmt.format_sync_state(state, cli_args.fmt), fmt=cli_args.fmt)
+        return True
+
+    ok = asyncio.run(_run())
+    if not ok:
+        raise typer.Exit(code=1)
+
+
+@message_cli.command(name="download")
+def messages_download(
+    ctx: typer.Context,
+    dialog_id: Annotated[int, typer.Argument(help="Dialog peer ID (see `tele dialog list`).")],
+    out: Annotated[
+        Path,
+        typer.Option("--out", "-o", file_okay=False, help="Directory the files are written to, created if needed."),
+    ] = Path("."),
+    from_str: Annotated[str | None, typer.Option("--from", help="Start boundary")] = None,
+    to_str: Annotated[str | None, typer.Option("--to", help="End boundary")] = None,
+    range_str: Annotated[
+        str | None,
+        typer.Option("--range", help="Natural-language date range (overrides --from/--to)."),
+    ] = None,
+    num: Annotated[int | None, typer.Option("--num", "-n", help="Maximum number of messages to look at, newest first.")] = None,
+    offset_id: Annotated[int, typer.Option("--offset_id", help="Pagination offset message ID (excluded).")] = 0,
+    jobs: Annotated[int, typer.Option("--jobs", "-j", min=1, help="Files downloaded at the same time.")] = 4,
+    parts: Annotated[int, typer.Option("--parts", min=1, help="Parallel parts per large file.")] = 4,
+):
+    """
+    Download the media (documents and photos) of messages from a dialog.
+
+    Messages are selected like in `tele message list`; without --num and date filters, the whole history is scanned.
+
+    - Files are named `<message id>-<file name>` in --out.
+    - An interrupted download resumes where it stopped on the next run (see the `.part` files).
+    - A file is never downloaded twice: media already downloaded to --out (e.g. the same sticker) is skipped.
+
+    Examples:
+    1. `tele message download 1375282077 -n 100 -o ./media`
+    2. `tele message download 1375282077 --range "last week" -j 8`
+    """
+    import asyncio
 
-        min_id: int = earliest_message.id if earliest_message else 0
+    from tele_cli import utils
+    from tele_cli.app import TeleCLI
+    from tele_cli.config import load_config
+    from tele_cli.download import MediaDownloader
+    from tele_cli.utils import print_stream
 
+    cli_args: SharedArgs = ctx.obj
+
+    (date_start, date_end) = parse_date_range(from_str=from_str, to_str=to_str, range_str=range_str)
+
+    async def _run() -> bool:
+        app = await TeleCLI.create(session_name=cli_args.session, config=load_config(config_file=cli_args.config_file))
         async with app.client() as client:
-            messages: list[Message] = [
-                msg
-                async for msg in client.iter_messages(
-                    dialog_id,
-                    min_id=min_id,
-                    add_offset=(-1 if min_id else 0),
-                    offset_id=offset_id,
-                    offset_date=date_end,
-                    limit=limit,  # type: ignore[arg-type]  # Telethon accepts None despite annotation
+            messages = client.iter_fetch_messages(dialog_id, date_start=date_start, date_end=date_end, offset_id=offset_id, limit=num)
+            downloader = MediaDownloader(client, out, jobs=jobs, parts=parts)
+            failed = 0
+
+            async def _results() -> AsyncIterator[DownloadResult]:
+                nonlocal failed
+                async for result in downloader.download_all(messages):
+                    failed += result.status == "failed"
+                    yield result
+
+            await print_stream(utils.fmt.iter_format_download_results(_results(), cli_args.fmt), fmt=cli_args.fmt)
+        return failed == 0
+
+    ok = asyncio.run(_run())
+    if not ok:
+        raise typer.Exit(code=1)
+
+
+@message_cli.command(name="export")
+def messages_export(
+    ctx: typer.Context,
+    dialog_ids: Annotated[list[int], typer.Argument(help="Dialog peer IDs (see `tele dialog list`).")],
+    out: Annotated[
+        Path,
+        typer.Option("--out", "-o", file_okay=False, help="Directory the export is written to, created if needed."),
+    ],
+    export_fmt: Annotated[ExportFormat, typer.Option("--format", help="File format: JSON lines, or TOON tables.")] = ExportFormat.jsonl,
+    workers: Annotated[int, typer.Option("--workers", "-w", min=0, help="Processes serializing messages, 0 to do it inline.")] = 2,
+    rotate_mb: Annotated[int, typer.Option("--rotate-mb", min=1, help="Continue in a new file once one is this large.")] = 256,
+    takeout: Annotated[
+        bool,
+        typer.Option("--takeout/--no-takeout", help="Fetch through a takeout session, with the relaxed limits of data exports."),
+    ] = True,
+):
+    """
+    Export the whole history of dialogs to files, oldest message first.
+
+    - Each dialog goes to `<out>/<peer id>/messages-00001.jsonl`, `messages-00002.jsonl`, ...
+    - JSON lines are the messages of `tele message list -f jsonl`; TOON files hold tables of 100 messages
+      with the columns id, date, chat_id, sender_id, out, reply_to_msg_id, media, message.
+    - `<out>/.tele-export.json` records the last exported message of each dialog: an interrupted export
+      resumes where it stopped, running it again later only appends the new messages.
+
+    Takeout:
+    - Telegram may ask to allow the export from another logged-in app first, and to retry after a delay.
+    - Use --no-takeout to export at the normal limits instead.
+
+    Examples:
+    1. `tele message export 1375282077 -o ./export`
+    2. `tele message export 1375282077 777000 -o ./export --format toon -w 4`
+    """
+    import asyncio
+
+    from telethon.errors import TakeoutInitDelayError
+
+    from tele_cli import utils
+    from tele_cli.app import TeleCLI
+    from tele_cli.config import load_config
+    from tele_cli.export import MessageExporter
+    from tele_cli.utils import print_stream
+
+    cli_args: SharedArgs = ctx.obj
+
+    async def _export(client: TGClient, wait_time: float | None) -> bool:
+        exporter = MessageExporter(client, out, fmt=export_fmt, workers=workers, rotate_size=rotate_mb * 1024 * 1024, wait_time=wait_time)
+        failed = 0
+
+        async def _results() -> AsyncIterator[ExportResult]:
+            nonlocal failed
+            async for result in exporter.export_all(dialog_ids):
+                failed += result.status == "failed"
+                yield result
+
+        await print_stream(utils.fmt.iter_format_export_results(_results(), cli_args.fmt), fmt=cli_args.fmt)
+        return failed == 0
+
+    async def _run() -> bool:
+        app = await TeleCLI.create(session_name=cli_args.session, config=load_config(config_file=cli_args.config_file))
+        async with app.client() as client:
+            if not takeout:
+                return await _export(client, wait_time=None)
+
+            session = client.get_session()
+            # an unfinished takeout of this session (e.g. an interrupted export) is continued.
+            if session is not None and session.takeout_id is not None:
+                takeout_client = client.takeout(finalize=True)
+            else:
+                takeout_client = client.takeout(finalize=True, users=True, chats=True, megagroups=True, channels=True)
+            try:
+                async with takeout_client as tclient:
+                    return await _export(tclient, wait_time=0)
+            except TakeoutInitDelayError as exc:
+                typer.echo(
+                    f"Error: Telegram delays the takeout session by {exc.seconds}s, allow it from another app or use --no-takeout.",
+                    err=True,
                 )
-            ]
-            if order == OutputOrder.asc:
-                messages = list(reversed(messages))
+                return False
+
+    ok = asyncio.run(_run())
+    if not ok:
+        raise typer.Exit(code=1)
+
+
+@message_cli.command(name="search")
+def messages_search(
+    ctx: typer.Context,
+    query: Annotated[str, typer.Argument(help="Words to search for.")],
+    dialog_ids: Annotated[
+        list[int] | None,
+        typer.Option("--dialog", "-d", help="Only search this dialog peer ID. Can be used multiple times."),
+    ] = None,
+    from_str: Annotated[str | None, typer.Option("--from", help="Start boundary")] = None,
+    to_str: Annotated[str | None, typer.Option("--to", help="End boundary")] = None,
+    range_str: Annotated[
+        str | None,
+        typer.Option("--range", help="Natural-language date range (overrides --from/--to)."),
+    ] = None,
+    num: Annotated[int, typer.Option("--num", "-n", help="Maximum number of hits.")] = 20,
+    fts: Annotated[
+        bool,
+        typer.Option("--fts", help='Treat QUERY as a SQLite FTS5 expression (e.g. `deploy OR release`, `"exact phrase"`, `pref*`).'),
+    ] = False,
+):
+    """
+    Search messages in the local archive, best match first.
 
-            print(utils.fmt.format_message_list(messages, cli_args.fmt), fmt=cli_args.fmt)
+    Only messages that were fetched before are searched: by `tele message list`,
+    `tele message sync` or the daemon. No network request is made.
 
+    By default, hits contain all words of QUERY.
+    Date options work as in `tele message list`.
+
+    Examples:
+    1. `tele message search "release notes"`
+    2. `tele message search deploy -d 1375282077 --range "last week"`
+    3. `tele message search "deploy OR release" --fts -n 50`
+    """
+    import asyncio
+    import sqlite3
+
+    from tele_cli import utils
+    from tele_cli.app import TeleCLI
+    from tele_cli.config import load_config
+    from tele_cli.store import fts_quote
+    from tele_cli.utils import print_stream
+
+    cli_args: SharedArgs = ctx.obj
+
+    (date_start, date_end) = parse_date_range(from_str=from_str, to_str=to_str, range_str=range_str)
+    match_query = query if fts else fts_quote(query)
+    if not match_query:
+        raise typer.BadParameter("QUERY is empty.")
+
+    async def _run() -> bool:
+        app = await TeleCLI.create(session_name=cli_args.session, config=load_config(config_file=cli_args.config_file), read_only=True)
+        try:
+            messages = app.client().search_messages(match_query, peer_ids=dialog_ids, date_start=date_start, date_end=date_end, limit=num)
+        except sqlite3.OperationalError as exc:
+            raise typer.BadParameter(f"Invalid search query: {exc}") from exc
+
+        output = utils.fmt.iter_format_message_list(_aiter(messages), cli_args.fmt, with_chat=True, fields=cli_args.fields)
+        await print_stream(output, fmt=cli_args.fmt)
         return True
 
     ok = asyncio.run(_run())
@@ -329,6 +924,10 @@ def message_send(
         list[Path] | None,
         typer.Option("--file", help="Attach local file(s). Can be used multiple times."),
     ] = None,
+    priority: Annotated[
+        SendPriority,
+        typer.Option("--priority", help="Send lane: `interactive` goes before `normal` before `bulk` when sends are rate limited."),
+    ] = SendPriority.normal,
 ):
     """
     Send a message to RECEIVER.
@@ -346,6 +945,10 @@ def message_send(
     3. `tele message send "My Group" "hi"`
     4. `tele message send -t peer_id "-1001234567890" "hi"`
     """
+    import asyncio
+
+    from tele_cli.types import DaemonError
+
     cli_args: SharedArgs = ctx.obj
 
     entity: int | str
@@ -356,6 +959,24 @@ def message_send(
             entity = receiver
 
     async def _run() -> bool:
+        daemon = await _connect_daemon(cli_args)
+        if daemon is not None:
+            params = {
+                "receiver": receiver,
+                "message": content,
+                "entity_type": entity_type.value if entity_type else None,
+                "reply_to": reply_to,
+                # the daemon does not run in our working directory.
+                "file": [str(item.resolve()) for item in file or []],
+                "priority": priority.value,
+            }
+            async with daemon:
+                await daemon.request("send_message", params)
+            return True
+
+        from tele_cli.app import TeleCLI
+        from tele_cli.config import load_config
+
         app = await TeleCLI.create(session_name=cli_args.session, config=load_config(config_file=cli_args.config_file))
         file_args: list[hints.FileLike] = [str(item) for item in (file or [])]
         await app.send_message(
@@ -363,11 +984,16 @@ def message_send(
             content,
             reply_to=reply_to,
             file=file_args or None,
+            priority=priority,
         )
 
         return True
 
-    ok = asyncio.run(_run())
+    try:
+        ok = asyncio.run(_run())
+    except DaemonError as exc:
+        typer.echo(f"Error: {exc}", err=True)
+        raise typer.Exit(code=1)
     if not ok:
         raise typer.Exit(code=1)
 
@@ -382,34 +1008,89 @@ def daemon_start(
             help="Enable newline-delimited JSON RPC over stdio.",
         ),
     ] = False,
+    socket: Annotated[
+        bool,
+        typer.Option(
+            "--socket/--no-socket",
+            help="Serve the same RPC on a Unix socket next to the session, one-shot commands are routed through it.",
+        ),
+    ] = True,
+    rpc_concurrency: Annotated[
+        int,
+        typer.Option("--rpc-concurrency", min=1, help="Maximum number of RPC requests executed at the same time."),
+    ] = 8,
+    rpc_timeout: Annotated[
+        float,
+        typer.Option(
+            "--rpc-timeout",
+            min=0,
+            help="Default deadline of an RPC request in seconds, queueing included. A request can set its own `timeout`. 0 disables it.",
+        ),
+    ] = 600,
+    output_buffer: Annotated[
+        int,
+        typer.Option("--output-buffer", min=1, help="`--rpc-stdio`: lines buffered for a slow reader before the overflow policy applies."),
+    ] = 1024,
+    output_overflow: Annotated[
+        OverflowPolicy,
+        typer.Option(
+            "--output-overflow",
+            help="`--rpc-stdio`: when the buffer is full, wait (block), discard the oldest event (drop-oldest) or buffer events on disk (spill). "
+            "Responses are never discarded; losses are reported as `output_overflow` events.",
+        ),
+    ] = OverflowPolicy.block,
+    sessions: Annotated[
+        list[str] | None,
+        typer.Option(
+            "--session",
+            help="Session to host, repeat it to host several accounts in this process. \\[default: the global `--session`, or Current]",
+        ),
+    ] = None,
+    all_sessions: Annotated[
+        bool,
+        typer.Option("--all-sessions", help="Host every local session (see `tele auth list`)."),
+    ] = False,
 ) -> None:
     """
     Start daemon and print all incoming new messages.
-    """
 
-    cli_args: SharedArgs = ctx.obj
+    Several sessions can be hosted by one daemon, each with its own connected client on a shared event loop.
+    Their events carry the `account` (session name) they belong to, RPC requests select one with an `account` field.
 
-    async def _resolve_entity_with_client(client: TGClient, target: str | int) -> hints.EntityLike:
-        # Fast path: Telethon resolver (username, phone, id).
-        try:
-            ret = await client.get_input_entity(target)
-            return ret
-        except Exception:
-            pass
+    While it runs, `tele dialog list`, `tele message list` and `tele message send` for a hosted session
+    are answered by the daemon's connected client instead of opening their own connection.
 
-        if isinstance(target, int):
-            return target
-
-        target_norm = target.casefold()
-        async for dialog in client.iter_dialogs():
-            name = (dialog.name or "").casefold()
-            if target_norm and target_norm in name:
-                return dialog.entity
+    The daemon continues from the update state it saved when it last ran: messages received meanwhile are emitted
+    right after the `ready` event, in order. Messages recovered this way (or after a gap, e.g. a reconnect) are
+    marked with `catchup: true`, a message delivered twice is emitted once.
+    """
 
-            if str(dialog.id) == target or str(dialog.entity.id) == target:
-                return dialog.entity
+    import asyncio
+    import contextlib
+    import functools
+    import json
+    import sqlite3
+    import sys
+    from collections.abc import Callable
+    from datetime import datetime, timedelta
+    from typing import cast
+
+    from telethon import events, hints
+    from telethon.tl.custom import Message
+    from telethon.tl.functions.account import UpdateStatusRequest
+    from telethon.utils import get_peer_id
+    from telethon.tl.types import User, UserStatusOnline
+
+    from tele_cli import utils
+    from tele_cli.app import TeleCLI
+    from tele_cli.config import load_config
+    from tele_cli.daemon import AccountRouter, DaemonAccount, OutputPipeline, RpcDispatcher, get_socket_path, serve_unix_socket
+    from tele_cli.shared import list_session_name
+    from tele_cli.types import DaemonError, is_difference_update
+    from tele_cli.utils import print
+    from tele_cli.utils.fields import FieldProjection
 
-        return target
+    cli_args: SharedArgs = ctx.obj
 
     async def _send_message_with_connected_client(
         client: TGClient,
@@ -418,40 +1099,33 @@ def daemon_start(
         entity_type_str: str | None = None,
         reply_to: int | None = None,
         file_paths: list[str] | None = None,
+        priority: SendPriority = SendPriority.normal,
     ) -> bool:
         entity: str | int = receiver
         if entity_type_str == EntityType.peer_id.value:
             entity = int(receiver)
 
-        resolved = await _resolve_entity_with_client(client=client, target=entity)
-        if reply_to is None and not file_paths:
-            await client.send_message(resolved, message)
-        elif reply_to is None:
-            await client.send_message(resolved, message, file=cast(hints.FileLike | list[hints.FileLike], file_paths))
-        elif not file_paths:
-            await client.send_message(resolved, message, reply_to=reply_to)
-        else:
-            await client.send_message(
-                resolved,
-                message,
-                reply_to=reply_to,
-                file=cast(hints.FileLike | list[hints.FileLike], file_paths),
-            )
+        resolved = await client.resolve_entity(entity)
+        kwargs: dict[str, Any] = {}
+        if reply_to is not None:
+            kwargs["reply_to"] = reply_to
+        if file_paths:
+            kwargs["file"] = cast(hints.FileLike | list[hints.FileLike], file_paths)
+        await client.send_message_scheduled(resolved, message, priority=priority, **kwargs)
         await client(UpdateStatusRequest(offline=True))
         return True
 
     async def _run() -> bool:
-        app = await TeleCLI.create(session_name=cli_args.session, config=load_config(config_file=cli_args.config_file))
-        async with app.client() as client:
-            is_authorized = await client.is_user_authorized()
-            if not is_authorized:
-                return False
+        config = load_config(config_file=cli_args.config_file)
+        if all_sessions:
+            session_names: list[str | None] = list(await list_session_name())
+        else:
+            session_names = list(sessions or [cli_args.session])
+        multi = len(session_names) > 1
 
-            emit_lock = asyncio.Lock()
+        async with contextlib.AsyncExitStack() as stack:
             stop_event = asyncio.Event()
-            me = await client.get_me()
-            self_user_id = int(me.id) if isinstance(me, User) else None
-            self_online = isinstance(getattr(me, "status", None), UserStatusOnline)
+            router = AccountRouter()
 
             def _json_default(value: object) -> object:
                 if isinstance(value, datetime):
@@ -473,147 +1147,431 @@ def daemon_start(
                         pass
                 return repr(value)
 
-            async def _emit_json(obj: dict[str, object]) -> None:
-                line = json.dumps(obj, ensure_ascii=False, default=_json_default)
-                async with emit_lock:
-                    while True:
-                        try:
-                            builtins.print(line, flush=True)
-                            return
-                        except BlockingIOError:
-                            try:
-                                loop = asyncio.get_running_loop()
-                                writable = loop.create_future()
-
-                                def _on_writable() -> None:
-                                    if not writable.done():
-                                        writable.set_result(None)
-
-                                fd = sys.stdout.fileno()
-                                loop.add_writer(fd, _on_writable)
-                                try:
-                                    await writable
-                                finally:
-                                    loop.remove_writer(fd)
-                            except Exception:
-                                await asyncio.sleep(0.01)
-                        except BrokenPipeError:
-                            # Downstream consumer closed stdout; stop emitting.
-                            return
-
-            def _normalize_username(value: object) -> str | None:
-                if not isinstance(value, str):
-                    return None
-                raw = value.strip()
-                if not raw:
-                    return None
-                return raw[1:] if raw.startswith("@") else raw
+            output: OutputPipeline | None = None
+            if rpc_stdio:
+                output = OutputPipeline(maxsize=output_buffer, policy=output_overflow)
+                await output.start(sys.stdout)
+                # flushed before the clients disconnect.
+                stack.push_async_callback(output.aclose)
 
-            def _build_name(*parts: object) -> str | None:
-                tokens = [str(part).strip() for part in parts if isinstance(part, str) and str(part).strip()]
-                if not tokens:
-                    return None
-                return " ".join(tokens)
+            async def _emit_json(obj: dict[str, object], droppable: bool = False) -> None:
+                if output is not None:
+                    await output.emit(json.dumps(obj, ensure_ascii=False, default=_json_default), droppable=droppable)
 
-            async def _refresh_self_online() -> None:
-                nonlocal self_online
+            async def _refresh_self_online(account: DaemonAccount) -> None:
                 try:
-                    current = await client.get_me()
+                    current = await account.client.get_me()
                     if current is None:
                         return
-                    self_online = isinstance(getattr(current, "status", None), UserStatusOnline)
+                    account.self_online = isinstance(getattr(current, "status", None), UserStatusOnline)
                 except Exception:
                     return
 
-            async def on_user_status_change(event: events.UserUpdate.Event) -> None:
-                nonlocal self_online
-                if self_user_id is None:
-                    return
-                if int(getattr(event, "user_id", 0)) != self_user_id:
-                    return
-                self_online = bool(getattr(event, "online", False))
+            # `--fields` of the `new_message` payload, the fields computed from the sender/chat entity.
+            event_fields = FieldProjection(cli_args.fields) if cli_args.fields else None
+            sender_fields = {"sender_name", "sender_username"}
+            chat_fields = {"chat_title", "chat_username"}
+
+            # done once `ready` is written, no event is emitted before it.
+            ready_sent: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+
+            def _add_event_handlers(account: DaemonAccount) -> None:
+                client = account.client
+                client.mark_difference_updates()
+                entity_index = client.get_entity_index()
+                message_archive = client.get_message_archive()
+                daemon_state = client.get_daemon_state()
+                entity_cache = account.entity_cache
+                # done once the previous message was emitted: lookups overlap, events keep the order of the updates.
+                # the first one waits for the `ready` event.
+                emitted: asyncio.Future[None] | None = ready_sent
+
+                async def on_user_status_change(event: events.UserUpdate.Event) -> None:
+                    if account.user_id is None:
+                        return
+                    if int(getattr(event, "user_id", 0)) != account.user_id:
+                        return
+                    account.self_online = bool(getattr(event, "online", False))
 
-            async def on_new_message(event: events.NewMessage.Event) -> None:
-                msg = event.message
-                if not isinstance(msg, Message):
-                    return
-                if not rpc_stdio:
-                    print(utils.fmt.format_message_list([msg], cli_args.fmt), fmt=cli_args.fmt)
-                    return
-                try:
-                    sender_name: str | None = None
-                    sender_username: str | None = None
-                    chat_title: str | None = None
-                    chat_username: str | None = None
+                async def on_new_message(event: events.NewMessage.Event) -> None:
+                    nonlocal emitted
+                    msg = event.message
+                    if not isinstance(msg, Message):
+                        return
                     try:
-                        sender = await event.get_sender()
-                        sender_title = getattr(sender, "title", None)
-                        sender_title_text = sender_title.strip() if isinstance(sender_title, str) and sender_title.strip() else None
-                        sender_name = (
-                            _build_name(
-                                getattr(sender, "first_name", None),
-                                getattr(sender, "last_name", None),
-                            )
-                            or sender_title_text
-                        )
-                        sender_username = _normalize_username(getattr(sender, "username", None))
-                    except Exception:
-                        pass
+                        first = daemon_state is None or msg.chat_id is None or daemon_state.mark_seen(msg.chat_id, msg.id)
+                    except sqlite3.Error:
+                        # rather emitted twice than lost.
+                        first = True
+                    if not first:
+                        return
+                    # recovered by fetching the difference (see `TGClient.resume_updates`), not pushed live.
+                    catchup = is_difference_update(event.original_update)
+                    if entity_index is not None and msg.chat_id is not None:
+                        # senders and chats are indexed by the session, keep the dialog order fresh here.
+                        entity_index.mark_dialogs([(msg.chat_id, msg.date)])
+                    if message_archive is not None:
+                        # committed with the session (every minute and on shutdown).
+                        message_archive.store([msg])
+                    if not rpc_stdio:
+                        prefix = f"[{account.name}] " if multi and cli_args.fmt == OutputFormat.text else ""
+                        print(prefix + utils.fmt.format_message_list([msg], cli_args.fmt, fields=cli_args.fields), fmt=cli_args.fmt)
+                        return
+                    (previous, emitted) = (emitted, asyncio.get_running_loop().create_future())
+                    done = emitted
                     try:
-                        chat = await event.get_chat()
-                        raw_chat_title = getattr(chat, "title", None)
-                        if isinstance(raw_chat_title, str) and raw_chat_title.strip():
-                            chat_title = raw_chat_title.strip()
-                        chat_username = _normalize_username(getattr(chat, "username", None))
+                        # served from the entity cache, `get_sender`/`get_chat` only run (and may hit the network) on a miss.
+                        # with `--fields`, only looked up if one of their fields was asked for.
+                        roots = event_fields.roots if event_fields is not None else None
+                        sender = await entity_cache.lookup(msg.sender_id, event.get_sender) if roots is None or roots & sender_fields else None
+                        chat = await entity_cache.lookup(msg.chat_id, event.get_chat) if roots is None or roots & chat_fields else None
+
+                        computed: dict[str, Callable[[], object]] = {
+                            "sender_name": lambda: sender.name if sender else None,
+                            "sender_username": lambda: sender.username if sender else None,
+                            "chat_title": lambda: chat.title if chat else None,
+                            "chat_username": lambda: chat.username if chat else None,
+                            "self_online": lambda: account.self_online,
+                        }
+                        if event_fields is not None:
+                            # anything else is read from the message, e.g. `media.document.id`.
+                            payload = event_fields.apply(msg, extra=computed)
+                        else:
+
+                            def _maybe_to_dict(value: object | None) -> object | None:
+                                if value is None:
+                                    return None
+                                to_dict = getattr(value, "to_dict", None)
+                                if callable(to_dict):
+                                    return to_dict()
+                                return None
+
+                            # Keep daemon event payload compact to avoid stdout back-pressure stalls.
+                            payload = {
+                                "id": msg.id,
+                                "message": msg.message,
+                                "date": msg.date,
+                                "out": msg.out,
+                                "post": msg.post,
+                                "peer_id": _maybe_to_dict(getattr(msg, "peer_id", None)),
+                                "from_id": _maybe_to_dict(getattr(msg, "from_id", None)),
+                                "sender_id": msg.sender_id,
+                                **{key: compute() for key, compute in computed.items()},
+                            }
+                        if previous is not None:
+                            # not cancelled along with this handler.
+                            await asyncio.wait([previous])
+                        await _emit_json(
+                            {
+                                "type": "event",
+                                "event": "new_message",
+                                "account": account.name,
+                                "catchup": catchup,
+                                "payload": payload,
+                            },
+                            droppable=True,
+                        )
                     except Exception:
-                        pass
+                        # Never crash the Telethon update loop because of stdout back-pressure.
+                        return
+                    finally:
+                        done.set_result(None)
+
+                async def on_raw_update(update: object) -> None:
+                    # committed with the session, like the archive.
+                    client.process_dialog_update(update)
+
+                client.add_event_handler(on_new_message, events.NewMessage())
+                client.add_event_handler(on_user_status_change, events.UserUpdate())
+                client.add_event_handler(on_raw_update, events.Raw())
+
+            async def _open_account(session_name: str | None) -> DaemonAccount | None:
+                app = await TeleCLI.create(session_name=session_name, config=config)
+                client = await stack.enter_async_context(app.client())
+                if not await client.is_user_authorized():
+                    typer.echo(f"Warning: session {session_name or 'Current'} is not authorized, skipped.", err=True)
+                    return None
+                session = client.get_session()
+                if session is not None:
+                    # saved every minute and on shutdown, the next daemon run continues from it.
+                    session.use_daemon_state()
+
+                me = await client.get_me()
+                if isinstance(me, User):
+                    client.save_session_info(me)
+                account = DaemonAccount(
+                    # `Current.session` is a symlink, the account is named after the session it points to.
+                    name=Path(client.session.filename).resolve().stem,  # type: ignore[union-attr]
+                    client=client,
+                    entity_cache=client.get_entity_cache(),
+                    user_id=int(me.id) if isinstance(me, User) else None,
+                    username=me.username if isinstance(me, User) else None,
+                    self_online=isinstance(getattr(me, "status", None), UserStatusOnline),
+                )
+                if rpc_stdio:
+                    await client.warm_entity_cache()
+                    # catch up on what happened while no daemon was running, updates keep it current from here.
+                    await client.refresh_dialog_snapshot()
+                return account
+
+            async def _start_account(session_name: str | None) -> DaemonAccount | None:
+                # one session failing to start (revoked, network, corrupt file) must not stop the others.
+                try:
+                    return await _open_account(session_name)
+                except Exception as exc:  # noqa: BLE001
+                    typer.echo(f"Warning: could not start session {session_name or 'Current'}, skipped: {exc}", err=True)
+                    return None
 
-                    def _maybe_to_dict(value: object | None) -> object | None:
-                        if value is None:
-                            return None
-                        to_dict = getattr(value, "to_dict", None)
-                        if callable(to_dict):
-                            return to_dict()
-                        return None
-
-                    # Keep daemon event payload compact to avoid stdout back-pressure stalls.
-                    payload: dict[str, object] = {
-                        "id": msg.id,
-                        "message": msg.message,
-                        "date": msg.date,
-                        "out": msg.out,
-                        "post": msg.post,
-                        "peer_id": _maybe_to_dict(getattr(msg, "peer_id", None)),
-                        "from_id": _maybe_to_dict(getattr(msg, "from_id", None)),
-                        "sender_id": msg.sender_id,
-                        "sender_name": sender_name,
-                        "sender_username": sender_username,
-                        "chat_title": chat_title,
-                        "chat_username": chat_username,
-                        "self_online": self_online,
-                    }
-                    await _emit_json(
-                        {
-                            "type": "event",
-                            "event": "new_message",
-                            "payload": payload,
-                        }
-                    )
-                except Exception:
-                    # Never crash the Telethon update loop because of stdout back-pressure.
-                    return
+            # the sessions share this process and its event loop, they are connected concurrently.
+            for account in await asyncio.gather(*(_start_account(name) for name in dict.fromkeys(session_names))):
+                if account is None:
+                    continue
+                if account.name in {item.name for item in router}:
+                    # e.g. `--session alice` next to `Current.session` pointing to it.
+                    await account.client.disconnect()
+                    continue
+                router.add(account)
+                _add_event_handlers(account)
+            if not len(router):
+                return False
 
             async def _presence_loop() -> None:
                 while not stop_event.is_set():
-                    await _refresh_self_online()
+                    await asyncio.gather(*(_refresh_self_online(account) for account in router if account.connected))
                     try:
                         await asyncio.wait_for(stop_event.wait(), timeout=15)
                     except TimeoutError:
                         continue
 
-            await _refresh_self_online()
-            client.add_event_handler(on_new_message, events.NewMessage())
-            client.add_event_handler(on_user_status_change, events.UserUpdate())
+            async def _watch_connection(account: DaemonAccount) -> None:
+                with contextlib.suppress(Exception):
+                    await account.client.disconnected
+                account.connected = False
+                await _emit_json({"type": "event", "event": "account_disconnected", "account": account.name, "payload": account.describe()})
+                if not any(item.connected for item in router):
+                    stop_event.set()
+
+            for account in router:
+                await _refresh_self_online(account)
+
+            dispatcher = RpcDispatcher(concurrency=rpc_concurrency, timeout=rpc_timeout or None)
+            stack.push_async_callback(dispatcher.aclose)
+            dispatched_methods = {"send_message", "list_dialogs", "list_messages", "list_unread"}
+
+            def _rpc_order_key(account: DaemonAccount, method: str, params: dict[str, Any]) -> str | None:
+                # sends of one lane to one chat are delivered in the order they were requested, whichever way the
+                # receiver is written. Lanes are not ordered here: the `SendScheduler` lets a better lane go first.
+                receiver = params.get("receiver")
+                if method != "send_message" or receiver is None:
+                    return None
+                lane = SendPriority(params.get("priority") or SendPriority.normal).value
+                target: str | int = int(receiver) if params.get("entity_type") == EntityType.peer_id.value else str(receiver)
+                # the exact local lookup `resolve_entity` starts with, no request.
+                index = account.client.get_entity_index()
+                if index is not None and (peer := index.resolve(target)) is not None:
+                    return f"{account.name}:{lane}:peer:{get_peer_id(peer)}"
+                if isinstance(target, int):
+                    return f"{account.name}:{lane}:peer:{target}"
+                return f"{account.name}:{lane}:receiver:" + target.strip().removeprefix("@").casefold()
+
+            async def _call_rpc(account: DaemonAccount, req_id: str, method: str, params: dict[str, Any], emit: Emit) -> None:
+                client = account.client
+
+                async def _emit_chunks(chunks: AsyncIterable[str]) -> None:
+                    async for chunk in chunks:
+                        await emit({"type": "chunk", "id": req_id, "data": chunk})
+
+                if method == "send_message":
+                    receiver_raw = params.get("receiver")
+                    if receiver_raw is None:
+                        raise ValueError("receiver is required")
+                    message_raw = params.get("message", "")
+                    entity_type_raw = params.get("entity_type")
+                    reply_to_raw = params.get("reply_to")
+                    file_raw = params.get("file")
+                    receiver = str(receiver_raw)
+                    message = str(message_raw)
+                    entity_type_str = str(entity_type_raw) if entity_type_raw is not None else None
+                    reply_to: int | None = None
+                    if isinstance(reply_to_raw, int):
+                        reply_to = reply_to_raw
+                    elif isinstance(reply_to_raw, str):
+                        trimmed_reply = reply_to_raw.strip()
+                        if trimmed_reply:
+                            reply_to = int(trimmed_reply)
+                    file_paths: list[str] | None = None
+                    if isinstance(file_raw, str):
+                        trimmed = file_raw.strip()
+                        file_paths = [trimmed] if trimmed else None
+                    elif isinstance(file_raw, list):
+                        parsed_paths = [str(item).strip() for item in file_raw if str(item).strip()]
+                        file_paths = parsed_paths or None
+
+                    await _send_message_with_connected_client(
+                        client=client,
+                        receiver=receiver,
+                        message=message,
+                        entity_type_str=entity_type_str,
+                        reply_to=reply_to,
+                        file_paths=file_paths,
+                        priority=SendPriority(params.get("priority") or SendPriority.normal),
+                    )
+                    await emit(
+                        {
+                            "type": "response",
+                            "id": req_id,
+                            "ok": True,
+                            "result": {
+                                "sent": True,
+                                "receiver": receiver,
+                            },
+                        }
+                    )
+                    return
+
+                if method == "list_dialogs":
+                    types_raw = params.get("types") or []
+                    await _emit_chunks(
+                        _iter_dialog_list_output(
+                            client,
+                            OutputFormat(params.get("fmt", OutputFormat.json.value)),
+                            dialog_types=[DialogType(item) for item in types_raw] or None,
+                            archived=bool(params.get("archived", False)),
+                            cached=bool(params.get("cached", False)),
+                            fields=_rpc_fields(params),
+                            max_age=float(params["max_age"]) if params.get("max_age") is not None else None,
+                        )
+                    )
+                    await emit({"type": "response", "id": req_id, "ok": True, "result": {}})
+                    return
+
+                if method == "list_messages":
+                    dialog_ids_raw = params.get("dialog_ids") or ([params["dialog_id"]] if params.get("dialog_id") is not None else [])
+                    type_filters = [DialogType(item) for item in params.get("types") or []]
+                    all_unread = bool(params.get("all_unread", False))
+                    if not dialog_ids_raw and not type_filters and not all_unread:
+                        raise ValueError("dialog_ids, types or all_unread is required")
+                    date_start_raw = params.get("date_start")
+                    date_end_raw = params.get("date_end")
+                    limit_raw = params.get("limit")
+                    await _emit_chunks(
+                        _iter_message_list_output(
+                            client,
+                            OutputFormat(params.get("fmt", OutputFormat.json.value)),
+                            dialog_ids=[int(item) for item in dialog_ids_raw],
+                            date_start=datetime.fromisoformat(str(date_start_raw)) if date_start_raw else None,
+                            date_end=datetime.fromisoformat(str(date_end_raw)) if date_end_raw else None,
+                            offset_id=int(params.get("offset_id") or 0),
+                            limit=int(limit_raw) if limit_raw is not None else None,
+                            order=OutputOrder(params.get("order", OutputOrder.asc.value)),
+                            local=bool(params.get("local", False)),
+                            fields=_rpc_fields(params),
+                            dialog_types=type_filters,
+                            all_unread=all_unread,
+                            concurrency=int(params.get("concurrency") or 8),
+                        )
+                    )
+                    await emit({"type": "response", "id": req_id, "ok": True, "result": {}})
+                    return
+
+                if method == "list_unread":
+                    limit_raw = params.get("limit")
+                    await _emit_chunks(
+                        _iter_unread_output(
+                            client,
+                            OutputFormat(params.get("fmt", OutputFormat.json.value)),
+                            dialog_types=[DialogType(item) for item in params.get("types") or []] or None,
+                            include_muted=bool(params.get("include_muted", False)),
+                            limit=int(limit_raw) if limit_raw is not None else None,
+                            concurrency=int(params.get("concurrency") or 8),
+                            fields=_rpc_fields(params),
+                        )
+                    )
+                    await emit({"type": "response", "id": req_id, "ok": True, "result": {}})
+                    return
+
+                raise ValueError(f"unknown method: {method}")
+
+            async def _handle_rpc(line: str, emit: Emit, default_account: DaemonAccount | None = None) -> None:
+                req_id: str | None = None
+                try:
+                    packet = json.loads(line)
+                    if not isinstance(packet, dict):
+                        raise ValueError("request must be an object")
+                    req_id = str(packet.get("id", ""))
+                    method = packet.get("method")
+                    params = packet.get("params")
+                    timeout = packet.get("timeout")
+                    if not isinstance(method, str):
+                        raise ValueError("method must be a string")
+                    if params is None:
+                        params = {}
+                    if not isinstance(params, dict):
+                        raise ValueError("params must be an object")
+                    if timeout is not None and (not isinstance(timeout, int | float) or timeout <= 0):
+                        raise ValueError("timeout must be a positive number of seconds")
+
+                    # control methods are answered inline, they must never wait behind other requests.
+                    if method == "ping":
+                        await emit({"type": "response", "id": req_id, "ok": True, "result": {"pong": True}})
+                        return
+
+                    if method == "stop":
+                        stop_event.set()
+                        await emit({"type": "response", "id": req_id, "ok": True, "result": {"stopping": True}})
+                        return
+
+                    if method == "accounts":
+                        await emit({"type": "response", "id": req_id, "ok": True, "result": {"accounts": [item.describe() for item in router]}})
+                        return
+
+                    if method == "cancel":
+                        target = params.get("id")
+                        if target is None:
+                            raise ValueError("id is required")
+                        cancelled = dispatcher.cancel(emit, str(target))
+                        await emit({"type": "response", "id": req_id, "ok": True, "result": {"cancelled": cancelled}})
+                        return
+
+                    # everything else acts on one account: the request's `account`, or the default of the connection.
+                    account = router.resolve(packet.get("account"), default=default_account)
+
+                    if method == "stats":
+                        result = {
+                            "account": account.name,
+                            "rpc": {"pending": dispatcher.pending()},
+                            "scheduler": account.client.get_send_scheduler().stats(),
+                            "output": output.stats() if output is not None else None,
+                            "entity_cache": account.entity_cache.stats(),
+                        }
+                        await emit({"type": "response", "id": req_id, "ok": True, "result": result})
+                        return
+
+                    if method not in dispatched_methods:
+                        raise ValueError(f"unknown method: {method}")
+
+                    request_id = req_id
+
+                    async def _on_error(reason: str) -> None:
+                        await emit({"type": "response", "id": request_id, "ok": False, "error": reason})
+
+                    dispatcher.submit(
+                        emit,
+                        req_id,
+                        lambda: _call_rpc(account, request_id, method, params, emit),
+                        on_error=_on_error,
+                        key=_rpc_order_key(account, method, params),
+                        timeout=timeout,
+                    )
+                except Exception as err:
+                    await emit(
+                        {
+                            "type": "response",
+                            "id": req_id or "",
+                            "ok": False,
+                            "error": str(err),
+                        }
+                    )
 
             async def _rpc_loop() -> None:
                 loop = asyncio.get_running_loop()
@@ -628,99 +1586,40 @@ def daemon_start(
                     line = raw_line.decode("utf-8", errors="ignore").strip()
                     if not line:
                         continue
+                    await _handle_rpc(line, _emit_json)
 
-                    req_id: str | None = None
-                    try:
-                        packet = json.loads(line)
-                        if not isinstance(packet, dict):
-                            raise ValueError("request must be an object")
-                        req_id = str(packet.get("id", ""))
-                        method = packet.get("method")
-                        params = packet.get("params")
-                        if not isinstance(method, str):
-                            raise ValueError("method must be a string")
-                        if params is None:
-                            params = {}
-                        if not isinstance(params, dict):
-                            raise ValueError("params must be an object")
-
-                        if method == "ping":
-                            await _emit_json({"type": "response", "id": req_id, "ok": True, "result": {"pong": True}})
-                            continue
-
-                        if method == "send_message":
-                            receiver_raw = params.get("receiver")
-                            if receiver_raw is None:
-                                raise ValueError("receiver is required")
-                            message_raw = params.get("message", "")
-                            entity_type_raw = params.get("entity_type")
-                            reply_to_raw = params.get("reply_to")
-                            file_raw = params.get("file")
-                            receiver = str(receiver_raw)
-                            message = str(message_raw)
-                            entity_type_str = str(entity_type_raw) if entity_type_raw is not None else None
-                            reply_to: int | None = None
-                            if isinstance(reply_to_raw, int):
-                                reply_to = reply_to_raw
-                            elif isinstance(reply_to_raw, str):
-                                trimmed_reply = reply_to_raw.strip()
-                                if trimmed_reply:
-                                    reply_to = int(trimmed_reply)
-                            file_paths: list[str] | None = None
-                            if isinstance(file_raw, str):
-                                trimmed = file_raw.strip()
-                                file_paths = [trimmed] if trimmed else None
-                            elif isinstance(file_raw, list):
-                                parsed_paths = [str(item).strip() for item in file_raw if str(item).strip()]
-                                file_paths = parsed_paths or None
-
-                            await _send_message_with_connected_client(
-                                client=client,
-                                receiver=receiver,
-                                message=message,
-                                entity_type_str=entity_type_str,
-                                reply_to=reply_to,
-                                file_paths=file_paths,
-                            )
-                            await _emit_json(
-                                {
-                                    "type": "response",
-                                    "id": req_id,
-                                    "ok": True,
-                                    "result": {
-                                        "sent": True,
-                                        "receiver": receiver,
-                                    },
-                                }
-                            )
-                            continue
-
-                        if method == "stop":
-                            stop_event.set()
-                            await _emit_json({"type": "response", "id": req_id, "ok": True, "result": {"stopping": True}})
-                            continue
-
-                        raise ValueError(f"unknown method: {method}")
-                    except Exception as err:
-                        await _emit_json(
-                            {
-                                "type": "response",
-                                "id": req_id or "",
-                                "ok": False,
-                                "error": str(err),
-                            }
-                        )
+            if socket:
+                for account in router:
+                    # requests coming in on an account's socket act on that account by default.
+                    account.socket_path = get_socket_path(account.client.session.filename)  # type: ignore[union-attr]
+                    await stack.enter_async_context(serve_unix_socket(account.socket_path, functools.partial(_handle_rpc, default_account=account)))
 
             rpc_task: asyncio.Task[None] | None = None
             presence_task = asyncio.create_task(_presence_loop())
+            watch_tasks = [asyncio.create_task(_watch_connection(account)) for account in router]
+            first = next(iter(router))
             if rpc_stdio:
-                await _emit_json({"type": "ready", "mode": "rpc_stdio", "self_online": self_online})
+                await _emit_json(
+                    {
+                        "type": "ready",
+                        "mode": "rpc_stdio",
+                        "self_online": first.self_online,
+                        "socket": str(first.socket_path) if first.socket_path else None,
+                        "accounts": [account.describe() for account in router],
+                    }
+                )
                 rpc_task = asyncio.create_task(_rpc_loop())
             else:
                 print("daemon started, waiting for new messages...", fmt=cli_args.fmt)
+                for account in router:
+                    if account.socket_path is not None:
+                        print(f"{account.name}: listening on {account.socket_path}", fmt=cli_args.fmt)
+            ready_sent.set_result(None)
+            for account in router:
+                # dispatched to the handlers like live updates, after `ready`.
+                await account.client.resume_updates()
 
             wait_tasks: set[asyncio.Future[Any]] = {
-                client.disconnected,
                 asyncio.create_task(stop_event.wait()),
                 presence_task,
             }
@@ -728,11 +1627,11 @@ def daemon_start(
                 wait_tasks.add(rpc_task)
 
             done, pending = await asyncio.wait(wait_tasks, return_when=asyncio.FIRST_COMPLETED)
-            for task in pending:
+            for task in [*pending, *watch_tasks]:
                 task.cancel()
 
             if stop_event.is_set():
-                client.disconnect()
+                await asyncio.gather(*(account.client.disconnect() for account in router))
             else:
                 for task in done:
                     if rpc_task is not None and task is rpc_task:
@@ -746,5 +1645,46 @@ def daemon_start(
         ok = asyncio.run(_run())
     except KeyboardInterrupt:
         raise typer.Exit(code=0)
+    except DaemonError as exc:
+        typer.echo(f"Error: {exc}", err=True)
+        raise typer.Exit(code=1)
+    if not ok:
+        raise typer.Exit(code=1)
+
+
+@daemon_cli.command(name="status")
+def daemon_status(ctx: typer.Context) -> None:
+    """
+    Show the request and send queues of the running daemon.
+
+    Reports RPC requests in flight, queued sends per lane and per peer, how long they wait and flood waits hit so far.
+    """
+
+    import asyncio
+
+    from tele_cli import utils
+    from tele_cli.types import DaemonError
+    from tele_cli.utils import print
+
+    cli_args: SharedArgs = ctx.obj
+
+    async def _run() -> bool:
+        from tele_cli.daemon import connect_daemon
+
+        daemon = await connect_daemon(cli_args.session)
+        if daemon is None:
+            typer.echo("Error: no daemon is running for this session.", err=True)
+            return False
+
+        async with daemon:
+            stats = await daemon.request("stats")
+        print(utils.fmt.format_daemon_stats(stats, cli_args.fmt), fmt=cli_args.fmt)
+        return True
+
+    try:
+        ok = asyncio.run(_run())
+    except DaemonError as exc:
+        typer.echo(f"Error: {exc}", err=True)
+        raise typer.Exit(code=1)
     if not ok:
         raise typer.Exit(code=1)
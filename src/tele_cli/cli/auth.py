@@ -1,15 +1,14 @@
-from .types import SharedArgs
-import asyncio
-from typing import Annotated
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from typing import TYPE_CHECKING, Annotated
 
 import typer
 
-from tele_cli import utils
-from tele_cli.app import TeleCLI
-from tele_cli.config import load_config
-from tele_cli.session import list_session_name, session_switch, TGSession
-from tele_cli.utils.fmt import format_session_info_list
-from tele_cli.utils import print
+from .types import SharedArgs
+
+if TYPE_CHECKING:
+    from tele_cli.types import SessionInfo
 
 auth_cli = typer.Typer(
     no_args_is_help=True,
@@ -36,6 +35,14 @@ def auth_login(
         typer.Option("--switch", "-s", help="Automatic set the login session as active one."),
     ] = False,
 ):
+    import asyncio
+
+    from tele_cli import utils
+    from tele_cli.app import TeleCLI
+    from tele_cli.config import load_config
+    from tele_cli.session import TGSession, session_switch
+    from tele_cli.utils import print
+
     cli_args: SharedArgs = ctx.obj
 
     def get_phone() -> str:
@@ -89,6 +96,13 @@ def auth_login(
 
 @auth_cli.command(name="logout", help="Logout from the selected session.")
 def auth_logout(ctx: typer.Context):
+    import asyncio
+
+    from tele_cli import utils
+    from tele_cli.app import TeleCLI
+    from tele_cli.config import load_config
+    from tele_cli.utils import print
+
     cli_args: SharedArgs = ctx.obj
 
     async def _run() -> bool:
@@ -104,23 +118,77 @@ def auth_logout(ctx: typer.Context):
         raise typer.Exit(code=1)
 
 
-@auth_cli.command(name="list", help="List all local Telegram sessions.")
-def auth_list(ctx: typer.Context):
-    cli_args: SharedArgs = ctx.obj
+async def _load_session_infos(cli_args: SharedArgs, verify: bool = False, jobs: int = 4) -> list[SessionInfo]:
+    """
+    Who every local session belongs to, from the metadata stored next to the session files.
+
+    Sessions without stored metadata, or all of them with `verify`, are checked with Telegram, `jobs` at a time.
+    Sessions that are not authorized (anymore) are left out.
+    """
+
+    import asyncio
+
+    from tele_cli.shared import get_app_session_folder, list_session_name
+    from tele_cli.types import SessionInfo
+
+    folder = get_app_session_folder()
+    session_names = await list_session_name()
+    infos: dict[str, SessionInfo | None] = {name: None if verify else SessionInfo.load(folder / f"{name}.session") for name in session_names}
+
+    pending = [name for (name, info) in infos.items() if info is None]
+    if pending:
+        from tele_cli.app import TeleCLI
+        from tele_cli.config import load_config
 
-    async def _run() -> bool:
-        session_name_list = await list_session_name()
         config = load_config(config_file=cli_args.config_file)
+        semaphore = asyncio.Semaphore(max(jobs, 1))
+
+        async def _verify(session_name: str) -> SessionInfo | None:
+            async with semaphore:
+                try:
+                    # read-only: a session in use by a daemon is verified without competing for its file.
+                    app = await TeleCLI.create(session_name=session_name, config=config, read_only=True)
+                    return await app.get_session_info()
+                except Exception as exc:  # noqa: BLE001
+                    typer.echo(f"Warning: could not verify session {session_name}: {exc}", err=True)
+                    return None
 
-        session_info_list = []
-        for session_name in session_name_list:
-            app = await TeleCLI.create(session_name=session_name, config=config)
-            session_info = await app.get_session_info()
-            if session_info is None:
-                continue
-            session_info_list.append(session_info)
+        for name, info in zip(pending, await asyncio.gather(*(_verify(name) for name in pending))):
+            infos[name] = info
 
-        print(format_session_info_list(session_info_list, fmt=cli_args.fmt), fmt=cli_args.fmt)
+    return [info for info in infos.values() if info is not None]
+
+
+_VERIFY_OPTION = typer.Option("--verify", help="Check every session with Telegram (concurrently) instead of trusting the stored metadata.")
+_JOBS_OPTION = typer.Option("--jobs", "-j", min=1, help="Sessions verified at the same time.")
+
+
+@auth_cli.command(
+    name="list",
+    help="""
+    List all local Telegram sessions.
+
+    Reads the metadata stored at login, only sessions without it are checked with Telegram unless --verify is given.
+    """,
+)
+def auth_list(
+    ctx: typer.Context,
+    verify: Annotated[bool, _VERIFY_OPTION] = False,
+    jobs: Annotated[int, _JOBS_OPTION] = 4,
+):
+    import asyncio
+
+    from tele_cli.utils import print_stream
+    from tele_cli.utils.session_fmt import iter_format_session_info_list
+
+    cli_args: SharedArgs = ctx.obj
+
+    async def _iter_session_info() -> AsyncIterator[SessionInfo]:
+        for session_info in await _load_session_infos(cli_args, verify=verify, jobs=jobs):
+            yield session_info
+
+    async def _run() -> bool:
+        await print_stream(iter_format_session_info_list(_iter_session_info(), fmt=cli_args.fmt), fmt=cli_args.fmt)
         return True
 
     ok = asyncio.run(_run())
@@ -135,6 +203,13 @@ def auth_list(ctx: typer.Context):
     """,
 )
 def auth_authorizations(ctx: typer.Context):
+    import asyncio
+
+    from tele_cli import utils
+    from tele_cli.app import TeleCLI
+    from tele_cli.config import load_config
+    from tele_cli.utils import print
+
     cli_args: SharedArgs = ctx.obj
 
     async def _run() -> bool:
@@ -172,7 +247,13 @@ def auth_switch(
         str | None,
         typer.Option("--session", help="Session name to use (as shown in `tele auth list`)."),
     ] = None,
+    verify: Annotated[bool, _VERIFY_OPTION] = False,
+    jobs: Annotated[int, _JOBS_OPTION] = 4,
 ):
+    import asyncio
+
+    from tele_cli.session import session_switch
+
     cli_args: SharedArgs = ctx.obj
 
     if username and username.startswith("@"):
@@ -182,33 +263,22 @@ def auth_switch(
         if not user_id and not username and not session_name:
             raise typer.BadParameter("Provide at least one of: user_id, username, or session.")
 
-        session__name_list = await list_session_name()
-
-        app_list = [await TeleCLI.create(session_name=session, config=load_config(config_file=cli_args.config_file)) for session in session__name_list]
-
-        async def predicator(app: TeleCLI) -> bool:
-            session_info = await app.get_session_info()
-            if session_info is None:
-                return False
-
+        def predicator(session_info: SessionInfo) -> bool:
             cond_1 = True if session_name and session_name == session_info.session_name else False
-            cond_2 = True if username and username == session_info.user_name else False
+            cond_2 = True if username and session_info.user_name and username.casefold() == session_info.user_name.casefold() else False
             cond_3 = True if user_id and user_id == session_info.user_id else False
 
             return cond_1 or cond_2 or cond_3
 
-        app_list = [s for s in app_list if await predicator(s)]
+        matched = [s for s in await _load_session_infos(cli_args, verify=verify, jobs=jobs) if predicator(s)]
 
-        if len(app_list) == 0:
+        if len(matched) == 0:
             raise typer.BadParameter("No Session Matched")
 
-        if len(app_list) > 1:
+        if len(matched) > 1:
             raise typer.BadParameter("Multiple Sessions Matched")
 
-        session = app_list[0].client().get_session()
-        if not session:
-            return False
-        session_switch(session=session)
+        session_switch(session=matched[0].path)
 
         return True
 
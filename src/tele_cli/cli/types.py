@@ -9,3 +9,6 @@ class SharedArgs:
     fmt: OutputFormat
     config_file: Path | None
     session: str | None
+    use_daemon: bool = True
+    # JSON output fields, see `tele_cli.utils.fields.FieldProjection`.
+    fields: list[str] | None = None
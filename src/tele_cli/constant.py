@@ -1,6 +1,12 @@
 from __future__ import annotations
 
-import importlib.metadata
-
 NAME = "Telegram CLI"
-VERSION = importlib.metadata.version("tele-cli")
+
+
+def __getattr__(name: str) -> str:
+    # `importlib.metadata` is slow to import, only pay for it when the version is asked for.
+    if name == "VERSION":
+        import importlib.metadata
+
+        return importlib.metadata.version("tele-cli")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,15 @@
+from .accounts import AccountRouter, DaemonAccount
+from .dispatch import RpcDispatcher
+from .ipc import DaemonClient, connect_daemon, get_socket_path, serve_unix_socket
+from .output import OutputPipeline
+
+__all__ = [
+    "AccountRouter",
+    "DaemonAccount",
+    "DaemonClient",
+    "OutputPipeline",
+    "RpcDispatcher",
+    "connect_daemon",
+    "get_socket_path",
+    "serve_unix_socket",
+]
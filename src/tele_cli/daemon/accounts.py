@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from tele_cli.app import TGClient
+    from tele_cli.cache import EntityCache
+
+
+@dataclass
+class DaemonAccount:
+    """One session hosted by `tele daemon start`, with its own connected client."""
+
+    # the session name (`alice` for `alice.session`), the `account` of events and RPC requests.
+    name: str
+    client: TGClient
+    entity_cache: EntityCache
+    user_id: int | None = None
+    username: str | None = None
+    self_online: bool = False
+    socket_path: Path | None = None
+    connected: bool = field(default=True)
+
+    def matches(self, key: str) -> bool:
+        """`key` is the session name, the user id or the username (with or without "@")."""
+
+        if key == self.name:
+            return True
+        if key.lstrip("-").isdigit():
+            return self.user_id is not None and int(key) == self.user_id
+        username = key.removeprefix("@").casefold()
+        return bool(self.username) and username == self.username.casefold()  # type: ignore[union-attr]
+
+    def describe(self) -> dict[str, object]:
+        return {
+            "account": self.name,
+            "user_id": self.user_id,
+            "username": self.username,
+            "socket": str(self.socket_path) if self.socket_path else None,
+            "connected": self.connected,
+        }
+
+
+class AccountRouter:
+    """The accounts of a daemon, resolves the `account` field of RPC requests."""
+
+    def __init__(self) -> None:
+        self._accounts: dict[str, DaemonAccount] = {}
+
+    def __iter__(self) -> Iterator[DaemonAccount]:
+        return iter(self._accounts.values())
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def add(self, account: DaemonAccount) -> None:
+        if account.name in self._accounts:
+            raise ValueError(f"account {account.name} is hosted already")
+        self._accounts[account.name] = account
+
+    def resolve(self, key: object, default: DaemonAccount | None = None) -> DaemonAccount:
+        """
+        The account `key` refers to, see `DaemonAccount.matches`.
+
+        Without `key`, `default` (e.g. the account whose socket the request came in on), or the only account.
+        """
+
+        if key is None or key == "":
+            if default is not None:
+                return default
+            if len(self._accounts) == 1:
+                return next(iter(self._accounts.values()))
+            raise ValueError(f"account is required, this daemon hosts: {', '.join(self._accounts)}")
+
+        key = str(key).strip()
+        account = self._accounts.get(key)
+        if account is not None:
+            return account
+        matched = [item for item in self._accounts.values() if item.matches(key)]
+        if len(matched) == 1:
+            return matched[0]
+        if matched:
+            raise ValueError(f"account {key} is ambiguous: {', '.join(item.name for item in matched)}")
+        raise ValueError(f"unknown account: {key}")
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from collections.abc import Awaitable, Callable, Hashable
+
+
+class RpcDispatcher:
+    """
+    Run daemon RPC requests as independent tasks.
+
+    - at most `concurrency` requests execute at the same time, the others wait for a slot.
+    - requests submitted with the same `key` (e.g. the receiver of a send) run strictly in submission order,
+      requests with different keys, or without one, run in parallel.
+    - every request has a deadline covering both its wait and its execution, see `submit`.
+    - a pending or running request can be cancelled by the `(origin, request id)` it was submitted with.
+
+    The outcome is reported by the request itself, failures through `on_error` (see `submit`).
+    """
+
+    def __init__(self, concurrency: int = 8, timeout: float | None = None):
+        self._semaphore = asyncio.Semaphore(max(concurrency, 1))
+        self._timeout = timeout
+        self._tasks: dict[tuple[Hashable, str], asyncio.Task[None]] = {}
+        self._keyed: dict[str, list[asyncio.Task[None]]] = {}
+
+    def submit(
+        self,
+        origin: Hashable,
+        req_id: str,
+        run: Callable[[], Awaitable[None]],
+        on_error: Callable[[str], Awaitable[None]],
+        key: str | None = None,
+        timeout: float | None = None,
+    ) -> asyncio.Task[None]:
+        """
+        Schedule `run()`. `origin` scopes `req_id`, e.g. the connection the request came from.
+
+        `timeout` (seconds, default: the dispatcher's) starts now, so time spent queued behind the same key counts.
+        If `run` raises, is cancelled or misses its deadline, `on_error` is awaited with a short reason.
+        """
+
+        loop = asyncio.get_running_loop()
+        timeout = self._timeout if timeout is None else timeout
+        deadline = loop.time() + timeout if timeout else None
+        predecessors = [task for task in self._keyed.get(key, []) if not task.done()] if key is not None else []
+
+        async def _run() -> None:
+            try:
+                async with asyncio.timeout_at(deadline) as scope:
+                    if predecessors:
+                        # waiting for all of them (not only the last one) keeps the order when one in between is cancelled.
+                        await asyncio.wait(predecessors)
+                    async with self._semaphore:
+                        await run()
+            except asyncio.CancelledError:
+                await _report("cancelled")
+                raise
+            except TimeoutError as exc:
+                await _report("deadline exceeded" if scope.expired() else str(exc) or "timeout")
+            except Exception as exc:  # noqa: BLE001
+                await _report(str(exc) or type(exc).__name__)
+
+        async def _report(reason: str) -> None:
+            # the peer may be gone already, there is nobody left to tell.
+            with contextlib.suppress(Exception):
+                await on_error(reason)
+
+        task = loop.create_task(_run())
+        self._tasks[(origin, req_id)] = task
+        if key is not None:
+            self._keyed[key] = [*predecessors, task]
+        task.add_done_callback(lambda _: self._forget(origin, req_id, key, task))
+        return task
+
+    def cancel(self, origin: Hashable, req_id: str) -> bool:
+        task = self._tasks.get((origin, req_id))
+        if task is None or task.done():
+            return False
+        return task.cancel()
+
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def aclose(self) -> None:
+        """Cancel every request and wait until they reported it."""
+
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+
+    def _forget(self, origin: Hashable, req_id: str, key: str | None, task: asyncio.Task[None]) -> None:
+        if self._tasks.get((origin, req_id)) is task:
+            del self._tasks[(origin, req_id)]
+        if key is not None:
+            remaining = [item for item in self._keyed.get(key, []) if item is not task]
+            if remaining:
+                self._keyed[key] = remaining
+            else:
+                self._keyed.pop(key, None)
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+from collections.abc import AsyncIterator, Awaitable, Callable
+from pathlib import Path
+from typing import Any, Self
+
+from tele_cli.types.error import DaemonError
+
+SOCKET_SUFFIX = ".sock"
+
+# sun_path is 108 bytes on Linux and 104 on macOS.
+_MAX_SOCKET_PATH = 100
+
+# one line carries a whole formatted chunk, e.g. the text dialog list.
+_LINE_LIMIT = 16 * 1024 * 1024
+
+Emit = Callable[[dict[str, object]], Awaitable[None]]
+
+
+def get_socket_path(session_path: str | Path) -> Path:
+    """
+    The socket `tele daemon start` listens on for the session at `session_path`, next to the session file.
+
+    Symlinks (`Current.session`) are resolved, so every name of a session maps to the same socket.
+    """
+
+    path = Path(session_path)
+    if path.suffix != ".session":
+        path = path.with_name(f"{path.name}.session")
+    path = path.resolve().with_suffix(SOCKET_SUFFIX)
+    if len(os.fsencode(path)) <= _MAX_SOCKET_PATH:
+        return path
+
+    digest = hashlib.sha1(os.fsencode(path)).hexdigest()[:16]
+    return Path(tempfile.gettempdir()) / f"tele-{digest}{SOCKET_SUFFIX}"
+
+
+def encode_line(obj: dict[str, object], default: Callable[[object], object] | None = None) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False, default=default) + "\n").encode("utf-8")
+
+
+class DaemonClient:
+    """
+    Connection to the socket of a running `tele daemon start`.
+
+    The protocol is the newline-delimited JSON RPC of `--rpc-stdio`: a request is
+    `{"id", "method", "params"}`, it is answered by any number of `{"type": "chunk", "id", "data"}`
+    followed by one `{"type": "response", "id", "ok", "result" | "error"}`.
+    """
+
+    @staticmethod
+    async def connect(socket_path: Path) -> DaemonClient | None:
+        """`None` if no daemon is listening on `socket_path`."""
+
+        if not socket_path.exists():
+            return None
+        try:
+            (reader, writer) = await asyncio.open_unix_connection(str(socket_path), limit=_LINE_LIMIT)
+        except (ConnectionRefusedError, FileNotFoundError):
+            # left behind by a daemon that did not shut down cleanly.
+            return None
+        return DaemonClient(reader, writer)
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+        self._result: Any = None
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        self._writer.close()
+        with contextlib.suppress(OSError):
+            await self._writer.wait_closed()
+
+    async def stream(self, method: str, params: dict[str, object] | None = None) -> AsyncIterator[str]:
+        """Send a request and yield its output chunks as they arrive, raise `DaemonError` if it fails."""
+
+        self._next_id += 1
+        req_id = str(self._next_id)
+        self._writer.write(encode_line({"id": req_id, "method": method, "params": params or {}}))
+        await self._writer.drain()
+
+        while True:
+            raw_line = await self._reader.readline()
+            if not raw_line:
+                raise DaemonError("daemon closed the connection")
+            packet = json.loads(raw_line)
+            if packet.get("id") != req_id:
+                continue
+            match packet.get("type"):
+                case "chunk":
+                    yield str(packet.get("data", ""))
+                case "response" if packet.get("ok"):
+                    self._result = packet.get("result")
+                    return
+                case "response":
+                    raise DaemonError(str(packet.get("error") or "request failed"))
+
+    async def request(self, method: str, params: dict[str, object] | None = None) -> Any:
+        """Send a request that has no output chunks and return its result."""
+
+        self._result = None
+        async for _ in self.stream(method, params):
+            pass
+        return self._result
+
+
+async def connect_daemon(session_name: str | None) -> DaemonClient | None:
+    """Connect to the daemon serving the session `session_name` (the current one by default), if any."""
+
+    from tele_cli.shared import get_session_path
+
+    return await DaemonClient.connect(get_socket_path(get_session_path(session_name, with_current=True)))
+
+
+@contextlib.asynccontextmanager
+async def serve_unix_socket(socket_path: Path, handle: Callable[[str, Emit], Awaitable[None]]) -> AsyncIterator[asyncio.Server]:
+    """
+    Listen on `socket_path` and call `handle(line, emit)` for every request line of every connection.
+
+    `emit` writes one JSON object back to the connection the request came from.
+    The socket is only accessible by the current user and is removed on exit.
+    """
+
+    probe = await DaemonClient.connect(socket_path)
+    if probe is not None:
+        await probe.close()
+        raise DaemonError(f"a daemon is already listening on {socket_path}")
+    socket_path.unlink(missing_ok=True)
+
+    async def _on_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        lock = asyncio.Lock()
+
+        async def _emit(obj: dict[str, object]) -> None:
+            async with lock:
+                writer.write(encode_line(obj, default=str))
+                await writer.drain()
+
+        try:
+            while raw_line := await reader.readline():
+                line = raw_line.decode("utf-8", errors="ignore").strip()
+                if line:
+                    await handle(line, _emit)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # the client went away, e.g. `tele message list | head`.
+            pass
+        finally:
+            writer.close()
+
+    old_umask = os.umask(0o077)
+    try:
+        server = await asyncio.start_unix_server(_on_connection, path=str(socket_path), limit=_LINE_LIMIT)
+    finally:
+        os.umask(old_umask)
+
+    try:
+        yield server
+    finally:
+        server.close()
+        socket_path.unlink(missing_ok=True)
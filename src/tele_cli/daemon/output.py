@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import sys
+import tempfile
+from collections import deque
+from typing import IO, Any, BinaryIO
+
+from tele_cli.types.output import OverflowPolicy
+
+# upper bound of a single coalesced write.
+_MAX_WRITE = 1024 * 1024
+
+
+class OutputPipeline:
+    """
+    Bounded, asynchronous writer of newline-delimited output (the daemon's `--rpc-stdio` stream).
+
+    `emit` only appends to a buffer of at most `maxsize` lines. A single writer task drains it, joining every
+    line available into one write on a non-blocking transport, so a slow reader costs neither a syscall per line
+    nor a stalled caller, unless the policy says so. When the buffer is full, droppable lines (events) are handled
+    by `policy`:
+
+    - `block`: `emit` waits until the writer made room.
+    - `drop-oldest`: the oldest buffered event is discarded.
+    - `spill`: lines go to a temporary file and are written, in order, once the reader caught up.
+
+    Lines that are not droppable (responses) are never discarded. Dropped and spilled lines are counted,
+    see `stats()`, and the counts are reported on the stream itself once the writer caught up, see `report`.
+    """
+
+    def __init__(self, maxsize: int = 1024, policy: OverflowPolicy = OverflowPolicy.block, report: bool = True):
+        self._maxsize = max(maxsize, 1)
+        self._policy = policy
+        self._report = report
+        self._buffer: deque[tuple[bytes, bool]] = deque()
+        self._spill: BinaryIO | None = None
+        self._spill_read = 0
+        self._spill_size = 0
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._writer: asyncio.StreamWriter | None = None
+        self._stream: IO[bytes] | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self._reported = (0, 0)
+
+    async def start(self, stream: IO[Any] | None = None) -> None:
+        stream = stream or sys.stdout
+        loop = asyncio.get_running_loop()
+        try:
+            (transport, protocol) = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, stream)
+            self._writer = asyncio.StreamWriter(transport, protocol, None, loop)
+        except (ValueError, OSError):
+            # regular files are not supported by pipe transports, they never block anyway.
+            self._stream = stream.buffer if hasattr(stream, "buffer") else stream
+        self._task = loop.create_task(self._run())
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": len(self._buffer),
+            "spill_pending": self._spill_size - self._spill_read,
+            "written": self.written,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+        }
+
+    async def emit(self, line: str, droppable: bool = True) -> None:
+        if self._closed:
+            return
+        data = (line if line.endswith("\n") else line + "\n").encode("utf-8")
+
+        if self._spilling():
+            # once spilling, everything goes to the file until it is drained, to keep the order.
+            self._spill_write(data)
+        elif len(self._buffer) < self._maxsize:
+            self._buffer.append((data, droppable))
+        elif self._policy == OverflowPolicy.spill:
+            self._spill_write(data)
+        elif self._policy == OverflowPolicy.drop_oldest and droppable:
+            oldest = next((item for item in self._buffer if item[1]), None)
+            if oldest is not None:
+                self._buffer.remove(oldest)
+                self.dropped += 1
+            self._buffer.append((data, droppable))
+        elif self._policy == OverflowPolicy.drop_oldest:
+            # responses may exceed the bound, they are rare and must arrive.
+            self._buffer.append((data, droppable))
+        else:
+            while len(self._buffer) >= self._maxsize and not self._closed:
+                self._writable.clear()
+                await self._writable.wait()
+            if self._closed:
+                return
+            self._buffer.append((data, droppable))
+
+        self._idle.clear()
+        self._readable.set()
+
+    async def aclose(self, timeout: float = 5) -> None:
+        """Write what is buffered (for at most `timeout` seconds) and stop."""
+
+        if self._task is None:
+            return
+        with contextlib.suppress(TimeoutError):
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        self._closed = True
+        self._writable.set()
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        if self._writer is not None:
+            # `drain` only waits for the high-water mark, the transport may still hold data.
+            self._writer.transport.set_write_buffer_limits(high=0)
+            with contextlib.suppress(TimeoutError, ConnectionError):
+                await asyncio.wait_for(self._writer.drain(), timeout=timeout)
+            self._writer.close()
+        if self._spill is not None:
+            self._spill.close()
+
+    def _spilling(self) -> bool:
+        return self._spill_size > self._spill_read
+
+    def _spill_write(self, data: bytes) -> None:
+        if self._spill is None:
+            # closed by `close`.
+            self._spill = tempfile.TemporaryFile(prefix="tele-daemon-", suffix=".spill")  # noqa: SIM115
+        self._spill.seek(self._spill_size)
+        self._spill.write(data)
+        self._spill_size += len(data)
+        self.spilled += 1
+
+    def _spill_read_chunk(self) -> bytes:
+        assert self._spill is not None
+        self._spill.seek(self._spill_read)
+        chunk = self._spill.read(_MAX_WRITE)
+        if len(chunk) == _MAX_WRITE:
+            # never split a line, the rest of it is written with the next chunk.
+            chunk = chunk[: chunk.rfind(b"\n") + 1] or chunk
+        self._spill_read += len(chunk)
+        if self._spill_read >= self._spill_size:
+            self._spill.seek(0)
+            self._spill.truncate()
+            self._spill_read = self._spill_size = 0
+        return chunk
+
+    def _take(self) -> bytes:
+        # the memory buffer always holds older lines than the spill file.
+        parts: list[bytes] = []
+        size = 0
+        while self._buffer and size < _MAX_WRITE:
+            (data, _) = self._buffer.popleft()
+            parts.append(data)
+            size += len(data)
+        written = len(parts)
+        if not parts and self._spilling():
+            parts.append(self._spill_read_chunk())
+            written = parts[0].count(b"\n")
+        self.written += written
+        self._writable.set()
+        return b"".join(parts)
+
+    def _overflow_report(self) -> bytes | None:
+        if not self._report or (self.dropped, self.spilled) == self._reported:
+            return None
+        self._reported = (self.dropped, self.spilled)
+        payload = {"dropped": self.dropped, "spilled": self.spilled, "policy": self._policy.value}
+        return (json.dumps({"type": "event", "event": "output_overflow", "payload": payload}) + "\n").encode("utf-8")
+
+    async def _write(self, data: bytes) -> None:
+        if self._writer is not None:
+            self._writer.write(data)
+            await self._writer.drain()
+        elif self._stream is not None:
+            self._stream.write(data)
+            self._stream.flush()
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                await self._readable.wait()
+                data = self._take()
+                if not self._buffer and not self._spilling():
+                    self._readable.clear()
+                    # caught up: tell the reader what it missed.
+                    data += self._overflow_report() or b""
+                if data:
+                    await self._write(data)
+                if not self._buffer and not self._spilling():
+                    self._idle.set()
+        except (BrokenPipeError, ConnectionResetError):
+            # the consumer closed its end, nobody is listening anymore.
+            self._closed = True
+            self._buffer.clear()
+            self._writable.set()
+            self._idle.set()
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import re
+from collections import deque
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from telethon import utils
+from telethon.custom import Message
+from telethon.errors import FileReferenceExpiredError
+from telethon.tl import types
+
+if TYPE_CHECKING:
+    from .app import TGClient
+
+# the largest `upload.getFile` request, parts start at multiples of it so every request is aligned.
+CHUNK_SIZE = 512 * 1024
+# chunks fetched by one worker in a row, the unit of the parallel download of a large file.
+SEGMENT_CHUNKS = 8
+
+# in the output directory: file id -> downloaded file, so a file is never downloaded twice.
+MANIFEST_NAME = ".tele-download.json"
+PART_SUFFIX = ".part"
+# next to a `.part` file: which chunks of it are complete.
+STATE_SUFFIX = ".part.json"
+
+
+@dataclass
+class DownloadResult:
+    message_id: int
+    file_id: str
+    path: Path
+    size: int | None
+    # downloaded | skipped (the file was downloaded already) | failed
+    status: str
+    error: str | None = None
+
+    def to_dict(self) -> dict[str, object]:
+        return {
+            "message_id": self.message_id,
+            "file_id": self.file_id,
+            "path": str(self.path),
+            "size": self.size,
+            "status": self.status,
+            "error": self.error,
+        }
+
+
+def get_media_file_id(msg: Message) -> str | None:
+    """Key of the downloadable media of `msg`, shared by every message carrying the same file (e.g. a sticker)."""
+
+    if isinstance(msg.document, types.Document):
+        return f"document:{msg.document.id}"
+    if isinstance(msg.photo, types.Photo):
+        return f"photo:{msg.photo.id}"
+    return None
+
+
+def _safe_name(name: str) -> str:
+    name = re.sub(r"[\x00-\x1f/\\:*?\"<>|]+", "_", name).strip(" .")
+    return name[:200] or "file"
+
+
+def get_media_file_name(msg: Message) -> str:
+    """`<message id>-<original file name>`, or `<message id>-<file id><extension>` for unnamed media."""
+
+    document = msg.document
+    if isinstance(document, types.Document):
+        for attr in document.attributes:
+            if isinstance(attr, types.DocumentAttributeFilename) and attr.file_name:
+                return f"{msg.id}-{_safe_name(attr.file_name)}"
+        return f"{msg.id}-{document.id}{utils.get_extension(document)}"
+    return f"{msg.id}-{msg.photo.id}{utils.get_extension(msg.photo)}"
+
+
+class MediaDownloader:
+    """
+    Download the media of messages into `out_dir`.
+
+    - up to `jobs` files are downloaded at the same time, the chunks of a large document by up to `parts` workers each.
+    - an interrupted download leaves `<name>.part` and `<name>.part.json` (the completed chunks) behind,
+      the next run only fetches the missing chunks.
+    - downloaded files are recorded by Telegram file id in `out_dir/.tele-download.json`,
+      media seen again (in this run or a later one) is reported as `skipped` with the path of the existing copy.
+    """
+
+    def __init__(self, client: TGClient, out_dir: Path, jobs: int = 4, parts: int = 4):
+        self._client = client
+        self._out_dir = out_dir
+        self._jobs = max(jobs, 1)
+        self._parts = max(parts, 1)
+        self._manifest_path = out_dir / MANIFEST_NAME
+        self._manifest: dict[str, str] = {}
+        self._inflight: dict[str, asyncio.Future[Path]] = {}
+
+    async def download_all(self, messages: AsyncIterable[Message]) -> AsyncIterator[DownloadResult]:
+        """Download the media of `messages`, results are yielded as the downloads complete."""
+
+        self._out_dir.mkdir(parents=True, exist_ok=True)
+        self._manifest = self._load_manifest()
+
+        results: asyncio.Queue[DownloadResult | None] = asyncio.Queue()
+        slots = asyncio.Semaphore(self._jobs)
+
+        async def _one(msg: Message) -> None:
+            try:
+                await results.put(await self.download(msg))
+            finally:
+                slots.release()
+
+        async def _feed() -> None:
+            tasks: set[asyncio.Task[None]] = set()
+            try:
+                async for msg in messages:
+                    if get_media_file_id(msg) is None:
+                        continue
+                    # do not read ahead more messages than there are free slots.
+                    await slots.acquire()
+                    task = asyncio.create_task(_one(msg))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                if tasks:
+                    await asyncio.wait(tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await results.put(None)
+
+        feeder = asyncio.create_task(_feed())
+        try:
+            while (result := await results.get()) is not None:
+                yield result
+            await feeder
+        finally:
+            feeder.cancel()
+
+    async def download(self, msg: Message) -> DownloadResult:
+        file_id = get_media_file_id(msg)
+        assert file_id is not None
+        size = msg.document.size if isinstance(msg.document, types.Document) else None
+
+        existing = self._existing(file_id)
+        if existing is not None:
+            return DownloadResult(msg.id, file_id, existing, size, "skipped")
+        inflight = self._inflight.get(file_id)
+        if inflight is not None:
+            try:
+                return DownloadResult(msg.id, file_id, await asyncio.shield(inflight), size, "skipped")
+            except Exception as exc:  # noqa: BLE001
+                return DownloadResult(msg.id, file_id, self._out_dir / get_media_file_name(msg), size, "failed", error=str(exc) or type(exc).__name__)
+
+        future: asyncio.Future[Path] = asyncio.get_running_loop().create_future()
+        self._inflight[file_id] = future
+        path = self._out_dir / get_media_file_name(msg)
+        try:
+            await self._download_file(msg, path)
+        except Exception as exc:  # noqa: BLE001
+            future.set_exception(exc)
+            # retrieved here, nobody else may be waiting for it.
+            future.exception()
+            return DownloadResult(msg.id, file_id, path, size, "failed", error=str(exc) or type(exc).__name__)
+        else:
+            future.set_result(path)
+        finally:
+            self._inflight.pop(file_id, None)
+            if not future.done():
+                # cancelled, do not leave duplicates waiting for it.
+                future.cancel()
+
+        self._manifest[file_id] = path.name
+        self._save_manifest()
+        return DownloadResult(msg.id, file_id, path, path.stat().st_size, "downloaded")
+
+    def _existing(self, file_id: str) -> Path | None:
+        name = self._manifest.get(file_id)
+        if name is None:
+            return None
+        path = self._out_dir / name
+        return path if path.exists() else None
+
+    async def _download_file(self, msg: Message, path: Path) -> None:
+        part_path = path.with_name(path.name + PART_SUFFIX)
+        if isinstance(msg.document, types.Document):
+            await self._download_document(msg, part_path)
+        else:
+            # photos are small, Telethon picks the largest size.
+            await self._with_file_reference(msg, lambda m: self._client.download_media(m, file=str(part_path)))
+        os.replace(part_path, path)
+
+    async def _download_document(self, msg: Message, part_path: Path) -> None:
+        document = msg.document
+        size = document.size
+        chunks = (size + CHUNK_SIZE - 1) // CHUNK_SIZE
+        state_path = part_path.with_name(part_path.name.removesuffix(PART_SUFFIX) + STATE_SUFFIX)
+
+        done = self._load_state(state_path, document.id, size) if part_path.exists() else set()
+        if not done:
+            part_path.unlink(missing_ok=True)
+        f = await asyncio.to_thread(open, part_path, "r+b" if part_path.exists() else "w+b")
+        with f:
+            f.truncate(size)
+
+            missing = [index for index in range(chunks) if index not in done]
+            segments: deque[list[int]] = deque()
+            for index in missing:
+                if segments and len(segments[-1]) < SEGMENT_CHUNKS and segments[-1][-1] == index - 1:
+                    segments[-1].append(index)
+                else:
+                    segments.append([index])
+
+            fd = f.fileno()
+
+            async def _worker() -> None:
+                while segments:
+                    segment = segments.popleft()
+                    offset = segment[0] * CHUNK_SIZE
+
+                    async def _fetch(m: Message, offset: int = offset, segment: list[int] = segment) -> None:
+                        position = offset
+                        async for data in self._client.iter_download(m.document, offset=offset, limit=len(segment), request_size=CHUNK_SIZE, file_size=size):
+                            os.pwrite(fd, data, position)
+                            done.add(position // CHUNK_SIZE)
+                            position += len(data)
+
+                    try:
+                        await self._with_file_reference(msg, _fetch)
+                    finally:
+                        self._save_state(state_path, document.id, size, done)
+
+            workers = [asyncio.create_task(_worker()) for _ in range(min(self._parts, len(segments)) or 1)]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                # a failed part stops the others before the file is closed: `fd` may be reused by another download.
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+        if len(done) < chunks:
+            raise RuntimeError(f"incomplete download, {chunks - len(done)} of {chunks} chunks missing")
+        state_path.unlink(missing_ok=True)
+
+    async def _with_file_reference(self, msg: Message, run: Callable[[Message], Awaitable[object]]) -> object:
+        """Run `run(msg)`, once more with a refetched message if its file reference expired meanwhile."""
+
+        try:
+            return await run(msg)
+        except FileReferenceExpiredError:
+            fresh = await self._client.get_messages(msg.peer_id, ids=msg.id)
+            if not isinstance(fresh, Message) or fresh.media is None:
+                raise
+            msg.media = fresh.media
+            return await run(msg)
+
+    def _load_manifest(self) -> dict[str, str]:
+        try:
+            manifest = json.loads(self._manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return manifest if isinstance(manifest, dict) else {}
+
+    def _save_manifest(self) -> None:
+        tmp_path = self._manifest_path.with_name(self._manifest_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self._manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp_path, self._manifest_path)
+
+    @staticmethod
+    def _load_state(state_path: Path, document_id: int, size: int) -> set[int]:
+        try:
+            state = json.loads(state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return set()
+        if state.get("id") != document_id or state.get("size") != size or state.get("chunk_size") != CHUNK_SIZE:
+            return set()
+        return {int(index) for index in state.get("done", [])}
+
+    @staticmethod
+    def _save_state(state_path: Path, document_id: int, size: int, done: set[int]) -> None:
+        state = {"id": document_id, "size": size, "chunk_size": CHUNK_SIZE, "done": sorted(done)}
+        state_path.write_text(json.dumps(state), encoding="utf-8")
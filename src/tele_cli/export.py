@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import os
+from collections import deque
+from collections.abc import AsyncIterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from telethon.extensions import BinaryReader
+from telethon.tl.tlobject import _json_default
+
+from .types import ExportFormat
+
+if TYPE_CHECKING:
+    from .app import TGClient
+
+# messages encoded and written together, a page of `messages.getHistory`. The checkpoint moves batch by batch.
+BATCH_SIZE = 100
+# a file is continued in the next one once it is this large.
+ROTATE_SIZE = 256 * 1024 * 1024
+
+# in the output directory: per dialog, the last exported message and where the output ends.
+CHECKPOINT_NAME = ".tele-export.json"
+
+_EXTENSIONS = {ExportFormat.jsonl: "jsonl", ExportFormat.toon: "toon"}
+_TOON_COLUMNS = ["id", "date", "chat_id", "sender_id", "out", "reply_to_msg_id", "media", "message"]
+
+
+@dataclass
+class ExportResult:
+    dialog_id: int
+    peer_id: int
+    # messages written by this run.
+    count: int
+    # the newest exported message, the next run continues after it.
+    last_id: int
+    files: list[Path] = field(default_factory=list)
+    # exported | failed
+    status: str = "exported"
+    error: str | None = None
+
+    def to_dict(self) -> dict[str, object]:
+        return {
+            "dialog_id": self.dialog_id,
+            "peer_id": self.peer_id,
+            "count": self.count,
+            "last_id": self.last_id,
+            "files": [str(x) for x in self.files],
+            "status": self.status,
+            "error": self.error,
+        }
+
+
+def encode_batch(fmt: ExportFormat, raw_messages: list[bytes]) -> bytes:
+    """
+    Serialize a batch of raw TL messages: one JSON object per line (like `tele message list -f jsonl`),
+    or one TOON table block. Runs in a worker process, so it only gets bytes and returns bytes.
+    """
+
+    messages = [BinaryReader(raw).tgread_object() for raw in raw_messages]
+    if fmt == ExportFormat.toon:
+        from .utils.toon import ToonTable
+
+        table = ToonTable(_TOON_COLUMNS)
+        rows = [table.row(_toon_row(msg)) for msg in messages]
+        return table.block(rows).encode()
+    return "".join(json.dumps(msg.to_dict(), default=_json_default, ensure_ascii=False) + "\n" for msg in messages).encode()
+
+
+def _toon_row(msg: object) -> list:
+    # the columns of `tele message list -f toon` that do not need the entities (names) of the chat.
+    media = getattr(msg, "media", None)
+    return [
+        msg.id,  # type: ignore[attr-defined]
+        msg.date,  # type: ignore[attr-defined]
+        getattr(msg, "chat_id", None),
+        getattr(msg, "sender_id", None),
+        msg.out,  # type: ignore[attr-defined]
+        getattr(msg, "reply_to_msg_id", None),
+        type(media).__name__.removeprefix("MessageMedia") if media else None,
+        getattr(msg, "message", None),
+    ]
+
+
+class _RotatingFile:
+    """`<dir>/messages-00001.<ext>`, `messages-00002.<ext>`, ...: batches are appended, never split across files."""
+
+    def __init__(self, directory: Path, extension: str, rotate_size: int, fmt: ExportFormat):
+        self._dir = directory
+        self._extension = extension
+        self._rotate_size = rotate_size
+        self._fmt = fmt
+        self._index = 1
+        self._file = None
+        self.files: list[Path] = []
+
+    @property
+    def path(self) -> Path:
+        return self._dir / f"messages-{self._index:05d}.{self._extension}"
+
+    @property
+    def offset(self) -> int:
+        return self._file.tell() if self._file else 0
+
+    def open(self, name: str | None, offset: int) -> None:
+        """Continue `name` at `offset`: anything written after the last checkpoint is dropped."""
+
+        self._dir.mkdir(parents=True, exist_ok=True)
+        if name:
+            self._index = int(name.removeprefix("messages-").split(".")[0])
+        self._open(truncate=offset if name else 0)
+
+    def write(self, data: bytes) -> None:
+        if self.offset and self.offset + len(data) > self._rotate_size:
+            self.close()
+            self._index += 1
+            self._open(truncate=0)
+        if self.offset and self._fmt == ExportFormat.toon:
+            # a TOON document per batch, separated from the previous one by an empty line.
+            data = b"\n" + data
+        self._file.write(data)  # type: ignore[union-attr]
+        # on disk (as far as a crash of this process is concerned) before the checkpoint names the offset.
+        self._file.flush()  # type: ignore[union-attr]
+        if self.path not in self.files:
+            self.files.append(self.path)
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _open(self, truncate: int) -> None:
+        path = self.path
+        # kept open across batches, closed by `close`.
+        self._file = open(path, "r+b" if path.exists() else "w+b")  # noqa: SIM115
+        self._file.truncate(truncate)
+        self._file.seek(truncate)
+
+
+class MessageExporter:
+    """
+    Export the whole history of dialogs into `out_dir/<peer id>/`, oldest message first.
+
+    - messages are serialized by `workers` processes (see `encode_batch`) while the next pages are fetched,
+      at most a few batches per worker are in flight. `workers=0` encodes inline.
+    - output files are rotated at `rotate_size` bytes.
+    - `out_dir/.tele-export.json` records, per dialog, the last written message and the end of the output.
+      A later run continues after it: an interrupted export resumes, a finished one only appends new messages.
+
+    Pass a takeout client (`client.takeout()`) for the relaxed flood limits of data exports, and `wait_time=0`
+    with it. Exported messages are not added to the local archive.
+    """
+
+    def __init__(
+        self,
+        client: TGClient,
+        out_dir: Path,
+        fmt: ExportFormat = ExportFormat.jsonl,
+        workers: int = 2,
+        rotate_size: int = ROTATE_SIZE,
+        wait_time: float | None = None,
+    ):
+        self._client = client
+        self._out_dir = out_dir
+        self._fmt = fmt
+        self._workers = max(workers, 0)
+        self._rotate_size = rotate_size
+        self._wait_time = wait_time
+        self._checkpoint_path = out_dir / CHECKPOINT_NAME
+        self._checkpoint: dict[str, dict] = {}
+        self._executor: Executor | None = None
+
+    async def export_all(self, dialog_ids: list[int]) -> AsyncIterator[ExportResult]:
+        """Export the dialogs one after the other, a result per dialog once it is done (or failed)."""
+
+        self._out_dir.mkdir(parents=True, exist_ok=True)
+        self._checkpoint = self._load_checkpoint()
+        if self._workers:
+            # spawned, not forked: the parent runs an event loop and holds open connections.
+            self._executor = ProcessPoolExecutor(max_workers=self._workers, mp_context=get_context("spawn"))
+        try:
+            for dialog_id in dialog_ids:
+                yield await self.export(dialog_id)
+        finally:
+            if self._executor:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    async def export(self, dialog_id: int) -> ExportResult:
+        peer_id = await self._client.get_peer_id(dialog_id)
+        entry = self._checkpoint.get(str(peer_id), {})
+        if entry.get("format", self._fmt.value) != self._fmt.value:
+            error = f"exported as {entry['format']} before, use the same format or another --out"
+            return ExportResult(dialog_id, peer_id, 0, entry.get("last_id", 0), status="failed", error=error)
+
+        result = ExportResult(dialog_id, peer_id, 0, entry.get("last_id", 0))
+        output = _RotatingFile(self._out_dir / str(peer_id), _EXTENSIONS[self._fmt], self._rotate_size, self._fmt)
+        output.open(entry.get("file"), entry.get("offset", 0))
+        result.files = output.files
+
+        loop = asyncio.get_running_loop()
+        # (last message id, message count, encoded batch), in message order.
+        pending: deque[tuple[int, int, asyncio.Future[bytes]]] = deque()
+
+        def _write_done() -> None:
+            # in order: a batch encoded early waits for the ones before it.
+            while pending and pending[0][2].done():
+                (last_id, count, future) = pending.popleft()
+                output.write(future.result())
+                result.last_id = last_id
+                result.count += count
+                self._checkpoint[str(peer_id)] = {
+                    "format": self._fmt.value,
+                    "last_id": last_id,
+                    "file": output.path.name,
+                    "offset": output.offset,
+                }
+                self._save_checkpoint()
+
+        async def _submit(batch: list[bytes], last_id: int) -> None:
+            if self._executor:
+                future = loop.run_in_executor(self._executor, encode_batch, self._fmt, batch)
+            else:
+                future = loop.create_future()
+                future.set_result(encode_batch(self._fmt, batch))
+            pending.append((last_id, len(batch), future))
+            _write_done()
+            # the fetch only waits when the workers fall behind.
+            while len(pending) > max(self._workers, 1) * 2:
+                await asyncio.wait([pending[0][2]])
+                _write_done()
+
+        batch: list[bytes] = []
+        last_id = result.last_id
+        try:
+            async for msg in self._client.iter_messages(peer_id, min_id=result.last_id, reverse=True, wait_time=self._wait_time):  # type: ignore[arg-type]
+                batch.append(bytes(msg))
+                last_id = msg.id
+                if len(batch) >= BATCH_SIZE:
+                    await _submit(batch, last_id)
+                    batch = []
+            if batch:
+                await _submit(batch, last_id)
+            while pending:
+                await asyncio.wait([pending[0][2]])
+                _write_done()
+        except Exception as exc:  # noqa: BLE001
+            result.status = "failed"
+            result.error = str(exc) or type(exc).__name__
+            # keep what was fetched already, the next run continues after it.
+            with contextlib.suppress(Exception):
+                while pending:
+                    await asyncio.wait([pending[0][2]])
+                    _write_done()
+        finally:
+            for item in pending:
+                item[2].cancel()
+            output.close()
+        return result
+
+    def _load_checkpoint(self) -> dict[str, dict]:
+        try:
+            checkpoint = json.loads(self._checkpoint_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return checkpoint if isinstance(checkpoint, dict) else {}
+
+    def _save_checkpoint(self) -> None:
+        tmp_path = self._checkpoint_path.with_name(self._checkpoint_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self._checkpoint, indent=1), encoding="utf-8")
+        os.replace(tmp_path, self._checkpoint_path)
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from telethon.errors import FloodError
+
+from .types import SendPriority
+
+
+@dataclass
+class TokenBucket:
+    """`rate` tokens per second, at most `capacity` stored."""
+
+    rate: float
+    capacity: float
+    tokens: float = -1
+    updated: float = 0
+
+    def __post_init__(self) -> None:
+        if self.tokens < 0:
+            self.tokens = self.capacity
+
+    def _refill(self, now: float) -> None:
+        if self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available."""
+
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+# https://core.telegram.org/bots/faq#my-bot-is-hitting-limits-how-do-i-avoid-this
+# the same limits keep user accounts clear of flood waits in practice.
+GLOBAL_RATE = (30, 30)  # 30 messages per second overall
+CHAT_RATE = (1, 1)  # 1 message per second in a chat
+GROUP_RATE = (20 / 60, 20)  # 20 messages per minute in a group or channel
+
+# a flood wait longer than this fails the send instead of holding the peer's queue.
+MAX_FLOOD_WAIT = 300
+MAX_ATTEMPTS = 5
+
+
+def _peer_buckets(peer_id: int) -> list[TokenBucket]:
+    buckets = [TokenBucket(*CHAT_RATE)]
+    # marked peer ids of groups and channels are negative.
+    if peer_id < 0:
+        buckets.append(TokenBucket(*GROUP_RATE))
+    return buckets
+
+
+@dataclass(order=True)
+class _Job:
+    rank: int
+    seq: int
+    priority: SendPriority = field(compare=False)
+    peer_id: int = field(compare=False)
+    run: Callable[[], Awaitable[Any]] = field(compare=False)
+    future: asyncio.Future[Any] = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+    task: asyncio.Task[None] | None = field(default=None, compare=False)
+
+
+@dataclass
+class _Peer:
+    peer_id: int
+    buckets: list[TokenBucket]
+    # a heap: the best lane first, then the oldest request.
+    jobs: list[_Job] = field(default_factory=list)
+    running: bool = False
+    blocked_until: float = 0
+    flood_waits: int = 0
+
+    def delay(self, now: float) -> float:
+        return max(self.blocked_until - now, *(bucket.delay(now) for bucket in self.buckets))
+
+
+class SendScheduler:
+    """
+    Rate limited queue for outbound messages of one client.
+
+    - every peer has its own token bucket(s) and queue, ordered by lane: `interactive` before `normal` before
+      `bulk`, then the oldest request. Sends of one lane to one peer never overtake each other.
+    - a global bucket caps the overall rate, when it is the bottleneck the best lane of all peers goes first.
+    - a `FloodWaitError` (or slow mode wait) only holds back the queue of the peer that caused it,
+      the send is retried once the wait is over.
+
+    `stats()` reports queue depths and wait times for introspection.
+    """
+
+    def __init__(self, global_rate: tuple[float, float] = GLOBAL_RATE, max_flood_wait: float = MAX_FLOOD_WAIT):
+        self._global = TokenBucket(*global_rate)
+        self._max_flood_wait = max_flood_wait
+        self._peers: dict[int, _Peer] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._pump_task: asyncio.Task[None] | None = None
+        self._sent = 0
+        self._failed = 0
+        self._flood_waits = 0
+        self._avg_wait = 0.0
+
+    async def submit(self, peer_id: int, run: Callable[[], Awaitable[Any]], priority: SendPriority = SendPriority.normal) -> Any:
+        """Queue `run()` for `peer_id` (marked peer id) and return its result once it was executed."""
+
+        loop = asyncio.get_running_loop()
+        job = _Job(
+            rank=priority.rank,
+            seq=next(self._seq),
+            priority=priority,
+            peer_id=peer_id,
+            run=run,
+            future=loop.create_future(),
+            enqueued_at=time.monotonic(),
+        )
+        peer = self._peers.get(peer_id)
+        if peer is None:
+            peer = self._peers[peer_id] = _Peer(peer_id, _peer_buckets(peer_id))
+        heapq.heappush(peer.jobs, job)
+        self._ensure_pump()
+        try:
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            # the caller gave up (e.g. an RPC deadline): drop the job, or abort it if it is running.
+            if job in peer.jobs:
+                peer.jobs.remove(job)
+                heapq.heapify(peer.jobs)
+            elif job.task is not None:
+                job.task.cancel()
+            raise
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        lanes = {lane.value: 0 for lane in SendPriority}
+        oldest = 0.0
+        peers = []
+        for peer in self._peers.values():
+            for job in peer.jobs:
+                lanes[job.priority.value] += 1
+                oldest = max(oldest, now - job.enqueued_at)
+            if peer.jobs or peer.running or peer.blocked_until > now:
+                peers.append(
+                    {
+                        "peer_id": peer.peer_id,
+                        "queued": len(peer.jobs),
+                        "running": peer.running,
+                        "blocked_for": round(max(peer.blocked_until - now, 0), 3),
+                        "flood_waits": peer.flood_waits,
+                    }
+                )
+        return {
+            "queued": sum(lanes.values()),
+            "lanes": lanes,
+            "running": sum(1 for peer in self._peers.values() if peer.running),
+            "oldest_wait": round(oldest, 3),
+            "avg_wait": round(self._avg_wait, 3),
+            "sent": self._sent,
+            "failed": self._failed,
+            "flood_waits": self._flood_waits,
+            "peers": sorted(peers, key=lambda item: (-item["queued"], item["peer_id"])),
+        }
+
+    def _ensure_pump(self) -> None:
+        self._wakeup.set()
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.get_running_loop().create_task(self._pump())
+
+    async def _pump(self) -> None:
+        # stops when idle, `submit` starts it again.
+        while any(peer.jobs for peer in self._peers.values()):
+            self._wakeup.clear()
+            now = time.monotonic()
+
+            ready: list[_Job] = []
+            next_at: float | None = None
+            for peer in self._peers.values():
+                if peer.running or not peer.jobs:
+                    continue
+                delay = peer.delay(now)
+                if delay > 0:
+                    next_at = min(next_at or delay, delay)
+                    continue
+                ready.append(peer.jobs[0])
+
+            if ready:
+                delay = self._global.delay(now)
+                if delay > 0:
+                    next_at = min(next_at or delay, delay)
+                else:
+                    self._start(min(ready), now)
+                    continue
+
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=next_at)
+
+        self._forget_idle_peers()
+
+    def _start(self, job: _Job, now: float) -> None:
+        peer = self._peers[job.peer_id]
+        heapq.heappop(peer.jobs)
+        peer.running = True
+        self._global.take(now)
+        for bucket in peer.buckets:
+            bucket.take(now)
+        job.task = asyncio.get_running_loop().create_task(self._execute(peer, job))
+
+    async def _execute(self, peer: _Peer, job: _Job) -> None:
+        job.attempts += 1
+        started = time.monotonic()
+        try:
+            result = await job.run()
+        except FloodError as exc:
+            seconds = getattr(exc, "seconds", None)
+            if seconds is None or seconds > self._max_flood_wait or job.attempts >= MAX_ATTEMPTS:
+                self._finish(job, started, exc=exc)
+            else:
+                self._flood_waits += 1
+                peer.flood_waits += 1
+                peer.blocked_until = max(peer.blocked_until, time.monotonic() + seconds)
+                # keeps its place: retried before anything of its lane queued behind it for this peer.
+                heapq.heappush(peer.jobs, job)
+        except BaseException as exc:
+            self._finish(job, started, exc=exc)
+            if not isinstance(exc, Exception):
+                raise
+        else:
+            self._finish(job, started, result=result)
+        finally:
+            peer.running = False
+            self._wakeup.set()
+            if any(item.jobs for item in self._peers.values()):
+                self._ensure_pump()
+
+    def _finish(self, job: _Job, started: float, result: Any = None, exc: BaseException | None = None) -> None:
+        wait = started - job.enqueued_at
+        self._avg_wait = wait if not (self._sent + self._failed) else self._avg_wait * 0.9 + wait * 0.1
+        if exc is None:
+            self._sent += 1
+        else:
+            self._failed += 1
+        if job.future.done():
+            return
+        if exc is None:
+            job.future.set_result(result)
+        elif isinstance(exc, asyncio.CancelledError):
+            job.future.cancel()
+        else:
+            job.future.set_exception(exc)
+
+    def _forget_idle_peers(self) -> None:
+        now = time.monotonic()
+        idle = [
+            key
+            for key, peer in self._peers.items()
+            if not peer.jobs and not peer.running and peer.blocked_until <= now and all(bucket.full(now) for bucket in peer.buckets)
+        ]
+        for peer_id in idle:
+            del self._peers[peer_id]
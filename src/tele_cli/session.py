@@ -1,41 +1,268 @@
-import uuid
+import sqlite3
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING, TypeVar, cast
 
 from telethon.sessions import SQLiteSession
+from telethon.tl import types
 
-from tele_cli.shared import get_app_user_defualt_dir
+from tele_cli.shared import get_app_session_current, get_session_path
 
+from .store import DaemonState, DialogSnapshot, EntityIndex, MessageArchive, Store, UploadCache, close_store, connect_store, get_store_path
 from .types import CurrentSessionPathNotValidError
+from .types.session import get_session_info_path
+
+if TYPE_CHECKING:
+    from .cache import EntityCache
+
+
+_S = TypeVar("_S", bound=Store)
+
+# seconds a connection waits for a lock held by another process (e.g. the daemon) before failing.
+_BUSY_TIMEOUT = 5
+# buffered entity rows and update states are written together, once this many are pending or the oldest is this old.
+_MAX_PENDING = 500
+_FLUSH_INTERVAL = 30
 
 
 class TGSession(SQLiteSession):
-    pass
+    """
+    Telethon's SQLite session, shared by the daemon and one-shot commands.
+
+    - the file runs in WAL mode with a busy timeout: readers never block, writers wait for each other.
+    - entity rows and update states are coalesced in memory and written in one transaction on `save()`
+      (Telethon saves every minute and on disconnect), or earlier once `_MAX_PENDING` are buffered or the oldest
+      is `_FLUSH_INTERVAL` seconds old. There is no timer: the age is checked when a row is buffered, so in a
+      quiet period buffered rows wait for the next `save()`, at most a minute. Other writes are committed right
+      away, so no transaction is left open to lock out the other process.
+    - `read_only` sessions open the file and the store read-only and never write (nor create them), for commands
+      that only need the auth key or answer from the store.
+    - the daemon keeps its update state in the store instead, see `use_daemon_state`.
+    """
+
+    _stores: dict[type[Store], Store] | None = None
+    _daemon_state: DaemonState | None = None
+    # in-memory entity metadata, only attached by long running clients (see `TGClient.get_entity_cache`).
+    entity_cache: "EntityCache | None" = None
+
+    def __init__(self, session_id: str | None = None, read_only: bool = False):
+        # the connection is opened by `super().__init__`.
+        self.read_only = read_only
+        self._pending_entities: dict[int, tuple] = {}
+        self._pending_states: dict[int, types.updates.State] = {}
+        self._pending_since: float | None = None
+        super().__init__(session_id)
+
+    def get_store(self, cls: type[_S]) -> _S:
+        """Open a table of the store living next to this session file, see `tele_cli.store`."""
+
+        if self._stores is None:
+            self._stores = {}
+        store = self._stores.get(cls)
+        if store is None:
+            store = self._stores[cls] = cls.open(self.filename, read_only=self.read_only)
+        return cast(_S, store)
+
+    def entity_index(self) -> EntityIndex:
+        return self.get_store(EntityIndex)
+
+    def message_archive(self) -> MessageArchive:
+        return self.get_store(MessageArchive)
+
+    def upload_cache(self) -> UploadCache:
+        return self.get_store(UploadCache)
+
+    def dialog_snapshot(self) -> DialogSnapshot:
+        return self.get_store(DialogSnapshot)
+
+    def daemon_state(self) -> DaemonState:
+        return self.get_store(DaemonState)
 
+    def use_daemon_state(self) -> None:
+        """Read and write the update state of `DaemonState` from now on, which one-shot commands leave alone."""
 
-def get_app_session_folder() -> Path:
-    ret = get_app_user_defualt_dir() / "sessions"
-    ret.mkdir(parents=True, exist_ok=True)
-    return ret
+        self._daemon_state = self.daemon_state()
 
+    def process_entities(self, tlo):
+        if self.entity_cache is not None:
+            self.entity_cache.process_entities(tlo)
+        if not self.save_entities:
+            return
+        if not self.read_only:
+            now = int(time.time())
+            for row in self._entities_to_rows(tlo):
+                self._pending_entities[row[0]] = (*row, now)
+            self._flush_due()
+        try:
+            self.entity_index().process_entities(tlo)
+            if getattr(tlo, "dialogs", None):
+                self.dialog_snapshot().process_dialogs(tlo)
+        except sqlite3.Error:
+            # the index is only a cache, it must never break request or update handling.
+            pass
 
-def get_app_session_current() -> Path:
-    return get_app_session_folder() / "Current.session"
+    def get_update_state(self, entity_id):
+        if self._daemon_state is not None:
+            return self._daemon_state.get_update_state(entity_id)
+        state = self._pending_states.get(entity_id)
+        return state if state is not None else super().get_update_state(entity_id)
 
+    def set_update_state(self, entity_id, state):
+        if self.read_only:
+            return
+        if self._daemon_state is not None:
+            # committed with the stores on `save()`.
+            self._daemon_state.set_update_state(entity_id, state)
+            return
+        self._pending_states[entity_id] = state
+        self._flush_due()
 
-def _get_session_path(session_name: str | None, with_current: bool) -> Path:
-    if session_name:
-        return get_app_session_folder() / session_name
+    def get_update_states(self):
+        if self._daemon_state is not None:
+            return self._daemon_state.get_update_states()
+        self._flush()
+        return super().get_update_states()
 
-    current = get_app_session_current()
-    if with_current and current.exists():
-        return current
+    def get_entity_rows_by_phone(self, phone):
+        self._flush()
+        return super().get_entity_rows_by_phone(phone)
 
-    return get_app_session_folder() / str(uuid.uuid4())
+    def get_entity_rows_by_username(self, username):
+        self._flush()
+        return super().get_entity_rows_by_username(username)
 
+    def get_entity_rows_by_name(self, name):
+        self._flush()
+        return super().get_entity_rows_by_name(name)
 
-def load_session(session_name: str | None, with_current: bool = True) -> TGSession:
-    session_path = _get_session_path(session_name=session_name, with_current=with_current)
-    return TGSession(str(session_path))
+    def get_entity_rows_by_id(self, id, exact=True):
+        row = self._pending_entities.get(id) if exact else None
+        if row is not None:
+            return row[:2]
+        self._flush()
+        return super().get_entity_rows_by_id(id, exact=exact)
+
+    def cache_file(self, md5_digest, file_size, instance):
+        if self.read_only:
+            return
+        super().cache_file(md5_digest, file_size, instance)
+        self._commit()
+
+    def save(self):
+        if not self.read_only:
+            self._flush()
+            super().save()
+        if self._stores and not self.read_only:
+            # all tables share one connection.
+            connect_store(get_store_path(self.filename)).commit()
+
+    def close(self):
+        if self.read_only:
+            if self._conn is not None:
+                self._conn.rollback()
+        else:
+            self._flush()
+        super().close()
+        if self._stores:
+            (self._stores, self._daemon_state) = (None, None)
+            close_store(get_store_path(self.filename))
+
+    def delete(self):
+        store_path = get_store_path(self.filename)
+        (self._stores, self._daemon_state) = (None, None)
+        close_store(store_path)
+        for path in (store_path, Path(f"{store_path}-wal"), Path(f"{store_path}-shm")):
+            path.unlink(missing_ok=True)
+        get_session_info_path(Path(self.filename).resolve()).unlink(missing_ok=True)
+        deleted = super().delete()
+        for path in (Path(f"{self.filename}-wal"), Path(f"{self.filename}-shm")):
+            path.unlink(missing_ok=True)
+        return deleted
+
+    def _cursor(self):
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn.cursor()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.filename == ":memory:":
+            return sqlite3.connect(self.filename, check_same_thread=False)
+        path = Path(self.filename).resolve()
+        if self.read_only and not path.exists():
+            # never create the file: an empty session (no auth key) in memory, like `Store.open` does for the store.
+            return sqlite3.connect(":memory:", check_same_thread=False)
+        if self.read_only:
+            try:
+                conn = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True, timeout=_BUSY_TIMEOUT, check_same_thread=False)
+                conn.execute("select count(*) from sqlite_master").fetchone()
+                return conn
+            except sqlite3.OperationalError:
+                # e.g. a WAL file without its shared memory file, which a read-only connection can not create.
+                pass
+        conn = sqlite3.connect(path, timeout=_BUSY_TIMEOUT, check_same_thread=False)
+        if not self.read_only:
+            try:
+                conn.execute("pragma journal_mode=wal")
+                conn.execute("pragma synchronous=normal")
+            except sqlite3.OperationalError:
+                # switching needs a moment without other connections, the next open tries again.
+                pass
+        return conn
+
+    def _update_session_table(self):
+        # the auth key, data center and takeout id: rare, committed at once.
+        if self.read_only:
+            return
+        super()._update_session_table()
+        self._commit()
+
+    def _commit(self) -> None:
+        if self._conn is not None:
+            self._conn.commit()
+
+    def _flush_due(self) -> None:
+        if not self._pending_entities and not self._pending_states:
+            return
+        now = time.monotonic()
+        if self._pending_since is None:
+            self._pending_since = now
+        if len(self._pending_entities) + len(self._pending_states) >= _MAX_PENDING or now - self._pending_since >= _FLUSH_INTERVAL:
+            try:
+                self._flush()
+            except sqlite3.OperationalError:
+                # still locked after the busy timeout, kept for the next attempt.
+                pass
+
+    def _flush(self) -> None:
+        """Write the buffered entity rows and update states in one transaction."""
+
+        if self.read_only or (not self._pending_entities and not self._pending_states):
+            return
+        entities = self._pending_entities
+        states = self._pending_states
+        (self._pending_entities, self._pending_states, self._pending_since) = ({}, {}, None)
+        c = self._cursor()
+        try:
+            c.executemany("insert or replace into entities values (?,?,?,?,?,?)", list(entities.values()))
+            c.executemany(
+                "insert or replace into update_state values (?,?,?,?,?)",
+                [(entity_id, state.pts, state.qts, state.date.timestamp(), state.seq) for (entity_id, state) in states.items()],
+            )
+            self._conn.commit()
+        except sqlite3.Error:
+            self._conn.rollback()
+            # newer rows buffered meanwhile win.
+            self._pending_entities = {**entities, **self._pending_entities}
+            self._pending_states = {**states, **self._pending_states}
+            self._pending_since = time.monotonic()
+            raise
+        finally:
+            c.close()
+
+
+def load_session(session_name: str | None, with_current: bool = True, read_only: bool = False) -> TGSession:
+    session_path = get_session_path(session_name=session_name, with_current=with_current)
+    return TGSession(str(session_path), read_only=read_only)
 
 
 def session_ensure_current_valid(session: object = None) -> None:
@@ -71,15 +298,8 @@ def session_ensure_current_valid(session: object = None) -> None:
     path.symlink_to(session_path)
 
 
-async def list_session_name() -> list[str]:
-    folder = get_app_session_folder()
-    session_name_list = [item.stem for item in folder.glob("*.session") if not item.is_symlink() and item.is_file()]
-    # session_list = [TGSession(str(session_path)) for session_path in session_path_list]
-    return session_name_list
-
-
-def session_switch(session: TGSession) -> None:
-    session_path = Path(session.filename)
+def session_switch(session: TGSession | Path) -> None:
+    session_path = session if isinstance(session, Path) else Path(session.filename)
 
     if not session_path.exists():
         return
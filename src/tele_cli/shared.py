@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import uuid
 from pathlib import Path
 
 
@@ -10,3 +11,37 @@ def get_app_user_defualt_dir() -> Path:
     share_dir = Path.home() / ".config" / "tele"
     share_dir.mkdir(parents=True, exist_ok=True)
     return share_dir
+
+
+def get_app_session_folder() -> Path:
+    ret = get_app_user_defualt_dir() / "sessions"
+    ret.mkdir(parents=True, exist_ok=True)
+    return ret
+
+
+def get_app_session_current() -> Path:
+    return get_app_session_folder() / "Current.session"
+
+
+def get_session_path(session_name: str | None, with_current: bool) -> Path:
+    """
+    Path of the session `session_name` refers to, without the `.session` suffix Telethon appends for named sessions.
+
+    Lives here rather than in `tele_cli.session` so it can be used without importing Telethon.
+    """
+
+    if session_name:
+        return get_app_session_folder() / session_name
+
+    current = get_app_session_current()
+    if with_current and current.exists():
+        return current
+
+    return get_app_session_folder() / str(uuid.uuid4())
+
+
+async def list_session_name() -> list[str]:
+    folder = get_app_session_folder()
+    session_name_list = [item.stem for item in folder.glob("*.session") if not item.is_symlink() and item.is_file()]
+    # session_list = [TGSession(str(session_path)) for session_path in session_path_list]
+    return session_name_list
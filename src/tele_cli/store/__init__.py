@@ -0,0 +1,21 @@
+from .archive import MessageArchive, SyncState, fts_quote
+from .base import Store, close_store, connect_store, get_store_path
+from .daemon import DaemonState
+from .dialog import DialogSnapshot, get_entity_kind
+from .entity import EntityIndex
+from .upload import UploadCache
+
+__all__ = [
+    "DaemonState",
+    "DialogSnapshot",
+    "EntityIndex",
+    "MessageArchive",
+    "Store",
+    "SyncState",
+    "UploadCache",
+    "close_store",
+    "connect_store",
+    "fts_quote",
+    "get_entity_kind",
+    "get_store_path",
+]
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime
+
+from telethon.tl.custom import Message
+
+from .base import Store
+from .entity import load_tl_object
+
+
+@dataclass
+class SyncState:
+    """
+    Coverage of the archive for one dialog: every message with `min_id <= id <= max_id` is stored.
+
+    `max_id` is the high-water mark `tele message sync` continues from.
+    `min_id <= 1` means the archive reaches back to the beginning of the dialog.
+    """
+
+    peer_id: int
+    min_id: int
+    max_id: int
+    synced_at: int
+
+    @property
+    def complete(self) -> bool:
+        return self.min_id <= 1
+
+
+def fts_quote(text: str) -> str:
+    """Turn plain words into an FTS5 query matching messages that contain all of them."""
+
+    return " ".join('"' + token.replace('"', '""') + '"' for token in text.split())
+
+
+def _timestamp(value: datetime | None) -> int | None:
+    # naive datetimes (as returned by dateparser) are local time, like Telethon treats them.
+    return int(value.timestamp()) if value else None
+
+
+class MessageArchive(Store):
+    """
+    Local archive of fetched messages, keyed by `(peer_id, message_id)`.
+
+    Messages are stored as their serialized TL object, so they can be rebuilt into `Message` objects and rendered
+    by the same formatters as messages fetched from the network. The sender/chat entities come from `EntityIndex`.
+    """
+
+    SCHEMA = """
+    create table if not exists message (
+        peer_id integer not null,
+        id integer not null,
+        date integer not null,
+        sender_id integer,
+        text text,
+        raw blob not null,
+        primary key (peer_id, id)
+    );
+    create index if not exists message_peer_date on message (peer_id, date);
+    create table if not exists sync_state (
+        peer_id integer primary key,
+        min_id integer not null,
+        max_id integer not null,
+        synced_at integer not null
+    );
+    create virtual table if not exists message_fts using fts5 (
+        text, content = 'message', content_rowid = 'rowid', tokenize = 'unicode61 remove_diacritics 2'
+    );
+    create trigger if not exists message_fts_insert after insert on message begin
+        insert into message_fts (rowid, text) values (new.rowid, new.text);
+    end;
+    create trigger if not exists message_fts_delete after delete on message begin
+        insert into message_fts (message_fts, rowid, text) values ('delete', old.rowid, old.text);
+    end;
+    create trigger if not exists message_fts_update after update of text on message begin
+        insert into message_fts (message_fts, rowid, text) values ('delete', old.rowid, old.text);
+        insert into message_fts (rowid, text) values (new.rowid, new.text);
+    end;
+    """
+
+    def __init__(self, conn: sqlite3.Connection, read_only: bool = False):
+        has_fts = conn.execute("select 1 from sqlite_master where name = 'message_fts'").fetchone() is not None
+        super().__init__(conn, read_only=read_only)
+        if not has_fts and not read_only:
+            # archives created before the search index existed.
+            conn.execute("insert into message_fts (message_fts) values ('rebuild')")
+            conn.commit()
+
+    def store(self, messages: Iterable[Message]) -> None:
+        rows = [
+            (msg.chat_id, msg.id, _timestamp(msg.date) or 0, msg.sender_id, msg.message, bytes(msg)) for msg in messages if msg.chat_id is not None and msg.id
+        ]
+        self._conn.executemany(
+            """
+            insert into message (peer_id, id, date, sender_id, text, raw) values (?, ?, ?, ?, ?, ?)
+            on conflict (peer_id, id) do update set
+                date = excluded.date, sender_id = excluded.sender_id, text = excluded.text, raw = excluded.raw
+            """,
+            rows,
+        )
+
+    def get_state(self, peer_id: int) -> SyncState | None:
+        row = self._conn.execute("select peer_id, min_id, max_id, synced_at from sync_state where peer_id = ?", (peer_id,)).fetchone()
+        return SyncState(*row) if row else None
+
+    def extend_state(self, peer_id: int, min_id: int | None = None, max_id: int | None = None) -> SyncState:
+        """
+        Grow the covered range of `peer_id`. The caller guarantees the new range is contiguous with the stored one.
+        """
+
+        state = self.get_state(peer_id)
+        lo = min(x for x in (min_id, max_id, state and state.min_id) if x is not None)
+        hi = max(x for x in (min_id, max_id, state and state.max_id) if x is not None)
+        now = int(time.time())
+        self._conn.execute(
+            """
+            insert into sync_state (peer_id, min_id, max_id, synced_at) values (?, ?, ?, ?)
+            on conflict (peer_id) do update set min_id = excluded.min_id, max_id = excluded.max_id, synced_at = excluded.synced_at
+            """,
+            (peer_id, lo, hi, now),
+        )
+        self.commit()
+        return SyncState(peer_id=peer_id, min_id=lo, max_id=hi, synced_at=now)
+
+    def query(
+        self,
+        peer_id: int,
+        min_id: int = 0,
+        max_id: int | None = None,
+        date_start: datetime | None = None,
+        date_end: datetime | None = None,
+        limit: int | None = None,
+    ) -> list[Message]:
+        """
+        Messages of `peer_id` newest first, `min_id <= id < max_id` and `date_start <= date < date_end`.
+        """
+
+        clauses = ["peer_id = ?", "id >= ?"]
+        values: list[object] = [peer_id, min_id]
+        if max_id:
+            clauses.append("id < ?")
+            values.append(max_id)
+        if date_start:
+            clauses.append("date >= ?")
+            values.append(_timestamp(date_start))
+        if date_end:
+            clauses.append("date < ?")
+            values.append(_timestamp(date_end))
+        values.append(-1 if limit is None else limit)
+
+        rows = self._conn.execute(f"select raw from message where {' and '.join(clauses)} order by id desc limit ?", values)
+        return [msg for (raw,) in rows if isinstance(msg := load_tl_object(raw), Message)]
+
+    def search(
+        self,
+        query: str,
+        peer_ids: list[int] | None = None,
+        date_start: datetime | None = None,
+        date_end: datetime | None = None,
+        limit: int | None = None,
+    ) -> list[Message]:
+        """
+        Full-text search over archived messages, best match first (bm25).
+
+        `query` is an FTS5 expression, see `fts_quote` to search for plain words.
+        """
+
+        clauses = ["message_fts match ?"]
+        values: list[object] = [query]
+        if peer_ids:
+            clauses.append(f"m.peer_id in ({','.join('?' * len(peer_ids))})")
+            values.extend(peer_ids)
+        if date_start:
+            clauses.append("m.date >= ?")
+            values.append(_timestamp(date_start))
+        if date_end:
+            clauses.append("m.date < ?")
+            values.append(_timestamp(date_end))
+        values.append(-1 if limit is None else limit)
+
+        rows = self._conn.execute(
+            f"""
+            select m.raw from message_fts join message as m on m.rowid = message_fts.rowid
+            where {" and ".join(clauses)}
+            order by bm25(message_fts) limit ?
+            """,
+            values,
+        )
+        return [msg for (raw,) in rows if isinstance(msg := load_tl_object(raw), Message)]
+
+    def id_before(self, peer_id: int, date: datetime, slack: int) -> int | None:
+        """
+        A lower bound for the messages of `peer_id` at or after `date`: the id of the last archived message before it,
+        usable as exclusive `min_id`. The archived messages are checkpoints of the dialog's (date -> id) order.
+
+        The bound is exact when both checkpoints around `date` lie in the covered range. Otherwise they are only
+        used when at most `slack` ids apart, so a few older messages may be fetched and have to be skipped.
+        `None` if the archive can not tell.
+        """
+
+        ts = _timestamp(date)
+        before = self._conn.execute(
+            "select id from message where peer_id = ? and date < ? order by date desc, id desc limit 1",
+            (peer_id, ts),
+        ).fetchone()
+        after = self._conn.execute(
+            "select id from message where peer_id = ? and date >= ? order by date, id limit 1",
+            (peer_id, ts),
+        ).fetchone()
+        if after is None:
+            return None
+
+        state = self.get_state(peer_id)
+        if before is None:
+            # nothing archived is older, which only means something if the archive reaches back to the first message.
+            return 0 if state and state.complete and after[0] <= state.max_id else None
+        if state and state.min_id <= before[0] and after[0] <= state.max_id:
+            return before[0]
+        return before[0] if after[0] - before[0] <= slack else None
+
+    def oldest_date(self, peer_id: int, min_id: int = 0) -> datetime | None:
+        row = self._conn.execute("select min(date) from message where peer_id = ? and id >= ?", (peer_id, min_id)).fetchone()
+        if not row or row[0] is None:
+            return None
+        return datetime.fromtimestamp(row[0]).astimezone()
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+from pathlib import Path
+from typing import Self
+
+STORE_SUFFIX = ".store"
+
+# by path and whether the connection is read-only.
+_connections: dict[tuple[Path, bool], sqlite3.Connection] = {}
+
+
+def get_store_path(session_path: Path | str) -> Path:
+    """
+    The store is a SQLite sidecar next to the session file, e.g. `<name>.session` -> `<name>.store`.
+
+    `Current.session` is a symlink, resolve it so every alias of a session shares one store.
+    """
+
+    return Path(session_path).resolve().with_suffix(STORE_SUFFIX)
+
+
+def connect_store(path: Path, read_only: bool = False) -> sqlite3.Connection:
+    """
+    Open (or reuse) the connection of the store at `path`.
+
+    One connection is shared per process, the daemon and one-shot commands access the same file concurrently,
+    so the database runs in WAL mode with a busy timeout instead of failing with `database is locked`.
+
+    `read_only` opens the file with `mode=ro` (or reuses the writable connection of this process) and neither
+    creates it nor switches its journal mode; `sqlite3.OperationalError` if it can not be opened that way.
+    """
+
+    path = path.resolve()
+    conn = _connections.get((path, False)) or (_connections.get((path, True)) if read_only else None)
+    if conn is not None:
+        return conn
+
+    if read_only:
+        conn = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True, timeout=5, check_same_thread=False)
+        try:
+            conn.execute("select count(*) from sqlite_master").fetchone()
+        except sqlite3.OperationalError:
+            # e.g. a WAL file without its shared memory file, which a read-only connection can not create.
+            conn.close()
+            raise
+        _connections[(path, True)] = conn
+        return conn
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    conn.execute("pragma journal_mode=wal")
+    conn.execute("pragma synchronous=normal")
+    _connections[(path, False)] = conn
+    return conn
+
+
+def close_store(path: Path) -> None:
+    path = path.resolve()
+    for read_only in (False, True):
+        conn = _connections.pop((path, read_only), None)
+        if conn is None:
+            continue
+        if not read_only:
+            conn.commit()
+        conn.close()
+
+
+class Store:
+    """
+    Base class of the tables living in the session store.
+
+    Subclasses declare their tables in `SCHEMA`, which is applied idempotently when the store is opened.
+    """
+
+    SCHEMA: str = ""
+
+    def __init__(self, conn: sqlite3.Connection, read_only: bool = False):
+        """`read_only` connections are used as they are, their schema is never applied."""
+
+        self._conn = conn
+        if self.SCHEMA and not read_only:
+            conn.executescript(self.SCHEMA)
+
+    @classmethod
+    def open(cls, session_path: Path | str, read_only: bool = False) -> Self:
+        """
+        `read_only` never writes to the store file. If it does not exist yet, or misses a table of `SCHEMA`,
+        an empty store in memory is used instead.
+        """
+
+        if not read_only:
+            return cls(connect_store(get_store_path(session_path)))
+        try:
+            conn = connect_store(get_store_path(session_path), read_only=True)
+            if cls._has_tables(conn):
+                return cls(conn, read_only=True)
+        except sqlite3.OperationalError:
+            pass
+        return cls(sqlite3.connect(":memory:", check_same_thread=False))
+
+    @classmethod
+    def _has_tables(cls, conn: sqlite3.Connection) -> bool:
+        tables = set(re.findall(r"create (?:virtual )?table if not exists (\w+)", cls.SCHEMA))
+        if not tables:
+            return True
+        placeholders = ",".join("?" * len(tables))
+        (found,) = conn.execute(f"select count(*) from sqlite_master where type = 'table' and name in ({placeholders})", list(tables)).fetchone()
+        return found == len(tables)
+
+    def commit(self) -> None:
+        self._conn.commit()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+from telethon.tl import types
+
+from .base import Store
+
+# (peer, message) pairs remembered to drop a message delivered twice, the oldest are forgotten beyond this.
+SEEN_CAPACITY = 10000
+# the seen-set is trimmed once per this many new entries.
+_TRIM_EVERY = 500
+
+
+class DaemonState(Store):
+    """
+    What the daemon has delivered: the update state it continues from, and the recently emitted messages.
+
+    - `daemon_update_state`: pts/qts/date/seq of the account (`id = 0`) and the pts of each channel, in the layout
+      of the session's `update_state`. That table is not used: every one-shot command writes the state it saw
+      when it disconnects, which would skip whatever happened between two daemon runs.
+    - `daemon_seen`: the last `SEEN_CAPACITY` messages emitted, by (peer, id). Catch-up and a reconnect can
+      deliver a message again, it is only emitted once.
+    """
+
+    SCHEMA = """
+    create table if not exists daemon_update_state (
+        id integer primary key,
+        pts integer,
+        qts integer,
+        date integer,
+        seq integer
+    );
+    create table if not exists daemon_seen (
+        peer_id integer not null,
+        id integer not null,
+        unique (peer_id, id)
+    );
+    """
+
+    _added = 0
+
+    def get_update_state(self, entity_id: int) -> types.updates.State | None:
+        row = self._conn.execute("select pts, qts, date, seq from daemon_update_state where id = ?", (entity_id,)).fetchone()
+        return _to_state(row) if row else None
+
+    def get_update_states(self) -> list[tuple[int, types.updates.State]]:
+        rows = self._conn.execute("select id, pts, qts, date, seq from daemon_update_state").fetchall()
+        return [(row[0], _to_state(row[1:])) for row in rows]
+
+    def set_update_state(self, entity_id: int, state: types.updates.State) -> None:
+        self._conn.execute(
+            "insert or replace into daemon_update_state values (?, ?, ?, ?, ?)",
+            (entity_id, state.pts, state.qts, int(state.date.timestamp()), state.seq),
+        )
+
+    def mark_seen(self, peer_id: int, message_id: int) -> bool:
+        """Remember the message, `False` if it was seen before."""
+
+        cursor = self._conn.execute("insert or ignore into daemon_seen (peer_id, id) values (?, ?)", (peer_id, message_id))
+        if cursor.rowcount != 1:
+            return False
+        self._added += 1
+        if self._added >= _TRIM_EVERY:
+            self._added = 0
+            self._conn.execute("delete from daemon_seen where rowid <= (select max(rowid) from daemon_seen) - ?", (SEEN_CAPACITY,))
+        return True
+
+
+def _to_state(row: tuple) -> types.updates.State:
+    (pts, qts, date, seq) = row
+    return types.updates.State(pts, qts, datetime.fromtimestamp(date, tz=UTC), seq, unread_count=0)
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from collections.abc import Callable, Iterable
+from datetime import datetime
+
+from telethon import utils
+from telethon.tl import types
+from telethon.tl.tlobject import TLObject
+
+from .base import Store
+from .entity import load_tl_object
+
+
+def _timestamp(value: datetime | None) -> int | None:
+    return int(value.timestamp()) if value else None
+
+
+def get_entity_kind(entity: object) -> str:
+    """The `DialogType` value of a dialog with `entity`, same rules as `get_dialog_type`."""
+
+    match entity:
+        case types.User():
+            return "user"
+        case types.Chat() | types.ChatForbidden():
+            return "group"
+        case types.Channel() if entity.megagroup:
+            return "group"
+        case types.Channel() | types.ChannelForbidden():
+            return "channel"
+    return "unknown"
+
+
+class DialogSnapshot(Store):
+    """
+    The dialog list as last seen: one row per dialog with the raw `Dialog` and its top message.
+
+    Rows are written from every `dialogs` result the session processes (see `TGSession.process_entities`)
+    and kept current by `process_update` (new messages, read marks, pins, folders, notification settings),
+    so `tele dialog list --cached` is answered without a request. Pinned dialogs come first, then by date;
+    the order of pinned dialogs among themselves is not tracked.
+    """
+
+    SCHEMA = """
+    create table if not exists dialog (
+        peer_id integer primary key,
+        kind text not null,
+        name text,
+        unread_count integer not null,
+        pinned integer not null,
+        folder_id integer,
+        mute_until integer,
+        top_message integer not null,
+        date integer not null,
+        dialog_raw blob not null,
+        message_raw blob,
+        updated_at integer not null
+    );
+    create index if not exists dialog_kind_date on dialog (kind, date);
+    create index if not exists dialog_pinned_date on dialog (pinned, date);
+    create table if not exists dialog_sync (
+        id integer primary key check (id = 0),
+        synced_at integer not null
+    );
+    """
+
+    def process_dialogs(self, tlo: object) -> None:
+        """Store the `dialogs` carried by a TL result (`messages.Dialogs`, `messages.PeerDialogs`, ...)."""
+
+        dialogs = [x for x in getattr(tlo, "dialogs", None) or [] if isinstance(x, types.Dialog)]
+        if not dialogs:
+            return
+
+        entities = {utils.get_peer_id(x): x for x in (*(getattr(tlo, "users", None) or []), *(getattr(tlo, "chats", None) or []))}
+        messages: dict[tuple[int, int], TLObject] = {}
+        for msg in getattr(tlo, "messages", None) or []:
+            peer = getattr(msg, "peer_id", None)
+            if peer is not None:
+                messages[(utils.get_peer_id(peer), msg.id)] = msg
+
+        for dialog in dialogs:
+            peer_id = utils.get_peer_id(dialog.peer)
+            entity = entities.get(peer_id)
+            self._put(dialog, entity, messages.get((peer_id, dialog.top_message)))
+
+    def process_update(self, update: object) -> None:
+        """Apply an update to the stored dialog it belongs to; new dialogs are added on their first message."""
+
+        entities: dict[int, object] = getattr(update, "_entities", None) or {}
+        match update:
+            case types.UpdateNewMessage() | types.UpdateNewChannelMessage():
+                self._on_message(update.message, entities)
+            case types.UpdateEditMessage() | types.UpdateEditChannelMessage():
+                msg = update.message
+                if isinstance(msg, types.Message):
+                    self._modify(msg.peer_id, lambda d: msg if d.top_message == msg.id else None)
+            case types.UpdateReadHistoryInbox():
+                self._modify(update.peer, lambda d: _set(d, read_inbox_max_id=update.max_id, unread_count=update.still_unread_count))
+            case types.UpdateReadChannelInbox():
+                peer = types.PeerChannel(update.channel_id)
+                self._modify(peer, lambda d: _set(d, read_inbox_max_id=update.max_id, unread_count=update.still_unread_count))
+            case types.UpdateReadHistoryOutbox():
+                self._modify(update.peer, lambda d: _set(d, read_outbox_max_id=update.max_id))
+            case types.UpdateReadChannelOutbox():
+                self._modify(types.PeerChannel(update.channel_id), lambda d: _set(d, read_outbox_max_id=update.max_id))
+            case types.UpdateDialogUnreadMark() if isinstance(update.peer, types.DialogPeer):
+                self._modify(update.peer.peer, lambda d: _set(d, unread_mark=update.unread))
+            case types.UpdateDialogPinned() if isinstance(update.peer, types.DialogPeer):
+                self._modify(update.peer.peer, lambda d: _set(d, pinned=update.pinned))
+            case types.UpdateFolderPeers():
+                for item in update.folder_peers:
+                    # folder 0 is the main list.
+                    self._modify(item.peer, lambda d, folder_id=item.folder_id or None: _set(d, folder_id=folder_id))
+            case types.UpdateNotifySettings() if isinstance(update.peer, types.NotifyPeer):
+                self._modify(update.peer.peer, lambda d: _set(d, notify_settings=update.notify_settings))
+
+    def query(self, kinds: Iterable[str] | None = None, archived: bool = False, limit: int | None = None) -> list[tuple[types.Dialog, TLObject | None]]:
+        """Stored dialogs with their top message (if known), in dialog list order. Archived ones only with `archived`."""
+
+        clauses: list[str] = []
+        values: list[object] = []
+        kinds = list(kinds or [])
+        if kinds:
+            clauses.append(f"kind in ({','.join('?' * len(kinds))})")
+            values.extend(kinds)
+        if not archived:
+            clauses.append("folder_id is null")
+        where = f"where {' and '.join(clauses)}" if clauses else ""
+        values.append(-1 if limit is None else limit)
+
+        rows = self._conn.execute(f"select dialog_raw, message_raw from dialog {where} order by pinned desc, date desc limit ?", values)
+        return [(dialog, load_tl_object(message_raw)) for (dialog_raw, message_raw) in rows if isinstance(dialog := load_tl_object(dialog_raw), types.Dialog)]
+
+    def latest_date(self) -> datetime | None:
+        row = self._conn.execute("select max(date) from dialog").fetchone()
+        if not row or not row[0]:
+            return None
+        return datetime.fromtimestamp(row[0]).astimezone()
+
+    def synced_at(self) -> datetime | None:
+        """When the whole dialog list was fetched last, `None` for a snapshot that may be incomplete."""
+
+        row = self._conn.execute("select synced_at from dialog_sync where id = 0").fetchone()
+        return datetime.fromtimestamp(row[0]).astimezone() if row else None
+
+    def is_stale(self, max_age: float) -> bool:
+        """`True` if the whole list was never fetched, or last fetched more than `max_age` seconds ago."""
+
+        synced_at = self.synced_at()
+        return synced_at is None or time.time() - synced_at.timestamp() > max_age
+
+    def mark_synced(self) -> None:
+        self._conn.execute("insert or replace into dialog_sync (id, synced_at) values (0, ?)", (int(time.time()),))
+        self.commit()
+
+    def _on_message(self, msg: object, entities: dict[int, object]) -> None:
+        if not isinstance(msg, (types.Message, types.MessageService)):
+            return
+        peer_id = utils.get_peer_id(msg.peer_id)
+        row = self._conn.execute("select dialog_raw from dialog where peer_id = ?", (peer_id,)).fetchone()
+        dialog = load_tl_object(row[0]) if row else None
+        if not isinstance(dialog, types.Dialog):
+            dialog = types.Dialog(
+                peer=msg.peer_id,
+                top_message=0,
+                read_inbox_max_id=0,
+                read_outbox_max_id=0,
+                unread_count=0,
+                unread_mentions_count=0,
+                unread_reactions_count=0,
+                unread_poll_votes_count=0,
+                notify_settings=types.PeerNotifySettings(),
+            )
+        if msg.id <= dialog.top_message:
+            return
+        dialog.top_message = msg.id
+        if not msg.out and msg.id > dialog.read_inbox_max_id:
+            dialog.unread_count += 1
+        self._put(dialog, entities.get(peer_id) or self._load_entity(peer_id), msg)
+
+    def _modify(self, peer: object, change: Callable[[types.Dialog], TLObject | None]) -> None:
+        """
+        Apply `change` to the stored dialog of `peer`, in place. A returned message replaces the top message.
+        """
+
+        peer_id = utils.get_peer_id(peer)
+        row = self._conn.execute("select dialog_raw, message_raw from dialog where peer_id = ?", (peer_id,)).fetchone()
+        dialog = load_tl_object(row[0]) if row else None
+        if not isinstance(dialog, types.Dialog):
+            return
+        message = change(dialog) or load_tl_object(row[1])
+        self._put(dialog, self._load_entity(peer_id), message)
+
+    def _load_entity(self, peer_id: int) -> TLObject | None:
+        # the entity index shares this database (see `EntityIndex`).
+        try:
+            row = self._conn.execute("select raw from entity where peer_id = ?", (peer_id,)).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return load_tl_object(row[0]) if row else None
+
+    def _put(self, dialog: types.Dialog, entity: object | None, message: TLObject | None) -> None:
+        peer_id = utils.get_peer_id(dialog.peer)
+        settings = dialog.notify_settings
+        date = getattr(message, "date", None)
+        name = utils.get_display_name(entity) if entity is not None else None
+        self._conn.execute(
+            """
+            insert into dialog (
+                peer_id, kind, name, unread_count, pinned, folder_id, mute_until, top_message, date, dialog_raw, message_raw, updated_at
+            ) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            on conflict (peer_id) do update set
+                kind = case when excluded.kind = 'unknown' then dialog.kind else excluded.kind end,
+                name = coalesce(excluded.name, dialog.name),
+                unread_count = excluded.unread_count,
+                pinned = excluded.pinned,
+                folder_id = excluded.folder_id,
+                mute_until = excluded.mute_until,
+                top_message = excluded.top_message,
+                date = case when excluded.date = 0 then dialog.date else excluded.date end,
+                dialog_raw = excluded.dialog_raw,
+                message_raw = excluded.message_raw,
+                updated_at = excluded.updated_at
+            """,
+            (
+                peer_id,
+                get_entity_kind(entity),
+                name or None,
+                dialog.unread_count,
+                int(bool(dialog.pinned)),
+                dialog.folder_id or None,
+                _timestamp(getattr(settings, "mute_until", None)),
+                dialog.top_message,
+                _timestamp(date) or 0,
+                bytes(dialog),
+                bytes(message) if message is not None else None,
+                int(time.time()),
+            ),
+        )
+
+
+def _set(dialog: types.Dialog, **values: object) -> None:
+    for key, value in values.items():
+        setattr(dialog, key, value)
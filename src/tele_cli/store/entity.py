@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import itertools
+import time
+from collections.abc import Iterable
+from datetime import datetime
+
+from telethon import utils
+from telethon.extensions import BinaryReader
+from telethon.tl import types
+from telethon.tl.tlobject import TLObject
+
+from .base import Store
+
+
+def normalize_name(value: str) -> str:
+    return value.strip().casefold()
+
+
+def normalize_username(value: str) -> str:
+    return value.strip().removeprefix("@").casefold()
+
+
+def load_tl_object(raw: bytes | None) -> TLObject | None:
+    """Decode a TL object serialized with `bytes(obj)`, `None` if it was written by an incompatible layer."""
+
+    if not raw:
+        return None
+    try:
+        return BinaryReader(raw).tgread_object()
+    except Exception:  # noqa: BLE001
+        return None
+
+
+class EntityIndex(Store):
+    """
+    Persistent receiver index: peer id, entity id, username and dialog name -> InputPeer.
+
+    Rows are fed from every TL result and update the session processes (see `TGSession.process_entities`),
+    so resolving a receiver is an indexed local lookup instead of a walk over `iter_dialogs()`.
+
+    `dialog_date` is only set for entities that are dialogs, it orders name matches like the dialog list does.
+    """
+
+    SCHEMA = """
+    create table if not exists entity (
+        peer_id integer primary key,
+        entity_id integer not null,
+        kind text not null,
+        access_hash integer,
+        username text,
+        name text,
+        name_norm text,
+        dialog_date integer,
+        raw blob,
+        updated_at integer not null
+    );
+    create index if not exists entity_entity_id on entity (entity_id);
+    create index if not exists entity_username on entity (username);
+    create index if not exists entity_name_norm on entity (name_norm);
+    create index if not exists entity_dialog_date on entity (dialog_date);
+    """
+
+    def process_entities(self, tlo: object) -> None:
+        """Index the `users`/`chats` (and `dialogs`, if any) carried by a TL result or update batch."""
+
+        users = getattr(tlo, "users", None) or []
+        chats = getattr(tlo, "chats", None) or []
+        if users or chats:
+            self.upsert_entities(itertools.chain(users, chats))
+
+        dialogs = getattr(tlo, "dialogs", None)
+        if not dialogs:
+            return
+
+        message_dates: dict[tuple[int, int], datetime] = {}
+        for msg in getattr(tlo, "messages", None) or []:
+            peer = getattr(msg, "peer_id", None)
+            date = getattr(msg, "date", None)
+            if peer is not None and isinstance(date, datetime):
+                message_dates[(utils.get_peer_id(peer), msg.id)] = date
+
+        marks: list[tuple[int, datetime | None]] = []
+        for dialog in dialogs:
+            peer = getattr(dialog, "peer", None)
+            if peer is None:
+                continue
+            peer_id = utils.get_peer_id(peer)
+            marks.append((peer_id, message_dates.get((peer_id, getattr(dialog, "top_message", 0)))))
+        self.mark_dialogs(marks)
+
+    def upsert_entities(self, entities: Iterable[object]) -> None:
+        now = int(time.time())
+        rows: list[tuple] = []
+        min_rows: list[tuple] = []
+        for entity in entities:
+            row = self._entity_to_row(entity, now)
+            if row is None:
+                continue
+            # `min` entities carry an access hash that is only valid in the context it was received,
+            # never let them overwrite a complete row.
+            if getattr(entity, "min", False):
+                min_rows.append(row)
+            else:
+                rows.append(row)
+
+        if rows:
+            self._conn.executemany(
+                """
+                insert into entity (peer_id, entity_id, kind, access_hash, username, name, name_norm, raw, updated_at)
+                values (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                on conflict (peer_id) do update set
+                    access_hash = excluded.access_hash,
+                    username = excluded.username,
+                    name = excluded.name,
+                    name_norm = excluded.name_norm,
+                    raw = excluded.raw,
+                    updated_at = excluded.updated_at
+                """,
+                rows,
+            )
+        if min_rows:
+            self._conn.executemany(
+                """
+                insert or ignore into entity (peer_id, entity_id, kind, access_hash, username, name, name_norm, raw, updated_at)
+                values (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                min_rows,
+            )
+
+    def mark_dialogs(self, dialogs: Iterable[tuple[int, datetime | None]]) -> None:
+        """Flag peers as dialogs, keeping the most recent activity date seen for each of them."""
+
+        rows = [(int(date.timestamp()) if date else 0, peer_id) for (peer_id, date) in dialogs]
+        self._conn.executemany(
+            "update entity set dialog_date = max(coalesce(dialog_date, 0), ?) where peer_id = ?",
+            rows,
+        )
+
+    def resolve(self, target: str | int) -> types.TypeInputPeer | None:
+        """
+        Exact lookups only: peer id, entity id or username. Never touches the network.
+        """
+
+        if isinstance(target, int):
+            return self._to_input_peer(self._fetch_one("select kind, entity_id, access_hash from entity where peer_id = ?", target))
+
+        raw = target.strip()
+        if raw.lstrip("-").isdigit():
+            number = int(raw)
+            row = self._fetch_one("select kind, entity_id, access_hash from entity where peer_id = ?", number)
+            row = row or self._fetch_one(
+                "select kind, entity_id, access_hash from entity where entity_id = ? order by dialog_date desc limit 1",
+                number,
+            )
+            return self._to_input_peer(row)
+
+        username = normalize_username(raw)
+        if not username:
+            return None
+        return self._to_input_peer(
+            self._fetch_one(
+                "select kind, entity_id, access_hash from entity where username = ? order by updated_at desc limit 1",
+                username,
+            )
+        )
+
+    def resolve_name(self, target: str) -> types.TypeInputPeer | None:
+        """
+        Match a dialog by name: exact (case-insensitive) first, then the most recent dialog whose name contains `target`.
+        """
+
+        name = normalize_name(target)
+        if not name:
+            return None
+
+        row = self._fetch_one(
+            """
+            select kind, entity_id, access_hash from entity
+            where name_norm = ? and dialog_date is not null
+            order by dialog_date desc limit 1
+            """,
+            name,
+        )
+        row = row or self._fetch_one(
+            """
+            select kind, entity_id, access_hash from entity
+            where dialog_date is not null and instr(name_norm, ?) > 0
+            order by dialog_date desc limit 1
+            """,
+            name,
+        )
+        return self._to_input_peer(row)
+
+    def latest_dialog_date(self) -> datetime | None:
+        row = self._fetch_one("select max(dialog_date) from entity where dialog_date is not null")
+        if not row or not row[0]:
+            return None
+        return datetime.fromtimestamp(row[0]).astimezone()
+
+    def get_entities(self, peer_ids: Iterable[int]) -> dict[int, TLObject]:
+        """Load the full `User`/`Chat`/`Channel` objects of `peer_ids` that are known locally."""
+
+        ids = list(set(peer_ids))
+        ret: dict[int, TLObject] = {}
+        # keep well below sqlite's host parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for peer_id, raw in self._conn.execute(f"select peer_id, raw from entity where peer_id in ({placeholders})", chunk):
+                entity = load_tl_object(raw)
+                if entity is not None:
+                    ret[peer_id] = entity
+        return ret
+
+    def recent_entities(self, limit: int) -> list[TLObject]:
+        """The full objects of the `limit` dialogs with the most recent activity."""
+
+        rows = self._conn.execute(
+            "select raw from entity where dialog_date is not null order by dialog_date desc limit ?",
+            (limit,),
+        )
+        return [entity for (raw,) in rows if (entity := load_tl_object(raw)) is not None]
+
+    def _fetch_one(self, stmt: str, *values: object) -> tuple | None:
+        return self._conn.execute(stmt, values).fetchone()
+
+    @staticmethod
+    def _to_input_peer(row: tuple | None) -> types.TypeInputPeer | None:
+        if row is None:
+            return None
+
+        (kind, entity_id, access_hash) = row
+        match kind:
+            case "user" if access_hash is not None:
+                return types.InputPeerUser(entity_id, access_hash)
+            case "chat":
+                return types.InputPeerChat(entity_id)
+            case "channel" if access_hash is not None:
+                return types.InputPeerChannel(entity_id, access_hash)
+        return None
+
+    @staticmethod
+    def _entity_to_row(entity: object, now: int) -> tuple | None:
+        match entity:
+            case types.User():
+                kind = "user"
+                name = utils.get_display_name(entity)
+            case types.Chat() | types.ChatForbidden():
+                kind = "chat"
+                name = entity.title
+            case types.Channel() | types.ChannelForbidden():
+                kind = "channel"
+                name = entity.title
+            case _:
+                return None
+
+        username = getattr(entity, "username", None)
+        if not username:
+            usernames = getattr(entity, "usernames", None) or []
+            username = next((x.username for x in usernames if getattr(x, "active", False)), None)
+
+        return (
+            utils.get_peer_id(entity),
+            entity.id,
+            kind,
+            getattr(entity, "access_hash", None),
+            normalize_username(username) if username else None,
+            name or None,
+            normalize_name(name) if name else None,
+            bytes(entity),
+            now,
+        )
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import time
+
+from telethon.tl.tlobject import TLObject
+
+from .base import Store
+from .entity import load_tl_object
+
+# Telegram keeps uploaded parts that were not sent yet only for a while, an upload handle is reused for at most this long.
+UPLOADED_FILE_TTL = 60 * 60
+# documents and photos of sent messages stay valid, until their file reference expires (then they are uploaded again).
+SENT_MEDIA_TTL = 30 * 24 * 60 * 60
+
+
+class UploadCache(Store):
+    """
+    Uploads by content: `key` (see `TGClient.prepare_files`) -> handle to send the same file again without uploading it.
+
+    - `file`: the `InputFile`/`InputFileBig` returned by the upload.
+    - `media`: the `InputDocument`/`InputPhoto` of a message the file was sent with, preferred once known.
+    """
+
+    SCHEMA = """
+    create table if not exists upload (
+        key text not null,
+        kind text not null,
+        raw blob not null,
+        created_at integer not null,
+        primary key (key, kind)
+    );
+    """
+
+    def get(self, key: str) -> TLObject | None:
+        now = int(time.time())
+        row = self._conn.execute(
+            """
+            select raw from upload
+            where key = ? and ((kind = 'media' and created_at > ?) or (kind = 'file' and created_at > ?))
+            order by kind = 'media' desc limit 1
+            """,
+            (key, now - SENT_MEDIA_TTL, now - UPLOADED_FILE_TTL),
+        ).fetchone()
+        return load_tl_object(row[0]) if row else None
+
+    def put(self, key: str, kind: str, handle: TLObject) -> None:
+        self._conn.execute(
+            "insert or replace into upload (key, kind, raw, created_at) values (?, ?, ?, ?)",
+            (key, kind, bytes(handle), int(time.time())),
+        )
+
+    def forget(self, keys: list[str]) -> None:
+        self._conn.executemany("delete from upload where key = ?", [(key,) for key in keys])
@@ -1,17 +1,44 @@
-from .config import Config
-from .error import ConfigError, CurrentSessionPathNotValidError
-from .output import OutputFormat, OutputOrder
-from .tl import DialogType, EntityType, get_dialog_type
-from .session import SessionInfo
+from typing import TYPE_CHECKING
+
+from .error import ConfigError, CurrentSessionPathNotValidError, DaemonError
+from .output import ExportFormat, OutputFormat, OutputOrder, OverflowPolicy
+from .tl import DialogType, EntityType, SendPriority, get_dialog_type, has_unread_messages, is_dialog_muted, is_difference_update, mark_difference_update
+
+if TYPE_CHECKING:
+    from .config import Config
+    from .session import SessionInfo
+
+# pydantic models are only loaded on first access, `tele -h` and friends do not need them.
+_LAZY = {
+    "Config": ".config",
+    "SessionInfo": ".session",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY:
+        import importlib
+
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
+    "ExportFormat",
     "OutputFormat",
     "OutputOrder",
+    "OverflowPolicy",
     "Config",
     "ConfigError",
     "CurrentSessionPathNotValidError",
+    "DaemonError",
     "EntityType",
     "DialogType",
+    "SendPriority",
     "get_dialog_type",
+    "is_dialog_muted",
+    "has_unread_messages",
+    "mark_difference_update",
+    "is_difference_update",
     "SessionInfo",
 ]
@@ -4,9 +4,25 @@ from enum import Enum
 class OutputFormat(str, Enum):
     text = "text"
     json = "json"
+    jsonl = "jsonl"
+    toon = "toon"
+
+
+class ExportFormat(str, Enum):
+    """File format of `tele message export`."""
+
+    jsonl = "jsonl"
     toon = "toon"
 
 
 class OutputOrder(str, Enum):
     asc = "asc"
     desc = "desc"
+
+
+class OverflowPolicy(str, Enum):
+    """What the daemon does with an event when its output buffer is full."""
+
+    block = "block"
+    drop_oldest = "drop-oldest"
+    spill = "spill"
@@ -1,7 +1,17 @@
+import json
+import os
+from datetime import datetime
 from pathlib import Path
 
 from pydantic import BaseModel, Field
 
+# next to the session file: `alice.session` -> `alice.session.json`.
+SESSION_INFO_SUFFIX = ".json"
+
+
+def get_session_info_path(session_path: Path) -> Path:
+    return session_path.with_name(session_path.name + SESSION_INFO_SUFFIX)
+
 
 class SessionInfo(BaseModel):
     path: Path = Field(exclude=True)
@@ -10,3 +20,25 @@ class SessionInfo(BaseModel):
     user_name: str | None = Field(...)
     user_phone: str | None = Field(...)
     user_display_name: str | None = Field(...)
+    # last time the session was seen authorized by Telegram.
+    verified_at: datetime | None = Field(default=None)
+
+    @staticmethod
+    def load(session_path: Path) -> "SessionInfo | None":
+        """The metadata stored next to `session_path`, `None` if there is none (or it is unreadable)."""
+
+        try:
+            raw = json.loads(get_session_info_path(session_path).read_text(encoding="utf-8"))
+            return SessionInfo.model_validate({**raw, "path": session_path})
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def save(self) -> None:
+        """Store the metadata next to the session file, only readable by the current user (it holds the phone number)."""
+
+        path = get_session_info_path(self.path)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self.model_dump_json(exclude={"path"}))
+        os.replace(tmp_path, path)
@@ -1,6 +1,11 @@
+from __future__ import annotations
+
+from datetime import datetime
 from enum import Enum
+from typing import TYPE_CHECKING
 
-from telethon.custom import Dialog
+if TYPE_CHECKING:
+    from telethon.custom import Dialog
 
 
 class EntityType(str, Enum):
@@ -9,6 +14,18 @@ class EntityType(str, Enum):
     peer_id = "peer_id"
 
 
+class SendPriority(str, Enum):
+    """Lanes of the `SendScheduler`, `interactive` is served first and `bulk` last."""
+
+    interactive = "interactive"
+    normal = "normal"
+    bulk = "bulk"
+
+    @property
+    def rank(self) -> int:
+        return list(SendPriority).index(self)
+
+
 class DialogType(str, Enum):
     unknown = "unknown"
     user = "user"
@@ -35,3 +52,36 @@ def get_dialog_type(d: Dialog) -> DialogType:
     if d.is_channel:
         return DialogType.channel
     return DialogType.unknown
+
+
+def is_dialog_muted(d: Dialog, now: datetime | None = None) -> bool:
+    mute_until = d.dialog.notify_settings.mute_until
+    return mute_until is not None and mute_until > (now or datetime.now().astimezone())
+
+
+# set on the updates Telethon recovered with `updates.getDifference`, see `TGClient.mark_difference_updates`.
+_DIFFERENCE_ATTR = "_tele_cli_difference"
+
+
+def mark_difference_update(update: object) -> None:
+    setattr(update, _DIFFERENCE_ATTR, True)
+
+
+def is_difference_update(update: object) -> bool:
+    """
+    An update fetched by `updates.getDifference` (catching up after a gap), not pushed live: marked by
+    `mark_difference_update`, or else a new message without a `pts`, which is how Telethon turns the messages
+    of a difference into `UpdateNewMessage`/`UpdateNewChannelMessage`.
+    """
+
+    if getattr(update, _DIFFERENCE_ATTR, False):
+        return True
+
+    from telethon.tl import types
+
+    return isinstance(update, (types.UpdateNewMessage, types.UpdateNewChannelMessage)) and not update.pts
+
+
+def has_unread_messages(d: Dialog) -> bool:
+    # not `unread_mark`: a dialog marked as unread by hand has no messages after its read mark.
+    return d.unread_count > 0
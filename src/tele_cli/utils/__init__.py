@@ -1,4 +1,18 @@
-from . import fmt
-from .output import print, get_str_len_for_int
+from typing import TYPE_CHECKING
 
-__all__ = ["fmt", "print", "get_str_len_for_int"]
+from .output import print, print_stream, get_str_len_for_int
+
+if TYPE_CHECKING:
+    from . import fmt
+
+
+def __getattr__(name: str):
+    # `fmt` pulls in telethon, arrow and toon, load it on first use.
+    if name == "fmt":
+        import importlib
+
+        return importlib.import_module(".fmt", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["fmt", "print", "print_stream", "get_str_len_for_int"]
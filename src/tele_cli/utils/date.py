@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+
+def parse_date_range(
+    from_str: str | None = None,
+    to_str: str | None = None,
+    range_str: str | None = None,
+) -> tuple[datetime | None, datetime | None]:
+    """
+    convert the `--from`, `--to` and `--range` options to a date range.
+
+    - `from_str`/`to_str` use `dateparser.parse` and are extended to the start/end of the day.
+    - `range_str` uses `dateparser.search.search_dates` and takes priority over `from_str`/`to_str`.
+      Special case: "this week" is treated as Sunday..Saturday.
+    """
+
+    if not from_str and not to_str and not range_str:
+        return (None, None)
+
+    import dateparser
+    from dateparser.search import search_dates
+
+    date_from: datetime | None = None
+    if from_str:
+        date_from = dateparser.parse(from_str)
+        date_from = date_from and date_from.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    date_to: datetime | None = None
+    if to_str:
+        date_to = dateparser.parse(to_str)
+        date_to = date_to and date_to.replace(hour=23, minute=59, second=59, microsecond=0)
+
+    date_span: list[datetime] | None = None
+    if range_str and range_str == "this week":
+        start_date = dateparser.parse("sunday")
+        assert start_date is not None
+        date_span = [start_date, start_date + timedelta(days=6)]
+    elif range_str:
+        dates = search_dates(range_str, settings={"RETURN_TIME_SPAN": True}) or []
+        if len(dates) == 2:
+            # https://github.com/scrapinghub/dateparser/blob/cd5f226454e0ed3fe93164e7eff55b00f57e57c7/dateparser/search/search.py#L202
+            start = next((x for (s, x) in dates if "start" in s), None)
+            end = next((x for (s, x) in dates if "end" in s), None)
+            if start and end:
+                date_span = [start, end]
+
+    if date_span:
+        return (date_span[0], date_span[1])
+    return (date_from, date_to)
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Mapping
+from typing import Any
+
+
+def parse_fields(value: str | None) -> list[str] | None:
+    """`"id, date,sender.username"` -> `["id", "date", "sender.username"]`, `None` if empty."""
+
+    fields = [field.strip() for field in (value or "").split(",") if field.strip()]
+    return fields or None
+
+
+class FieldProjection:
+    """
+    JSON objects with only the requested fields, read straight from the (Telethon) objects.
+
+    `id,date,media.document.id` gives `{"id": .., "date": .., "media": {"document": {"id": ..}}}` without
+    calling `to_dict()` on the whole object: only an object selected as a leaf is converted. Path parts are
+    attribute names (properties included, e.g. `sender_id`) or dict keys, `_` is the type name like in `to_dict()`.
+    A path through a list applies the rest of the path to each item, missing attributes are `null`.
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = list(fields)
+        self._tree: dict[str, dict] = {}
+        for field in self.fields:
+            node = self._tree
+            for part in field.split("."):
+                if not part or (part.startswith("_") and part != "_"):
+                    raise ValueError(f"invalid field: {field!r}")
+                node = node.setdefault(part, {})
+
+    def __repr__(self) -> str:
+        return f"FieldProjection({','.join(self.fields)!r})"
+
+    @property
+    def roots(self) -> set[str]:
+        """The top level fields."""
+
+        return set(self._tree)
+
+    def apply(self, obj: object, extra: Mapping[str, Callable[[], Any]] | None = None) -> dict[str, Any]:
+        """
+        Project `obj`. Top level fields found in `extra` are computed by calling it instead, and only if requested.
+        """
+
+        ret: dict[str, Any] = {}
+        for key, subtree in self._tree.items():
+            value = extra[key]() if extra is not None and key in extra else _get(obj, key)
+            ret[key] = _project(value, subtree)
+        return ret
+
+    def values(self, obj: object, extra: Mapping[str, Callable[[], Any]] | None = None) -> list[Any]:
+        """The projected values in the order of `fields`, a row of a table with the fields as columns."""
+
+        projected = self.apply(obj, extra)
+        return [_pick(projected, field.split(".")) for field in self.fields]
+
+
+def _pick(value: Any, parts: list[str]) -> Any:
+    for index, part in enumerate(parts):
+        if isinstance(value, list):
+            return [_pick(item, parts[index:]) for item in value]
+        if not isinstance(value, Mapping):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _get(value: object, key: str) -> Any:
+    if isinstance(value, Mapping):
+        return value.get(key)
+    if key == "_":
+        return type(value).__name__
+    try:
+        attr = getattr(value, key, None)
+    except Exception:  # noqa: BLE001
+        # e.g. properties of a message that was not fetched through a client.
+        return None
+    # methods, e.g. `get_sender`.
+    return None if callable(attr) else attr
+
+
+def _project(value: Any, tree: dict[str, dict]) -> Any:
+    if isinstance(value, (list, tuple)):
+        return [_project(item, tree) for item in value]
+    if not tree:
+        to_dict = getattr(value, "to_dict", None)
+        return to_dict() if callable(to_dict) else value
+    if value is None:
+        return None
+    return {key: _project(_get(value, key), subtree) for key, subtree in tree.items()}
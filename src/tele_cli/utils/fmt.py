@@ -1,20 +1,42 @@
-from datetime import datetime
+from __future__ import annotations
+
 import json
+from collections.abc import AsyncIterable, AsyncIterator, Callable
+from datetime import datetime
+from typing import TYPE_CHECKING, TypeVar
 
 import telethon
-from telethon.custom import Message
 import toon_format
-from telethon.tl.tlobject import _json_default
 
-from tele_cli.types import OutputFormat, get_dialog_type
-from tele_cli.types.session import SessionInfo
-import arrow
+from tele_cli.types import OutputFormat, get_dialog_type, is_dialog_muted
+
+from .fields import FieldProjection
+from .output import dump_json, get_str_len_for_int, iter_json, json_default_callback
+from .render import RelativeTime
+from .toon import ToonTable
+
+if TYPE_CHECKING:
+    from telethon.custom import Message
+
+    from tele_cli.download import DownloadResult
+    from tele_cli.export import ExportResult
+    from tele_cli.store import SyncState
+
+T = TypeVar("T")
+
+
+def _json_obj(default: Callable[[T], object], fields: list[str] | None) -> Callable[[T], object]:
+    """`default` (the full object), or a `FieldProjection` of `fields`."""
+
+    return FieldProjection(fields).apply if fields else default
 
-from .output import get_str_len_for_int
 
+def _toon_table(columns: list[str], to_row: Callable[[T], list], fields: list[str] | None) -> tuple[ToonTable, Callable[[T], list]]:
+    """The fixed TOON schema of a list, or the `fields` as columns."""
 
-def json_default_callback(value):
-    return _json_default(value)
+    if fields:
+        return (ToonTable(fields), FieldProjection(fields).values)
+    return (ToonTable(columns), to_row)
 
 
 def format_me(me: telethon.types.User, fmt: None | OutputFormat = None) -> str:
@@ -24,11 +46,13 @@ def format_me(me: telethon.types.User, fmt: None | OutputFormat = None) -> str:
             return telethon.utils.get_display_name(me)
         case OutputFormat.json:
             return json.dumps(me.to_json(), ensure_ascii=False)
+        case OutputFormat.jsonl:
+            return dump_json(me.to_dict())
         case OutputFormat.toon:
             return toon_format.encode(me.to_dict())
 
 
-def _format_dialog_to_str(x: telethon.custom.Dialog, unread_count_len: int, peer_id_len: int) -> str:
+def _format_dialog_to_str(x: telethon.custom.Dialog, unread_count_len: int, peer_id_len: int, now: datetime | None = None) -> str:
     """
     format: "[<Dialog Type>.<UI State>.<Dialog State>] <Unread Count> <Name> [entity id]"
     """
@@ -45,51 +69,107 @@ def _format_dialog_to_str(x: telethon.custom.Dialog, unread_count_len: int, peer
 
     dialog_type = str(get_dialog_type(x))
 
-    mute_until = x.dialog.notify_settings.mute_until
-    is_mute = mute_until is not None and mute_until > datetime.now().astimezone()
+    is_mute = is_dialog_muted(x, now)
     mute = "M" if is_mute else "-"
 
     unread = f"[{unread_color}]{(str(x.unread_count) if have_unread else ' '):<{unread_count_len}}[/{unread_color}]"
 
     message_line = ""
     message_prefix_space_count = 2 + 5 + 2 + unread_count_len + 2 + 2 + peer_id_len
-    if x.message.message and not x.message.out and have_unread and not is_mute:
+    if x.message and x.message.message and not x.message.out and have_unread and not is_mute:
         unread_message = "".join([f"{' ' * message_prefix_space_count}| " + m for m in x.message.message.splitlines(keepends=True)])
         message_line = "\n" + f"{' ' * message_prefix_space_count}* id: {x.message.id} at {x.message.date} \n" + unread_message
 
     return f"[{_color}]" + f"[{dialog_type}.{state}.{mute}] {unread} [{x.id:<{peer_id_len}}] {x.name} " + message_line + f"[/{_color}]"
 
 
-def format_dialog_list(dialog_list: list[telethon.custom.Dialog], fmt: None | OutputFormat = None) -> str:
+def _dialog_to_dict(x: telethon.custom.Dialog) -> dict:
+    return {
+        "_": "Dialog",
+        "pin": x.pinned,
+        "folder_id": x.folder_id,
+        "name": x.name,
+        "date": x.date,
+        "message": x.message.to_dict() if x.message else None,
+        "entity": x.entity.to_dict(),
+        "unread_count": x.unread_count,
+    }
+
+
+_DIALOG_COLUMNS = ["id", "type", "name", "username", "unread_count", "pinned", "archived", "muted", "date", "message_id", "message"]
+
+
+def _dialog_to_row(x: telethon.custom.Dialog, now: datetime) -> list:
+    return [
+        x.id,
+        get_dialog_type(x).value,
+        x.name,
+        getattr(x.entity, "username", None),
+        x.unread_count,
+        x.pinned,
+        x.archived,
+        is_dialog_muted(x, now),
+        x.date,
+        x.message.id if x.message else None,
+        x.message.message if x.message else None,
+    ]
+
+
+def _dialog_toon_table(fields: list[str] | None) -> tuple[ToonTable, Callable[[telethon.custom.Dialog], list]]:
+    now = datetime.now().astimezone()
+    return _toon_table(_DIALOG_COLUMNS, lambda x: _dialog_to_row(x, now), fields)
+
+
+def format_dialog_list(dialog_list: list[telethon.custom.Dialog], fmt: None | OutputFormat = None, fields: list[str] | None = None) -> str:
     output_fmt = fmt or OutputFormat.text
     match output_fmt:
         case OutputFormat.text:
             max_unread_count_len = max(list(map(lambda x: get_str_len_for_int(x.unread_count), dialog_list)))
             max_peer_id_len = max(list(map(lambda x: get_str_len_for_int(x.id), dialog_list)))
-            return "\n".join([_format_dialog_to_str(x, max_unread_count_len, max_peer_id_len) for x in sorted(dialog_list, key=lambda x: x.archived)])
+            now = datetime.now().astimezone()
+            return "\n".join([_format_dialog_to_str(x, max_unread_count_len, max_peer_id_len, now) for x in sorted(dialog_list, key=lambda x: x.archived)])
 
         case OutputFormat.json:
-
-            def f(x: telethon.custom.Dialog) -> dict:
-                return {
-                    "_": "Dialog",
-                    "pin": x.pinned,
-                    "folder_id": x.folder_id,
-                    "name": x.name,
-                    "date": x.date,
-                    "message": x.message.to_dict(),
-                    "entity": x.entity.to_dict(),
-                    "unread_count": x.unread_count,
-                }
-
-            obj_list = [f(item) for item in dialog_list]
+            to_obj = _json_obj(_dialog_to_dict, fields)
+            obj_list = [to_obj(item) for item in dialog_list]
             return json.dumps(obj_list, default=json_default_callback, ensure_ascii=False)
 
+        case OutputFormat.jsonl:
+            to_obj = _json_obj(_dialog_to_dict, fields)
+            return "\n".join([dump_json(to_obj(item)) for item in dialog_list])
+
         case OutputFormat.toon:
-            raise NotImplementedError("Not Supported Format For Dialog")
+            (table, to_row) = _dialog_toon_table(fields)
+            return table.document(dialog_list, to_row).rstrip("\n")
 
 
-def _format_message_to_str(msg: Message, relative_time: bool = True) -> str:
+async def iter_format_dialog_list(
+    dialogs: AsyncIterable[telethon.custom.Dialog],
+    fmt: None | OutputFormat = None,
+    fields: list[str] | None = None,
+) -> AsyncIterator[str]:
+    """
+    Streaming version of `format_dialog_list`.
+
+    The text format aligns columns over all dialogs, so it is only written once every dialog is known.
+    `fields` selects what the JSON objects (or the TOON columns) contain, see `FieldProjection`.
+    """
+
+    output_fmt = fmt or OutputFormat.text
+    match output_fmt:
+        case OutputFormat.text:
+            dialog_list = [item async for item in dialogs]
+            yield format_dialog_list(dialog_list, output_fmt) + "\n"
+        case OutputFormat.json | OutputFormat.jsonl:
+            async for chunk in iter_json(dialogs, _json_obj(_dialog_to_dict, fields), output_fmt):
+                yield chunk
+        case OutputFormat.toon:
+            (table, to_row) = _dialog_toon_table(fields)
+            async for chunk in table.iter_document(dialogs, to_row):
+                yield chunk
+
+
+def _format_message_to_str(msg: Message, relative_time: bool = True, with_chat: bool = False, clock: RelativeTime | None = None) -> str:
     sender_name = "unknown"
     if msg.out:
         sender_name = "me"
@@ -97,55 +177,242 @@ def _format_message_to_str(msg: Message, relative_time: bool = True) -> str:
         sender_name = f"{telethon.utils.get_display_name(msg.sender)} (id: {msg.sender.id})"
 
     if relative_time:
-        date_str = arrow.get(msg.date).humanize() if msg.date else "?"
+        date_str = (clock or RelativeTime()).humanize(msg.date) if msg.date else "?"
     else:
         date_str = msg.date.strftime("%Y-%m-%d %H:%M") if msg.date else "?"
 
     text = msg.message or ""
     message = "".join(["  " + x for x in text.splitlines(keepends=True)])
 
-    return f"* {msg.id} ({date_str}) - {sender_name}\n" + "\n" + message + "\n"
+    chat = ""
+    if with_chat:
+        chat_name = telethon.utils.get_display_name(msg.chat) if msg.chat else None
+        chat = f"[{msg.chat_id}] {chat_name} " if chat_name else f"[{msg.chat_id}] "
+
+    return f"* {chat}{msg.id} ({date_str}) - {sender_name}\n" + "\n" + message + "\n"
+
+
+def _message_to_dict(msg: Message) -> dict:
+    return msg.to_dict()
+
+
+def _message_with_chat_to_dict(msg: Message) -> dict:
+    # messages of several dialogs are tagged with theirs, like the chat column of the text and TOON output.
+    return {**msg.to_dict(), "chat_id": msg.chat_id}
+
+
+def _message_toon_table(with_chat: bool, fields: list[str] | None) -> tuple[ToonTable, Callable[[Message], list]]:
+    columns = ["id", "date", "chat_id", *(["chat"] if with_chat else []), "sender_id", "sender", "out", "reply_to_msg_id", "media", "message"]
+
+    def _to_row(msg: Message) -> list:
+        chat = [telethon.utils.get_display_name(msg.chat) if msg.chat else None] if with_chat else []
+        return [
+            msg.id,
+            msg.date,
+            msg.chat_id,
+            *chat,
+            msg.sender_id,
+            telethon.utils.get_display_name(msg.sender) if msg.sender else None,
+            msg.out,
+            msg.reply_to_msg_id,
+            type(msg.media).__name__.removeprefix("MessageMedia") if msg.media else None,
+            msg.message,
+        ]
 
+    return _toon_table(columns, _to_row, fields)
 
-def format_message_list(messages: list[Message], fmt: None | OutputFormat = None) -> str:
+
+def format_message_list(messages: list[Message], fmt: None | OutputFormat = None, with_chat: bool = False, fields: list[str] | None = None) -> str:
     output_fmt = fmt or OutputFormat.text
     match output_fmt:
         case OutputFormat.text:
-            return "\n".join([_format_message_to_str(msg) for msg in messages])
+            clock = RelativeTime()
+            return "\n".join([_format_message_to_str(msg, with_chat=with_chat, clock=clock) for msg in messages])
         case OutputFormat.json:
-            obj_list = [msg.to_dict() for msg in messages]
+            to_obj = _json_obj(_message_with_chat_to_dict if with_chat else _message_to_dict, fields)
+            obj_list = [to_obj(msg) for msg in messages]
             return json.dumps(obj_list, default=json_default_callback, ensure_ascii=False)
+        case OutputFormat.jsonl:
+            to_obj = _json_obj(_message_with_chat_to_dict if with_chat else _message_to_dict, fields)
+            return "\n".join([dump_json(to_obj(msg)) for msg in messages])
         case OutputFormat.toon:
-            raise NotImplementedError("Not Supported Format For Message List")
+            (table, to_row) = _message_toon_table(with_chat, fields)
+            return table.document(messages, to_row).rstrip("\n")
 
 
-def _format_session_info_to_str(x: SessionInfo) -> str:
-    username = f"@{x.user_name}" if x.user_name else "unknown"
-    return f"{x.user_id: <12} {x.user_display_name or 'unknown'} ({username}) {x.session_name}"
+async def iter_format_message_list(
+    messages: AsyncIterable[Message],
+    fmt: None | OutputFormat = None,
+    with_chat: bool = False,
+    fields: list[str] | None = None,
+) -> AsyncIterator[str]:
+    """
+    Streaming version of `format_message_list`: yields the output chunk by chunk, one per message.
 
+    The concatenated chunks are the output of `format_message_list` followed by a newline,
+    except for `json`/`jsonl`, where each message is serialized as soon as it arrives, and `toon`,
+    one document written once the list is complete (see `ToonTable`).
+    `fields` selects what the JSON objects (or the TOON columns) contain, see `FieldProjection`.
+    """
 
-def format_session_info_list(session_info_list: list[SessionInfo], fmt: None | OutputFormat = None) -> str:
     output_fmt = fmt or OutputFormat.text
+    match output_fmt:
+        case OutputFormat.text:
+            # one "now" for the whole list, like `format_message_list`.
+            clock = RelativeTime()
+            sep = ""
+            async for msg in messages:
+                yield sep + _format_message_to_str(msg, with_chat=with_chat, clock=clock)
+                sep = "\n"
+            yield "\n"
+        case OutputFormat.json | OutputFormat.jsonl:
+            async for chunk in iter_json(messages, _json_obj(_message_with_chat_to_dict if with_chat else _message_to_dict, fields), output_fmt):
+                yield chunk
+        case OutputFormat.toon:
+            (table, to_row) = _message_toon_table(with_chat, fields)
+            async for chunk in table.iter_document(messages, to_row):
+                yield chunk
+
 
+def format_sync_state(state: SyncState, fmt: None | OutputFormat = None) -> str:
+    output_fmt = fmt or OutputFormat.text
+    obj = {
+        "peer_id": state.peer_id,
+        "min_id": state.min_id,
+        "max_id": state.max_id,
+        "complete": state.complete,
+        "synced_at": datetime.fromtimestamp(state.synced_at).astimezone(),
+    }
     match output_fmt:
         case OutputFormat.text:
-            return "\n".join([_format_session_info_to_str(obj) for obj in session_info_list])
-        case OutputFormat.json:
-            obj_list = [item.model_dump(mode="json") for item in session_info_list]
-            return json.dumps(obj_list, ensure_ascii=False)
+            coverage = "whole history" if state.complete else f"from message {state.min_id}"
+            return f"[{state.peer_id}] archived up to message {state.max_id}, {coverage}"
+        case OutputFormat.json | OutputFormat.jsonl:
+            return json.dumps(obj, default=json_default_callback, ensure_ascii=False)
+        case OutputFormat.toon:
+            return toon_format.encode({**obj, "synced_at": obj["synced_at"].isoformat()})
+
+
+def _format_download_result_to_str(x: DownloadResult) -> str:
+    match x.status:
+        case "downloaded":
+            return f"[{x.message_id}] downloaded {x.path} ({x.size} bytes)"
+        case "skipped":
+            return f"[{x.message_id}] skipped, already downloaded as {x.path}"
+        case _:
+            return f"[{x.message_id}] failed {x.path.name}: {x.error}"
+
+
+async def iter_format_download_results(results: AsyncIterable[DownloadResult], fmt: None | OutputFormat = None) -> AsyncIterator[str]:
+    """One chunk per file, as soon as its download completed."""
+
+    output_fmt = fmt or OutputFormat.text
+    match output_fmt:
+        case OutputFormat.text:
+            async for item in results:
+                yield _format_download_result_to_str(item) + "\n"
+        case OutputFormat.json | OutputFormat.jsonl:
+            async for chunk in iter_json(results, lambda x: x.to_dict(), output_fmt):
+                yield chunk
         case OutputFormat.toon:
-            raise NotImplementedError("Not Supported Format For SessionInfo List")
+            yield toon_format.encode([item.to_dict() async for item in results]) + "\n"
+
+
+def _format_export_result_to_str(x: ExportResult) -> str:
+    files = ", ".join(str(path) for path in x.files) or "no new messages"
+    if x.status == "failed":
+        return f"[{x.peer_id}] failed after {x.count} messages (last id {x.last_id}): {x.error}"
+    return f"[{x.peer_id}] exported {x.count} messages up to id {x.last_id}: {files}"
+
+
+async def iter_format_export_results(results: AsyncIterable[ExportResult], fmt: None | OutputFormat = None) -> AsyncIterator[str]:
+    """One chunk per dialog, as soon as its export completed."""
+
+    output_fmt = fmt or OutputFormat.text
+    match output_fmt:
+        case OutputFormat.text:
+            async for item in results:
+                yield _format_export_result_to_str(item) + "\n"
+        case OutputFormat.json | OutputFormat.jsonl:
+            async for chunk in iter_json(results, lambda x: x.to_dict(), output_fmt):
+                yield chunk
+        case OutputFormat.toon:
+            yield toon_format.encode([item.to_dict() async for item in results]) + "\n"
+
+
+def format_daemon_stats(stats: dict, fmt: None | OutputFormat = None) -> str:
+    """`stats` is the result of the daemon's `stats` RPC method."""
+
+    output_fmt = fmt or OutputFormat.text
+    match output_fmt:
+        case OutputFormat.text:
+            scheduler = stats.get("scheduler", {})
+            lanes = ", ".join(f"{name} {count}" for (name, count) in scheduler.get("lanes", {}).items())
+            rows = [f"account: {stats['account']}"] if stats.get("account") else []
+            rows += [
+                f"rpc: {stats.get('rpc', {}).get('pending', 0)} pending",
+                f"send queue: {scheduler.get('queued', 0)} queued ({lanes}), {scheduler.get('running', 0)} running",
+                f"send wait: oldest {scheduler.get('oldest_wait', 0)}s, average {scheduler.get('avg_wait', 0)}s",
+                f"sent {scheduler.get('sent', 0)}, failed {scheduler.get('failed', 0)}, flood waits {scheduler.get('flood_waits', 0)}",
+            ]
+            if cache := stats.get("entity_cache"):
+                hit_rate = f"{cache['hit_rate']:.1%}" if cache.get("hit_rate") is not None else "-"
+                miss_latency = f"{cache['miss_latency_avg'] * 1000:.0f}ms" if cache.get("miss_latency_avg") is not None else "-"
+                rows.append(
+                    f"entity cache: {cache['size']} entries, hit rate {hit_rate}, miss latency {miss_latency} (max {cache['miss_latency_max'] * 1000:.0f}ms)"
+                )
+            for peer in scheduler.get("peers", []):
+                blocked = f", blocked for {peer['blocked_for']}s" if peer["blocked_for"] else ""
+                rows.append(f"  [{peer['peer_id']}] {peer['queued']} queued{' (sending)' if peer['running'] else ''}{blocked}")
+            return "\n".join(rows)
+        case OutputFormat.json | OutputFormat.jsonl:
+            return json.dumps(stats, ensure_ascii=False)
+        case OutputFormat.toon:
+            return toon_format.encode(stats)
 
 
 def _format_authorization_to_str(x: telethon.types.Authorization, max_hash_len: int, max_device_model_len: int) -> str:
     is_current = x.current or False
     current = ">" if is_current else " "
 
-    date_active = x.date_active and arrow.get(x.date_active).humanize()
+    date_active = x.date_active and RelativeTime().humanize(x.date_active)
 
     return f"{current} [{x.hash: <{max_hash_len}}] {date_active:14} {x.device_model: <{max_device_model_len}} - {x.app_name} {x.app_version} "
 
 
+_AUTHORIZATION_COLUMNS = [
+    "hash",
+    "current",
+    "device_model",
+    "platform",
+    "system_version",
+    "app_name",
+    "app_version",
+    "date_created",
+    "date_active",
+    "ip",
+    "country",
+    "region",
+]
+
+
+def _authorization_to_row(x: telethon.types.Authorization) -> list:
+    return [
+        x.hash,
+        bool(x.current),
+        x.device_model,
+        x.platform,
+        x.system_version,
+        x.app_name,
+        x.app_version,
+        x.date_created,
+        x.date_active,
+        x.ip,
+        x.country,
+        x.region,
+    ]
+
+
 def format_authorizations(
     authorizations: telethon.types.account.Authorizations,
     fmt: None | OutputFormat = None,
@@ -161,5 +428,8 @@ def format_authorizations(
             return "\n".join(rows)
         case OutputFormat.json:
             return json.dumps(authorizations.to_dict(), default=json_default_callback, ensure_ascii=False)
+        case OutputFormat.jsonl:
+            return "\n".join([dump_json(item.to_dict()) for item in authorizations.authorizations])
         case OutputFormat.toon:
-            raise NotImplementedError("Not Supported Format For Authorizations")
+            table = ToonTable(_AUTHORIZATION_COLUMNS)
+            return table.document(authorizations.authorizations, _authorization_to_row).rstrip("\n")
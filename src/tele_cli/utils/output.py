@@ -1,9 +1,12 @@
-from typing import Literal
-import rich
 import builtins
+import json
+from collections.abc import AsyncIterable, AsyncIterator, Callable
+from typing import Literal, TypeVar
 
 from ..types import OutputFormat
 
+T = TypeVar("T")
+
 
 def print(
     *values: object,
@@ -13,12 +16,32 @@ def print(
     fmt: OutputFormat = OutputFormat.text,
 ) -> None:
     match fmt:
-        case OutputFormat.json:
+        # machine readable: `rich` would wrap long rows and drop `[...]` it takes for markup.
+        case OutputFormat.json | OutputFormat.jsonl | OutputFormat.toon:
             builtins.print(*values, sep=sep, end=end, flush=flush)
         case _:
+            import rich
+
             rich.print(*values, sep=sep, end=end, flush=flush)
 
 
+async def print_stream(chunks: AsyncIterable[str], fmt: OutputFormat = OutputFormat.text) -> None:
+    """
+    Print chunks as they are produced, see `fmt.iter_format_message_list`.
+
+    Lists can be large, they bypass `rich` and go through the buffered `TextWriter`.
+    """
+
+    from .render import TextWriter
+
+    writer = TextWriter(markup=fmt == OutputFormat.text)
+    try:
+        async for chunk in chunks:
+            writer.write(chunk)
+    finally:
+        writer.flush()
+
+
 def get_str_len_for_int(n: int) -> int:
     import math
 
@@ -28,3 +51,31 @@ def get_str_len_for_int(n: int) -> int:
         return 1
     else:
         return int(math.log10(-n)) + 2
+
+
+def json_default_callback(value):
+    # Telethon is only loaded by the lists that hold its objects.
+    from telethon.tl.tlobject import _json_default
+
+    return _json_default(value)
+
+
+def dump_json(obj: object) -> str:
+    return json.dumps(obj, default=json_default_callback, ensure_ascii=False)
+
+
+async def iter_json(items: AsyncIterable[T], to_obj: Callable[[T], object], fmt: OutputFormat) -> AsyncIterator[str]:
+    """
+    Stream `items` as one JSON array (`json`) or one object per line (`jsonl`), each item as soon as it is produced.
+    """
+
+    match fmt:
+        case OutputFormat.jsonl:
+            async for item in items:
+                yield dump_json(to_obj(item)) + "\n"
+        case _:
+            sep = "["
+            async for item in items:
+                yield sep + dump_json(to_obj(item))
+                sep = ","
+            yield ("[" if sep == "[" else "") + "]\n"
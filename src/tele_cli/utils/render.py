@@ -0,0 +1,159 @@
+"""
+Fast text output for large lists.
+
+`rich.print` parses the markup of the whole output and `arrow.humanize` is slow per call, which makes printing
+tens of thousands of messages CPU-bound. The text formatters only use a few style tags, `TextWriter` turns them
+into ANSI codes (on a terminal) or drops them, and buffers the output. `RelativeTime` humanizes dates against
+one "now", with the same wording and buckets as `arrow`.
+"""
+
+from __future__ import annotations
+
+import calendar
+import os
+import re
+import sys
+import time
+from datetime import UTC, datetime
+from typing import TextIO
+
+# the style tags the text formatters emit, see `fmt.py`. `not` is the "no style" placeholder.
+_ANSI = {
+    "red": "\x1b[31m",
+    "green": "\x1b[32m",
+    "yellow": "\x1b[33m",
+    "white": "\x1b[37m",
+    "bold": "\x1b[1m",
+    "dim": "\x1b[2m",
+    "not": "",
+}
+_ANSI_RESET = "\x1b[0m"
+_TAG = re.compile(r"\[(/?)(" + "|".join(_ANSI) + r")\]")
+
+# chunks are joined in memory and written at once, at least every `FLUSH_INTERVAL` seconds.
+BUFFER_SIZE = 64 * 1024
+FLUSH_INTERVAL = 0.05
+
+
+def use_color(stream: TextIO) -> bool:
+    """ANSI styling only for terminals, and never with `NO_COLOR` set (https://no-color.org)."""
+
+    if os.environ.get("NO_COLOR"):
+        return False
+    isatty = getattr(stream, "isatty", None)
+    return bool(isatty and isatty())
+
+
+def render_markup(text: str, color: bool) -> str:
+    """Replace the style tags of `text` with ANSI codes, or remove them."""
+
+    if "[" not in text:
+        return text
+    if not color:
+        return _TAG.sub("", text)
+
+    def _replace(match: re.Match[str]) -> str:
+        (closing, name) = match.groups()
+        if name == "not":
+            return ""
+        # tags are never nested by the formatters, closing one resets the style.
+        return _ANSI_RESET if closing else _ANSI[name]
+
+    return _TAG.sub(_replace, text)
+
+
+class TextWriter:
+    """Buffered writer for formatter output, see the module docstring. `markup=False` writes chunks unchanged."""
+
+    def __init__(self, stream: TextIO | None = None, markup: bool = True, color: bool | None = None):
+        self._stream = stream or sys.stdout
+        self._markup = markup
+        self._color = use_color(self._stream) if color is None else color
+        self._parts: list[str] = []
+        self._size = 0
+        self._flushed_at = time.monotonic()
+
+    def write(self, text: str) -> None:
+        if self._markup:
+            text = render_markup(text, self._color)
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= BUFFER_SIZE or time.monotonic() - self._flushed_at >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._parts:
+            self._stream.write("".join(self._parts))
+            self._parts.clear()
+            self._size = 0
+        self._stream.flush()
+        self._flushed_at = time.monotonic()
+
+
+_SECS_PER_MINUTE = 60
+_SECS_PER_HOUR = 60 * 60
+_SECS_PER_DAY = 60 * 60 * 24
+_SECS_PER_WEEK = 60 * 60 * 24 * 7
+_SECS_PER_MONTH = 60 * 60 * 24 * 30.5
+_SECS_PER_YEAR = 60 * 60 * 24 * 365
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    (year, month) = divmod(value.month - 1 + months, 12)
+    year += value.year
+    day = min(value.day, calendar.monthrange(year, month + 1)[1])
+    return value.replace(year=year, month=month + 1, day=day)
+
+
+def _calendar_months(later: datetime, earlier: datetime) -> int:
+    """Whole months between the dates, plus one if more than two weeks are left over (like `arrow`)."""
+
+    months = (later.year - earlier.year) * 12 + later.month - earlier.month
+    if _add_months(earlier, months) > later:
+        months -= 1
+    if (later - _add_months(earlier, months)).days > 14:
+        months += 1
+    return min(months, 12)
+
+
+class RelativeTime:
+    """`arrow.get(date).humanize()` against a fixed `now`, e.g. "3 hours ago" or "in 2 days"."""
+
+    def __init__(self, now: datetime | None = None):
+        self._now = (now or datetime.now(UTC)).astimezone(UTC)
+
+    def humanize(self, date: datetime) -> str:
+        date = date.astimezone(UTC) if date.tzinfo else date.replace(tzinfo=UTC)
+        delta = round((date - self._now).total_seconds())
+        diff = abs(delta)
+        past = delta < 0
+
+        if diff < 10:
+            return "just now"
+        if diff < _SECS_PER_MINUTE:
+            text = f"{diff} seconds"
+        elif diff < _SECS_PER_MINUTE * 2:
+            text = "a minute"
+        elif diff < _SECS_PER_HOUR:
+            text = f"{max(diff // _SECS_PER_MINUTE, 2)} minutes"
+        elif diff < _SECS_PER_HOUR * 2:
+            text = "an hour"
+        elif diff < _SECS_PER_DAY:
+            text = f"{max(diff // _SECS_PER_HOUR, 2)} hours"
+        elif diff < _SECS_PER_DAY * 2:
+            text = "a day"
+        elif diff < _SECS_PER_WEEK:
+            text = f"{max(diff // _SECS_PER_DAY, 2)} days"
+        else:
+            months = _calendar_months(self._now, date) if past else _calendar_months(date, self._now)
+            if months >= 1 and diff < _SECS_PER_YEAR:
+                text = "a month" if months == 1 else f"{months} months"
+            elif diff < _SECS_PER_WEEK * 2:
+                text = "a week"
+            elif diff < _SECS_PER_MONTH:
+                text = f"{max(diff // _SECS_PER_WEEK, 2)} weeks"
+            elif diff < _SECS_PER_YEAR * 2:
+                text = "a year"
+            else:
+                text = f"{max(diff // _SECS_PER_YEAR, 2)} years"
+        return f"{text} ago" if past else f"in {text}"
@@ -0,0 +1,66 @@
+"""
+Output of `tele auth list`, which only reads the metadata stored next to the session files.
+
+Kept out of `fmt` so listing sessions does not import Telethon.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import TYPE_CHECKING
+
+from tele_cli.types import OutputFormat
+
+from .output import iter_json
+from .toon import ToonTable
+
+if TYPE_CHECKING:
+    from tele_cli.types.session import SessionInfo
+
+
+def _format_session_info_to_str(x: SessionInfo) -> str:
+    username = f"@{x.user_name}" if x.user_name else "unknown"
+    return f"{x.user_id: <12} {x.user_display_name or 'unknown'} ({username}) {x.session_name}"
+
+
+_SESSION_INFO_COLUMNS = ["session_name", "user_id", "user_name", "user_phone", "user_display_name", "verified_at"]
+
+
+def _session_info_to_row(x: SessionInfo) -> list:
+    return [x.session_name, x.user_id, x.user_name, x.user_phone, x.user_display_name, x.verified_at]
+
+
+def format_session_info_list(session_info_list: list[SessionInfo], fmt: None | OutputFormat = None) -> str:
+    output_fmt = fmt or OutputFormat.text
+
+    match output_fmt:
+        case OutputFormat.text:
+            return "\n".join([_format_session_info_to_str(obj) for obj in session_info_list])
+        case OutputFormat.json:
+            obj_list = [item.model_dump(mode="json") for item in session_info_list]
+            return json.dumps(obj_list, ensure_ascii=False)
+        case OutputFormat.jsonl:
+            return "\n".join([json.dumps(item.model_dump(mode="json"), ensure_ascii=False) for item in session_info_list])
+        case OutputFormat.toon:
+            table = ToonTable(_SESSION_INFO_COLUMNS)
+            return table.document(session_info_list, _session_info_to_row).rstrip("\n")
+
+
+async def iter_format_session_info_list(session_infos: AsyncIterable[SessionInfo], fmt: None | OutputFormat = None) -> AsyncIterator[str]:
+    """Streaming version of `format_session_info_list`, one chunk per session."""
+
+    output_fmt = fmt or OutputFormat.text
+    match output_fmt:
+        case OutputFormat.text:
+            sep = ""
+            async for item in session_infos:
+                yield sep + _format_session_info_to_str(item)
+                sep = "\n"
+            yield "\n"
+        case OutputFormat.json | OutputFormat.jsonl:
+            async for chunk in iter_json(session_infos, lambda x: x.model_dump(mode="json"), output_fmt):
+                yield chunk
+        case OutputFormat.toon:
+            async for chunk in ToonTable(_SESSION_INFO_COLUMNS).iter_document(session_infos, _session_info_to_row):
+                yield chunk
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import json
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable
+from datetime import datetime
+from typing import Any, TypeVar
+
+from .output import json_default_callback
+
+T = TypeVar("T")
+
+
+def _cell(value: Any) -> Any:
+    """A TOON table cell is a primitive: dates become ISO strings, anything nested becomes a JSON string."""
+
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return json.dumps(value, default=json_default_callback, ensure_ascii=False)
+
+
+class ToonTable:
+    """
+    A TOON tabular array with fixed `columns`: `[n]{columns}:` and a row per item.
+
+    A TOON header declares the number of rows, which a stream does not know upfront. Rows are encoded as they
+    are produced, the document is complete (and written) once the last one is known. `block` encodes a
+    batch of rows on its own, for files that are written batch by batch (see `tele_cli.export`).
+    """
+
+    def __init__(self, columns: Iterable[str]):
+        import toon_format
+
+        self.columns = list(columns)
+        # the field list of the header, quoted by the encoder where needed.
+        self._fields = toon_format.encode([dict.fromkeys(self.columns, 0)]).splitlines()[0].removeprefix("[1]")
+
+    def row(self, values: list[Any]) -> str:
+        import toon_format
+
+        # a primitive array is encoded inline (`[n]: a,b`), with the quoting rules of a table row.
+        encoded = toon_format.encode([_cell(value) for value in values])
+        return encoded[encoded.index(": ") + 2 :] if values else ""
+
+    def block(self, rows: list[str]) -> str:
+        if not rows:
+            return "[]\n"
+        return f"[{len(rows)}]{self._fields}\n" + "".join(f"  {row}\n" for row in rows)
+
+    def document(self, items: Iterable[T], to_row: Callable[[T], list[Any]]) -> str:
+        return self.block([self.row(to_row(item)) for item in items])
+
+    async def iter_document(self, items: AsyncIterable[T], to_row: Callable[[T], list[Any]]) -> AsyncIterator[str]:
+        """Streaming version of `document`: rows are encoded as the items arrive, the document is yielded at the end."""
+
+        rows = [self.row(to_row(item)) async for item in items]
+        yield self.block(rows)